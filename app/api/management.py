@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 from typing import Literal
 
@@ -590,10 +591,28 @@ async def knowledge_status(
 ):
     await clients.retriever._ensure_index()
     status = clients.retriever.status().model_dump(mode="json")
+    status["cache"]["evidence"] = clients.evidence_cache.stats()
     status["retrieval"] = ["BM25", "BGE-M3", "Rerank", "page_evidence", "OphthaKG"]
     return status
 
 
+@router.get("/knowledge/page-visual")
+async def knowledge_page_visual(
+    path: str = Query(min_length=1, max_length=1000),
+    current_user: User = Depends(get_current_user),
+    clients: CapabilityClients = Depends(get_capability_clients),
+):
+    try:
+        image_path = await asyncio.to_thread(
+            clients.retriever.render_page_visual,
+            path,
+            user_id=int(current_user.id),
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Page visual not found") from exc
+    return FileResponse(image_path, media_type="image/png")
+
+
 @router.get("/knowledge/sources", response_model=list[KnowledgeSource])
 async def list_knowledge_sources(current_user: User = Depends(get_current_user)):
     return SourceRegistry(settings).list(
@@ -10,7 +10,7 @@ import mimetypes
 from pathlib import Path
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.exc import IntegrityError
@@ -187,13 +187,16 @@ async def delete_workspace_project(
 
 
 @router.get("/health")
-async def health_check():
+async def health_check(request: Request):
     errors = settings.startup_errors()
+    clients = getattr(request.app.state, "capability_clients", None)
+    knowledge_index = clients.retriever.readiness if clients is not None else "cold"
     return {
-        "status": "ok" if not errors else "degraded",
+        "status": "degraded" if errors else "warming" if knowledge_index == "warming" else "ok",
         "service": settings.APP_NAME,
         "version": settings.APP_VERSION,
         "configuration_errors": errors,
+        "knowledge_index": knowledge_index,
     }
 
 
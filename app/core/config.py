@@ -46,6 +46,7 @@ class Settings(BaseSettings):
     CONTEXT_COMPACTION_SOURCE_MAX_TOKENS: int = 24_000
     CONTEXT_SUMMARY_MAX_TOKENS: int = 1_200
     CONTEXT_SUMMARY_MAX_ATTEMPTS: int = 2
+    CONTEXT_PRECOMPACTION: bool = False
 
     JWT_SECRET_KEY: SecretStr = SecretStr("")
     JWT_ALGORITHM: str = "HS256"
@@ -58,15 +59,30 @@ class Settings(BaseSettings):
     RUNTIME_STATE_DIR: str = "data/runtime/runs"
     MEMORY_STATE_PATH: str = "data/runtime/memories.json"
     MEMORY_PREFERENCE_PATH: str = "data/runtime/memory_preferences.json"
+    MEMORY_VECTOR_RECALL: bool = False
+    MEMORY_VECTOR_MIN_SIMILARITY: float = 0.8
+    MEMORY_EXPIRY_SWEEP_SECONDS: float = 0.0
     SKILL_STATE_PATH: str = "data/runtime/skills.json"
     KNOWLEDGE_RAW_DIR: str = "data/knowledge_base/raw"
     KNOWLEDGE_INDEX_DIR: str = "data/knowledge_base/index"
     KNOWLEDGE_CHUNK_SIZE: int = 1400
     KNOWLEDGE_CHUNK_OVERLAP: int = 180
+    KNOWLEDGE_CHUNK_TOKENS: int = 800
+    KNOWLEDGE_DEDUP_THRESHOLD: float = 0.9
     KNOWLEDGE_EMBED_BATCH_SIZE: int = 32
+    KNOWLEDGE_EMBED_CONCURRENCY: int = 4
+    KNOWLEDGE_EMBED_COALESCE_MS: float = 5.0
+    KNOWLEDGE_HTTP_MAX_CONNECTIONS: int = 20
+    KNOWLEDGE_INGEST_WORKERS: int = 0
     KNOWLEDGE_VECTOR_CANDIDATES: int = 60
+    KNOWLEDGE_QUERY_CACHE_SIZE: int = 512
+    KNOWLEDGE_QUERY_CACHE_TTL_SECONDS: float = 600.0
+    KNOWLEDGE_EVIDENCE_CACHE_SIZE: int = 2_000
+    KNOWLEDGE_EVIDENCE_CACHE_TTL_SECONDS: float = 1_800.0
     KNOWLEDGE_ALLOW_EXPIRED: bool = False
     KNOWLEDGE_MIN_RELEVANCE: float = 0.08
+    KNOWLEDGE_WATCH_SOURCES: bool = False
+    KNOWLEDGE_PRELOAD: bool = False
     TOOL_REGISTRY_PATH: Path = PROJECT_ROOT / "config" / "tool_registry.yaml"
     SKILL_ROOT: str = "skills"
     SKILL_EVALUATION_DIR: str = "data/runtime/skill_evaluations"
@@ -203,6 +203,8 @@ class RunBudget(BaseModel):
     completion_tokens: int = 0
     token_usage_estimated: bool = False
     reserved_output_tokens: int = Field(default=800, ge=0)
+    tokenizer_cpu_ms: float = Field(default=0.0, ge=0)
+    tool_calls_deduplicated: int = Field(default=0, ge=0)
 
 
 class ContextStats(BaseModel):
@@ -410,7 +412,7 @@ class KnowledgeSource(BaseModel):
 
 
 class KnowledgeIndexStatus(BaseModel):
-    status: Literal["ready", "degraded", "unavailable", "building"]
+    status: Literal["ready", "degraded", "unavailable", "building", "warming"]
     documents: int = 0
     chunks: int = 0
     page_visuals: int = 0
@@ -420,6 +422,7 @@ class KnowledgeIndexStatus(BaseModel):
     graph_edges: int = 0
     stale: bool = False
     built_at: datetime | None = None
+    cache: dict[str, dict[str, Any]] = Field(default_factory=dict)
     detail: str | None = None
 
 
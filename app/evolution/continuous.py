@@ -247,32 +247,43 @@ class ContinuousEvolutionController:
         coarse answer-level feedback. Preference/workspace memory can move
         within a bounded range in either direction as explicit feedback changes.
         """
-        if category not in {"preference", "workspace"}:
-            return 1.0
-        positives = 0
-        negatives = 0
+        return self.memory_utility_factors({memory_id: category})[memory_id]
+
+    def memory_utility_factors(self, categories: dict[str, str]) -> dict[str, float]:
+        """``memory_utility_factor`` for many memories from one state read."""
+        factors = {memory_id: 1.0 for memory_id in categories}
+        adaptable = {
+            memory_id
+            for memory_id, category in categories.items()
+            if category in {"preference", "workspace"}
+        }
+        if not adaptable:
+            return factors
+        positives: dict[str, int] = {}
+        negatives: dict[str, int] = {}
         for record in self._load().get("feedback_by_run", {}).values():
             recalled = {
                 item.get("id")
                 for item in record.get("memories", [])
                 if isinstance(item, dict)
             }
-            if memory_id not in recalled:
-                continue
-            if record.get("value") == "up":
-                positives += 1
-            elif record.get("value") == "down":
-                negatives += 1
-        sample_size = positives + negatives
-        if sample_size < self.config.EVOLUTION_MIN_FEEDBACK_SAMPLES:
-            return 1.0
-        rate = (positives + 2) / (sample_size + 4)
+            for memory_id in recalled & adaptable:
+                if record.get("value") == "up":
+                    positives[memory_id] = positives.get(memory_id, 0) + 1
+                elif record.get("value") == "down":
+                    negatives[memory_id] = negatives.get(memory_id, 0) + 1
         bound = self.config.EVOLUTION_MEMORY_RANKING_BOUND
-        adjustment = bound * (
-            (rate - 0.5)
-            / 0.5
-        )
-        return min(1.0 + bound, max(1.0 - bound, 1.0 + adjustment))
+        for memory_id in adaptable:
+            sample_size = positives.get(memory_id, 0) + negatives.get(memory_id, 0)
+            if sample_size < self.config.EVOLUTION_MIN_FEEDBACK_SAMPLES:
+                continue
+            rate = (positives.get(memory_id, 0) + 2) / (sample_size + 4)
+            adjustment = bound * (
+                (rate - 0.5)
+                / 0.5
+            )
+            factors[memory_id] = min(1.0 + bound, max(1.0 - bound, 1.0 + adjustment))
+        return factors
 
     def skill_utility_factor(
         self,
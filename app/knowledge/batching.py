@@ -0,0 +1,93 @@
+"""Request coalescing for provider calls issued by concurrent runs."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class MicroBatcher(Generic[T]):
+    """Merge concurrent ``submit`` calls arriving within a short window.
+
+    Runs that search at the same moment each embed one or two queries. The
+    batcher holds the first submission for ``window_seconds`` (or until
+    ``max_items`` texts are waiting), sends every distinct text in a single
+    ``handler`` call and hands each caller its own slice of the results. A
+    provider error is raised to every caller in the batch.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list[str]], Awaitable[list[T]]],
+        *,
+        window_seconds: float,
+        max_items: int,
+    ) -> None:
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_items = max(1, max_items)
+        self.requests = 0
+        self.dispatches = 0
+        self._pending: list[tuple[list[str], asyncio.Future[list[T]]]] = []
+        self._pending_items = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, texts: list[str]) -> list[T]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[T]] = loop.create_future()
+        self._pending.append((texts, future))
+        self._pending_items += len(texts)
+        self.requests += 1
+        if self._pending_items >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "dispatches": self.dispatches,
+            "coalesced": self.requests - self.dispatches,
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_items = self._pending, [], 0
+        batch = [(texts, future) for texts, future in batch if not future.done()]
+        if not batch:
+            return
+        self.dispatches += 1
+        task = asyncio.create_task(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: list[tuple[list[str], asyncio.Future[list[T]]]]) -> None:
+        unique: dict[Hashable, int] = {}
+        for texts, _ in batch:
+            for text in texts:
+                unique.setdefault(text, len(unique))
+        try:
+            results = await self.handler(list(unique))
+            if len(results) != len(unique):
+                raise ValueError("batched response size mismatch")
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        except BaseException:
+            for _, future in batch:
+                future.cancel()
+            raise
+        for texts, future in batch:
+            if not future.done():
+                future.set_result([results[unique[text]] for text in texts])
@@ -0,0 +1,199 @@
+"""Caches for repeated retrieval work."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from contextlib import closing
+from pathlib import Path
+from typing import Any
+
+
+class FingerprintedLRUCache:
+    """LRU cache with a TTL, cleared whenever the index fingerprint changes.
+
+    Follow-up questions, specialist nodes and agent tool calls often repeat
+    the same query. Entries are only valid for the corpus they were computed
+    against, so every lookup carries the current index fingerprint.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._fingerprint: str | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, fingerprint: str | None, key: Hashable) -> Any | None:
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, fingerprint: str | None, key: Hashable, value: Any) -> None:
+        if not self.max_entries or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._fingerprint = None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    def _check_fingerprint(self, fingerprint: str | None) -> None:
+        if fingerprint == self._fingerprint:
+            return
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._fingerprint = fingerprint
+
+
+class EvidenceCache:
+    """SQLite-persisted cache of final retrieval results.
+
+    Regenerations, resumes and retries repeat the same retrieval within
+    minutes. Keys combine the normalized query, ``top_k``, the caller's
+    visibility scope and the corpus version, so any source, lifecycle or
+    model change naturally misses. Eviction is by TTL and by entry count
+    (least recently used first); entries survive restarts.
+    """
+
+    def __init__(self, path: Path, max_entries: int, ttl_seconds: float) -> None:
+        self.path = path
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def key(query: str, top_k: int, scope: str, version: str) -> str:
+        payload = json.dumps([query, top_k, scope, version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> list[dict[str, Any]] | None:
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            with self._lock, closing(self._connect()) as connection:
+                row = connection.execute(
+                    "SELECT payload_json FROM evidence_cache WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE evidence_cache SET accessed_at = ? WHERE key = ?",
+                        (now, key),
+                    )
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row["payload_json"])
+
+    def put(self, key: str, evidence: list[dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        payload = json.dumps(evidence, ensure_ascii=False, default=str)
+        try:
+            with self._lock, closing(self._connect()) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO evidence_cache"
+                        "(key, payload_json, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                        (key, payload, now + self.ttl_seconds, now),
+                    )
+                    connection.execute("DELETE FROM evidence_cache WHERE expires_at <= ?", (now,))
+                    connection.execute(
+                        """
+                        DELETE FROM evidence_cache WHERE key IN (
+                            SELECT key FROM evidence_cache
+                            ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                        )
+                        """,
+                        (self.max_entries,),
+                    )
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            # The cache is an optimization; a locked or damaged file only
+            # costs a fresh retrieval.
+            return
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS evidence_cache (
+                    key TEXT PRIMARY KEY,
+                    payload_json TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_evidence_cache_expiry
+                    ON evidence_cache(expires_at);
+                CREATE INDEX IF NOT EXISTS ix_evidence_cache_access
+                    ON evidence_cache(accessed_at);
+                """,
+            )
+            self._initialized = True
+        return connection
@@ -0,0 +1,216 @@
+"""Streaming, sentence-aware chunking and near-duplicate detection."""
+
+from __future__ import annotations
+
+import re
+import zlib
+from collections.abc import Hashable, Iterable, Iterator
+from dataclasses import dataclass
+from typing import TextIO
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9]+")
+SENTENCE_END = re.compile(r"(?<=[。！？；!?;])|(?<=[.!?])(?=\s)")
+SHINGLE_STRIP = re.compile(r"[\s\W_]+", re.UNICODE)
+MIN_PARAGRAPH_CHARS = 20
+MINHASH_PRIME = (1 << 61) - 1
+
+
+def tokenize(text: str) -> list[str]:
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """Yield blank-line separated paragraphs without holding the whole file."""
+    buffer: list[str] = []
+    for line in lines:
+        if line.strip():
+            buffer.append(line)
+        elif buffer:
+            yield "".join(buffer).strip()
+            buffer = []
+    if buffer:
+        yield "".join(buffer).strip()
+
+
+def split_sentences(paragraph: str) -> list[str]:
+    """Split on Chinese and English sentence punctuation, keeping the marks.
+
+    Each sentence keeps the whitespace that followed it, so joining the
+    result reproduces the paragraph's original spacing.
+    """
+    sentences: list[str] = []
+    for part in SENTENCE_END.split(paragraph):
+        body = part.lstrip()
+        if sentences:
+            sentences[-1] += part[: len(part) - len(body)]
+        if body:
+            sentences.append(body)
+    return sentences
+
+
+@dataclass(frozen=True, slots=True)
+class TextPiece:
+    paragraph: int
+    part: int
+    text: str
+
+
+class SentenceChunker:
+    """Pack whole sentences into chunks bounded by tokens and characters.
+
+    Chunks never cross paragraph boundaries, so the ``段落 N`` locator stays
+    meaningful. Overlap carries over trailing whole sentences (up to
+    ``overlap_chars``) instead of a fixed character window, which keeps
+    neighbouring chunks from being near copies of each other. A single
+    sentence longer than the limits is cut at the character cap.
+    """
+
+    def __init__(self, *, max_tokens: int, max_chars: int, overlap_chars: int) -> None:
+        self.max_tokens = max(max_tokens, 16)
+        self.max_chars = max(max_chars, 200)
+        self.overlap_chars = min(max(overlap_chars, 0), self.max_chars // 2)
+
+    def chunk_stream(self, handle: TextIO) -> Iterator[TextPiece]:
+        yield from self.chunk_paragraphs(iter_paragraphs(handle))
+
+    def chunk_text(self, text: str) -> Iterator[TextPiece]:
+        yield from self.chunk_paragraphs(iter_paragraphs(text.splitlines(keepends=True)))
+
+    def chunk_paragraphs(self, paragraphs: Iterable[str]) -> Iterator[TextPiece]:
+        index = 0
+        for paragraph in paragraphs:
+            if len(paragraph) < MIN_PARAGRAPH_CHARS:
+                continue
+            index += 1
+            for part, text in enumerate(self._pack(paragraph), start=1):
+                yield TextPiece(paragraph=index, part=part, text=text)
+
+    def _pack(self, paragraph: str) -> Iterator[str]:
+        current: list[tuple[str, int]] = []
+        tokens = 0
+        chars = 0
+        fresh = 0
+        for sentence in self._bounded_sentences(paragraph):
+            sentence_tokens = len(TOKEN_PATTERN.findall(sentence))
+            if current and (
+                tokens + sentence_tokens > self.max_tokens
+                or chars + len(sentence) > self.max_chars
+            ):
+                if fresh:
+                    yield "".join(text for text, _ in current).strip()
+                current, tokens, chars = self._overlap(current, sentence_tokens, len(sentence))
+                fresh = 0
+            current.append((sentence, sentence_tokens))
+            tokens += sentence_tokens
+            chars += len(sentence)
+            fresh += 1
+        if current and fresh:
+            yield "".join(text for text, _ in current).strip()
+
+    def _overlap(
+        self,
+        previous: list[tuple[str, int]],
+        next_tokens: int,
+        next_chars: int,
+    ) -> tuple[list[tuple[str, int]], int, int]:
+        carried: list[tuple[str, int]] = []
+        tokens = 0
+        chars = 0
+        for text, count in reversed(previous):
+            if (
+                chars + len(text) > self.overlap_chars
+                or chars + len(text) + next_chars > self.max_chars
+                or tokens + count + next_tokens > self.max_tokens
+            ):
+                break
+            carried.insert(0, (text, count))
+            tokens += count
+            chars += len(text)
+        return carried, tokens, chars
+
+    def _bounded_sentences(self, paragraph: str) -> Iterator[str]:
+        for sentence in split_sentences(paragraph):
+            if len(sentence) <= self.max_chars and len(TOKEN_PATTERN.findall(sentence)) <= self.max_tokens:
+                yield sentence
+                continue
+            # Run-on text with no usable punctuation: cut by characters,
+            # shrinking the window until the token budget also fits.
+            window = self.max_chars
+            start = 0
+            while start < len(sentence):
+                piece = sentence[start : start + window]
+                while window > 1 and len(TOKEN_PATTERN.findall(piece)) > self.max_tokens:
+                    window = max(1, window * 3 // 4)
+                    piece = sentence[start : start + window]
+                yield piece
+                start += len(piece)
+
+
+class MinHashDeduplicator:
+    """Find near-identical texts with MinHash signatures and LSH banding.
+
+    Texts are compared as sets of character shingles after stripping
+    whitespace and punctuation. Candidates that share any LSH band are
+    confirmed by their estimated Jaccard similarity before being reported.
+    Only texts with the same ``group`` key are compared, so callers can keep
+    duplicates that differ in visibility or lifecycle.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.9,
+        shingle: int = 5,
+        permutations: int = 64,
+        bands: int = 16,
+        seed: int = 1,
+    ) -> None:
+        if permutations % bands:
+            raise ValueError("permutations must be divisible by bands")
+        self.threshold = threshold
+        self.shingle = shingle
+        self.bands = bands
+        self.rows = permutations // bands
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, 1 << 32, size=(permutations, 1), dtype=np.uint64)
+        self._b = generator.integers(0, 1 << 32, size=(permutations, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        normalized = SHINGLE_STRIP.sub("", text.lower())
+        width = min(self.shingle, max(len(normalized), 1))
+        shingles = {normalized[index : index + width] for index in range(max(len(normalized) - width + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(item.encode("utf-8")) for item in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return ((self._a * hashes + self._b) % MINHASH_PRIME).min(axis=1)
+
+    def duplicates(self, items: Iterable[tuple[Hashable, str]]) -> dict[int, int]:
+        """Map each duplicate's position to the earlier position it repeats."""
+        found: dict[int, int] = {}
+        buckets: dict[tuple[Hashable, int, bytes], list[int]] = {}
+        signatures: list[np.ndarray] = []
+        for position, (group, text) in enumerate(items):
+            signature = self.signature(text)
+            signatures.append(signature)
+            keys = [
+                (group, band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+                for band in range(self.bands)
+            ]
+            original = None
+            for key in keys:
+                for candidate in buckets.get(key, ()):
+                    if float(np.mean(signatures[candidate] == signature)) >= self.threshold:
+                        original = candidate
+                        break
+                if original is not None:
+                    break
+            if original is not None:
+                found[position] = original
+                continue
+            for key in keys:
+                buckets.setdefault(key, []).append(position)
+        return found
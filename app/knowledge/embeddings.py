@@ -0,0 +1,88 @@
+"""Content-addressed, resumable embedding checkpoints for index rebuilds."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCheckpoint:
+    """Persist provider vectors batch by batch, keyed by chunk content hash.
+
+    Each completed provider batch becomes its own ``.npz`` shard, so a rebuild
+    interrupted at batch 900 resumes at batch 901. Shards are scoped to one
+    embedding model; vectors from a different model are never mixed in.
+    """
+
+    def __init__(self, directory: Path, model: str) -> None:
+        scope = hashlib.sha256(model.encode("utf-8")).hexdigest()[:16]
+        self.directory = directory / scope
+        self._vectors: dict[str, np.ndarray] | None = None
+        self._lock = threading.Lock()
+
+    def load(self) -> dict[str, np.ndarray]:
+        with self._lock:
+            if self._vectors is not None:
+                return self._vectors
+            vectors: dict[str, np.ndarray] = {}
+            for shard in sorted(self.directory.glob("*.npz")):
+                try:
+                    with np.load(shard, allow_pickle=False) as payload:
+                        keys = payload["keys"]
+                        matrix = payload["vectors"]
+                except (OSError, KeyError, ValueError):
+                    # A torn shard only costs the batch that produced it.
+                    continue
+                if matrix.ndim != 2 or len(keys) != len(matrix):
+                    continue
+                for key, vector in zip(keys.tolist(), matrix, strict=True):
+                    vectors[str(key)] = vector.astype(np.float32, copy=False)
+            self._vectors = vectors
+            return vectors
+
+    def append(self, keys: list[str], vectors: np.ndarray) -> None:
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._write_shard(f"batch_{uuid4().hex}.npz", keys, matrix)
+            if self._vectors is not None:
+                self._vectors.update(zip(keys, matrix, strict=True))
+
+    def compact(self, keep: Iterable[str]) -> None:
+        """Fold all shards into one and drop vectors of chunks no longer indexed."""
+        vectors = self.load()
+        retained = [key for key in dict.fromkeys(keep) if key in vectors]
+        with self._lock:
+            previous = list(self.directory.glob("*.npz"))
+            name = f"snapshot_{uuid4().hex}.npz"
+            if retained:
+                self._write_shard(
+                    name,
+                    retained,
+                    np.stack([vectors[key] for key in retained]),
+                )
+            for shard in previous:
+                if shard.name != name:
+                    shard.unlink(missing_ok=True)
+            self._vectors = {key: vectors[key] for key in retained}
+
+    def _write_shard(self, name: str, keys: list[str], matrix: np.ndarray) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / name
+        temporary = self.directory / f".{name}.tmp"
+        with temporary.open("wb") as handle:
+            np.savez(handle, keys=np.asarray(keys, dtype=str), vectors=matrix)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, target)
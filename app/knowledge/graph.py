@@ -7,10 +7,16 @@ an unsupported diagnosis or treatment relation.
 from __future__ import annotations
 
 import json
+import math
+import multiprocessing
 import os
-from collections import Counter, defaultdict
+from collections import Counter, deque
 from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 
+import numpy as np
 from pydantic import BaseModel, Field
 
 from app.core.config import Settings, settings
@@ -52,18 +58,129 @@ ENTITY_TYPES: dict[str, tuple[str, ...]] = {
 }
 
 
+GRAPH_PARALLEL_MIN_CHUNKS = 20_000
+EDGE_EVIDENCE_LIMIT = 12
+
+
 def _node_id(kind: str, label: str) -> str:
     import hashlib
 
     return f"{kind}_{hashlib.sha1(label.encode('utf-8')).hexdigest()[:12]}"
 
 
+class EntityMatcher:
+    """Aho–Corasick automaton that finds every entity label in one pass.
+
+    Matching is case-insensitive and reports overlapping labels, so it is
+    equivalent to testing ``label.lower() in text.lower()`` for every label
+    while costing time linear in the text, not in the vocabulary size.
+    """
+
+    def __init__(self, entities: dict[str, tuple[str, ...]]) -> None:
+        self.nodes: dict[str, GraphNode] = {}
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[str, ...]] = [()]
+        pending: list[set[str]] = [set()]
+        for kind, labels in entities.items():
+            for label in labels:
+                node = GraphNode(id=_node_id(kind, label), label=label, kind=kind)
+                self.nodes[node.id] = node
+                state = 0
+                for character in label.lower():
+                    following = self._goto[state].get(character)
+                    if following is None:
+                        following = len(self._goto)
+                        self._goto[state][character] = following
+                        self._goto.append({})
+                        self._fail.append(0)
+                        pending.append(set())
+                    state = following
+                pending[state].add(node.id)
+        queue = deque(self._goto[0].values())
+        order: list[int] = []
+        while queue:
+            state = queue.popleft()
+            order.append(state)
+            for character, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(character, 0)
+                self._fail[following] = target if target != following else 0
+                queue.append(following)
+        # Breadth-first order guarantees a state's fail target is final first.
+        self._output = [tuple(sorted(ids)) for ids in pending]
+        for state in order:
+            inherited = self._output[self._fail[state]]
+            if inherited:
+                self._output[state] = tuple(sorted({*self._output[state], *inherited}))
+
+    def find(self, text: str) -> set[str]:
+        found: set[str] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for character in text.lower():
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+@lru_cache(maxsize=1)
+def entity_matcher() -> EntityMatcher:
+    return EntityMatcher(ENTITY_TYPES)
+
+
+@dataclass(slots=True)
+class _PartialGraph:
+    """Mergeable co-occurrence counts for one slice of the corpus."""
+
+    node_ids: set[str] = field(default_factory=set)
+    edge_counts: Counter[tuple[str, str]] = field(default_factory=Counter)
+    edge_sources: dict[tuple[str, str], dict[str, None]] = field(default_factory=dict)
+
+    def merge(self, other: _PartialGraph) -> None:
+        # Slices are merged in corpus order, so the evidence kept per edge is
+        # the same first-seen sources a serial build would keep.
+        self.node_ids.update(other.node_ids)
+        self.edge_counts.update(other.edge_counts)
+        for pair, sources in other.edge_sources.items():
+            kept = self.edge_sources.setdefault(pair, {})
+            for source in sources:
+                if len(kept) >= EDGE_EVIDENCE_LIMIT:
+                    break
+                kept[source] = None
+
+
+def _count_cooccurrence(pairs: list[tuple[str, str]]) -> _PartialGraph:
+    matcher = entity_matcher()
+    partial = _PartialGraph()
+    for source, text in pairs:
+        unique = sorted(matcher.find(text))
+        partial.node_ids.update(unique)
+        for index, left in enumerate(unique):
+            for right in unique[index + 1 :]:
+                partial.edge_counts[(left, right)] += 1
+                kept = partial.edge_sources.setdefault((left, right), {})
+                if len(kept) < EDGE_EVIDENCE_LIMIT:
+                    kept[source] = None
+    return partial
+
+
 class OphthaGraph:
     def __init__(self, config: Settings = settings) -> None:
         self.config = config
         self.path = config.resolve_path(config.KNOWLEDGE_INDEX_DIR) / "ophtha_graph.json"
         self.nodes: dict[str, GraphNode] = {}
         self.edges: list[GraphEdge] = []
+        self._node_order: list[str] = []
+        self._node_index: dict[str, int] = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._neighbors = np.zeros(0, dtype=np.int64)
+        self._weights = np.zeros(0, dtype=np.int64)
         self._load()
 
     def _load(self) -> None:
@@ -78,37 +195,47 @@ class OphthaGraph:
             self.edges = [GraphEdge.model_validate(item) for item in payload.get("edges", [])]
         except (OSError, ValueError, TypeError):
             self.nodes, self.edges = {}, []
+        self._build_adjacency()
 
     def build(self, sources: Iterable[tuple[str, str]]) -> None:
-        """Build supported co-occurrence edges from ``(source, text)`` pairs."""
-        node_map: dict[str, GraphNode] = {}
-        edge_sources: dict[tuple[str, str], set[str]] = defaultdict(set)
-        edge_counts: Counter[tuple[str, str]] = Counter()
-        for source, text in sources:
-            found: list[GraphNode] = []
-            lowered = text.lower()
-            for kind, labels in ENTITY_TYPES.items():
-                for label in labels:
-                    if label.lower() in lowered:
-                        node = GraphNode(id=_node_id(kind, label), label=label, kind=kind)
-                        node_map[node.id] = node
-                        found.append(node)
-            unique = sorted({node.id for node in found})
-            for index, left in enumerate(unique):
-                for right in unique[index + 1 :]:
-                    edge_counts[(left, right)] += 1
-                    if len(edge_sources[(left, right)]) < 12:
-                        edge_sources[(left, right)].add(source)
+        """Build supported co-occurrence edges from ``(source, text)`` pairs.
+
+        Large corpora are split into contiguous slices counted in worker
+        processes; the partial counts are merged back in corpus order.
+        """
+        pairs = list(sources)
+        workers = min(
+            self.config.KNOWLEDGE_INGEST_WORKERS or os.cpu_count() or 1,
+            max(1, len(pairs) // (GRAPH_PARALLEL_MIN_CHUNKS // 2)),
+        )
+        if workers <= 1 or len(pairs) < GRAPH_PARALLEL_MIN_CHUNKS:
+            partial = _count_cooccurrence(pairs)
+        else:
+            size = math.ceil(len(pairs) / workers)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                partials = executor.map(
+                    _count_cooccurrence,
+                    [pairs[start : start + size] for start in range(0, len(pairs), size)],
+                )
+                partial = _PartialGraph()
+                for item in partials:
+                    partial.merge(item)
+        catalog = entity_matcher().nodes
+        node_map = {node_id: catalog[node_id] for node_id in sorted(partial.node_ids)}
         edges = [
             GraphEdge(
                 source=left,
                 target=right,
-                evidence_sources=sorted(edge_sources[(left, right)]),
+                evidence_sources=sorted(partial.edge_sources[(left, right)]),
                 weight=count,
             )
-            for (left, right), count in edge_counts.items()
+            for (left, right), count in partial.edge_counts.items()
         ]
         self.nodes, self.edges = node_map, edges
+        self._build_adjacency()
         self.path.parent.mkdir(parents=True, exist_ok=True)
         temporary = self.path.with_suffix(".tmp")
         temporary.write_text(
@@ -125,22 +252,50 @@ class OphthaGraph:
         )
         os.replace(temporary, self.path)
 
+    def _build_adjacency(self) -> None:
+        """Index edges as CSR so expansion touches only matched nodes' neighbours."""
+        self._node_order = list(self.nodes)
+        self._node_index = {node_id: index for index, node_id in enumerate(self._node_order)}
+        rows: list[int] = []
+        columns: list[int] = []
+        weights: list[int] = []
+        for edge in self.edges:
+            left = self._node_index.get(edge.source)
+            right = self._node_index.get(edge.target)
+            if left is None or right is None:
+                continue
+            rows.extend((left, right))
+            columns.extend((right, left))
+            weights.extend((edge.weight, edge.weight))
+        row_array = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(row_array, kind="stable")
+        self._neighbors = np.asarray(columns, dtype=np.int64)[order]
+        self._weights = np.asarray(weights, dtype=np.int64)[order]
+        self._indptr = np.zeros(len(self._node_order) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(row_array, minlength=len(self._node_order)),
+            out=self._indptr[1:],
+        )
+
     def expand(self, query: str, limit: int = 5) -> list[str]:
         matched = {
-            node_id
-            for node_id, node in self.nodes.items()
-            if node.label.lower() in query.lower()
+            self._node_index[node_id]
+            for node_id in entity_matcher().find(query)
+            if node_id in self._node_index
         }
-        candidates: Counter[str] = Counter()
-        for edge in self.edges:
-            if edge.source in matched and edge.target not in matched:
-                candidates[edge.target] += edge.weight
-            elif edge.target in matched and edge.source not in matched:
-                candidates[edge.source] += edge.weight
+        candidates: Counter[int] = Counter()
+        for index in matched:
+            start, stop = self._indptr[index], self._indptr[index + 1]
+            for neighbor, weight in zip(
+                self._neighbors[start:stop].tolist(),
+                self._weights[start:stop].tolist(),
+                strict=True,
+            ):
+                if neighbor not in matched:
+                    candidates[neighbor] += weight
         return [
-            self.nodes[node_id].label
-            for node_id, _ in candidates.most_common(limit)
-            if node_id in self.nodes
+            self.nodes[self._node_order[index]].label
+            for index, _ in candidates.most_common(limit)
         ]
 
     def status(self) -> tuple[int, int]:
@@ -3,12 +3,18 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import hashlib
 import json
 import math
+import multiprocessing
 import os
 import re
+import unicodedata
 from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, suppress
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from pathlib import Path
@@ -17,12 +23,20 @@ from typing import Any
 import httpx
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock
+    fcntl = None
+
 from app.core.config import Settings, settings
 from app.domain.models import EvidenceItem, KnowledgeIndexStatus, KnowledgeSource
+from app.knowledge.batching import MicroBatcher
+from app.knowledge.cache import FingerprintedLRUCache
+from app.knowledge.chunking import MinHashDeduplicator, SentenceChunker, TextPiece, tokenize
+from app.knowledge.embeddings import EmbeddingCheckpoint, content_key
 from app.knowledge.graph import OphthaGraph
 from app.knowledge.sources import SourceRegistry, portable_path
 
-TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9]+")
 LOW_TRUST_SOURCE_MARKERS = (
     "baidubaike_",
     "xywy_",
@@ -38,10 +52,37 @@ PRIMARY_SOURCE_MARKERS = (
     "preferred practice pattern",
     " ppp",
 )
+PDF_PAGES_PER_TASK = 32
+INACTIVE_SOURCE_STATUSES = frozenset({"expired", "superseded"})
+USER_MASK_CACHE_SIZE = 256
+# Fields a reload replaces together; see HybridKnowledgeRetriever._publish.
+_SNAPSHOT_FIELDS = (
+    "_sources",
+    "_chunks",
+    "_manifest",
+    "_vectors",
+    "_postings",
+    "_average_length",
+    "_public_mask",
+    "_owner_chunks",
+    "_user_masks",
+    "_deduplicated",
+)
+PAGE_VISUAL_PATTERN = re.compile(r"^(src_[0-9a-f]+)/page_(\d{4,})\.png$")
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> list[str]:
+    """Return the text layer of pages ``[start, stop)``; runs in a worker process."""
+    import fitz
 
+    with fitz.open(path) as document:
+        return [document[index].get_text("text").strip() for index in range(start, stop)]
 
-def tokenize(text: str) -> list[str]:
-    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+def _is_oversized_batch_error(exc: httpx.HTTPError) -> bool:
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 413
 
 
 @dataclass(slots=True)
@@ -88,7 +129,7 @@ class HybridKnowledgeRetriever:
     to model memory or synthetic evidence.
     """
 
-    SCHEMA_VERSION = 3
+    SCHEMA_VERSION = 5
 
     def __init__(self, config: Settings = settings) -> None:
         self.config = config
@@ -96,12 +137,16 @@ class HybridKnowledgeRetriever:
         self.chunk_path = self.index_dir / "chunks.jsonl"
         self.vector_path = self.index_dir / "vectors.npy"
         self.manifest_path = self.index_dir / "manifest.json"
+        self.embedding_cache_dir = self.index_dir / "embedding_cache"
         self.registry = SourceRegistry(config)
         self.graph = OphthaGraph(config)
         self._chunks: list[Chunk] | None = None
         self._sources: dict[str, KnowledgeSource] = {}
-        self._document_frequency: Counter[str] = Counter()
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
         self._average_length = 1.0
+        self._public_mask = np.zeros(0, dtype=bool)
+        self._owner_chunks: dict[int, np.ndarray] = {}
+        self._user_masks: dict[int | None, np.ndarray] = {}
         self._vectors: np.ndarray | None = None
         self._manifest: dict[str, Any] = {}
         self._lock = asyncio.Lock()
@@ -109,26 +154,173 @@ class HybridKnowledgeRetriever:
         self._embedding_ready: bool | None = None
         self._rerank_ready: bool | None = None
         self._building = False
+        self._preload: asyncio.Task[None] | None = None
+        self._preload_error: str | None = None
+        self._stale = False
+        self._refresh: asyncio.Task[None] | None = None
+        self._changes = 0
+        self._deduplicated = 0
+        self._query_vector_cache = FingerprintedLRUCache(
+            config.KNOWLEDGE_QUERY_CACHE_SIZE,
+            config.KNOWLEDGE_QUERY_CACHE_TTL_SECONDS,
+        )
+        self._rerank_cache = FingerprintedLRUCache(
+            config.KNOWLEDGE_QUERY_CACHE_SIZE,
+            config.KNOWLEDGE_QUERY_CACHE_TTL_SECONDS,
+        )
+        self._http: httpx.AsyncClient | None = None
+        self._query_batcher: MicroBatcher[list[float]] | None = None
+        self._rerank_inflight: dict[tuple[Any, ...], asyncio.Future[list[tuple[float, int]]]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closing: set[asyncio.Task[None]] = set()
+
+    def _http_client(self) -> httpx.AsyncClient:
+        """Return the pooled provider client, bound to the running event loop."""
+        self._bind_loop()
+        if self._http is None:
+            limit = max(1, self.config.KNOWLEDGE_HTTP_MAX_CONNECTIONS)
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.config.REQUEST_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                follow_redirects=False,
+            )
+        return self._http
+
+    def _bind_loop(self) -> None:
+        # Pooled connections and pending futures belong to one event loop;
+        # a retriever reused under another loop (CLI, tests) starts fresh.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._http is not None:
+                self._close_stale_client(self._http, self._loop)
+            self._loop = loop
+            self._http = None
+            self._query_batcher = None
+            self._rerank_inflight = {}
+
+    def _close_stale_client(
+        self,
+        client: httpx.AsyncClient,
+        owner: asyncio.AbstractEventLoop | None,
+    ) -> None:
+        """Close a pooled client left behind by another event loop."""
+        if owner is not None and owner.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), owner)
+            return
+        # The owning loop has stopped: closing here still shuts the transport
+        # and drops its pool, though the dead loop cannot finish the socket teardown.
+        task = asyncio.get_running_loop().create_task(self._discard_client(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _discard_client(client: httpx.AsyncClient) -> None:
+        with suppress(RuntimeError):
+            await client.aclose()
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     async def _ensure_index(self) -> None:
-        if self._chunks is not None:
+        if self._chunks is not None and not self._stale:
             return
         async with self._lock:
-            if self._chunks is not None:
+            if self._chunks is not None and not self._stale:
                 return
-            await asyncio.to_thread(self._load_or_build_lexical_index)
+            await self._reload()
+
+    async def _reload(self) -> None:
+        """Load the index off the event loop and publish it in one step; the lock is held."""
+        self._stale = False
+        try:
+            self._publish(await asyncio.to_thread(self._load_snapshot))
+        except BaseException:
+            self._stale = True
+            raise
+
+    def _load_snapshot(self) -> HybridKnowledgeRetriever:
+        # Build on a shallow copy so searches never see a half-built index;
+        # _publish swaps the finished fields in on the event loop.
+        snapshot = copy.copy(self)
+        snapshot._load_or_build_lexical_index()
+        return snapshot
+
+    def _publish(self, snapshot: HybridKnowledgeRetriever) -> None:
+        for name in _SNAPSHOT_FIELDS:
+            setattr(self, name, getattr(snapshot, name))
+        self._query_vector_cache.clear()
+        self._rerank_cache.clear()
 
     async def load(self) -> KnowledgeIndexStatus:
         """Load or build the lexical index and return its current status."""
         await self._ensure_index()
         return self.status()
 
+    def start_preload(self) -> asyncio.Task[None]:
+        """Load the index in a background thread so the first question does not pay for it.
+
+        Searches issued meanwhile simply wait on the same lock; unrelated
+        endpoints keep running on the event loop.
+        """
+        if self._preload is None or (self._preload.done() and self._preload_error):
+            self._preload_error = None
+            self._preload = asyncio.create_task(self._run_preload())
+        return self._preload
+
+    async def _run_preload(self) -> None:
+        try:
+            await self._ensure_index()
+        except Exception as exc:
+            # Retrieval falls back to the lazy path; health reports the failure.
+            self._preload_error = type(exc).__name__
+
+    @property
+    def readiness(self) -> str:
+        """``ready``, ``warming``, ``failed`` or ``cold`` (not loaded, no preload)."""
+        if self._chunks is not None:
+            return "ready"
+        if self._preload is not None and not self._preload.done():
+            return "warming"
+        if self._preload_error:
+            return "failed"
+        return "cold"
+
     def invalidate(self) -> None:
-        """Drop process-local caches after source import or lifecycle changes."""
-        self._chunks = None
-        self._sources = {}
-        self._vectors = None
-        self._manifest = {}
+        """Drop process-local caches after source import or lifecycle changes.
+
+        The next search reloads before ranking. Searches already in flight
+        finish on the snapshot they started with.
+        """
+        self._stale = True
+        self._changes += 1
+        self._query_vector_cache.clear()
+        self._rerank_cache.clear()
+
+    def refresh(self) -> asyncio.Task[None]:
+        """Reload in the background after raw-directory changes.
+
+        Unlike :meth:`invalidate`, searches keep using the current snapshot
+        until the new one is published, so no user request pays for the build.
+        """
+        self._changes += 1
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._run_refresh())
+        return self._refresh
+
+    async def _run_refresh(self) -> None:
+        # Changes that arrive during a reload trigger one more pass.
+        while True:
+            changes = self._changes
+            try:
+                async with self._lock:
+                    await self._reload()
+            except Exception as exc:
+                self._preload_error = type(exc).__name__
+                return
+            if changes == self._changes:
+                return
 
     def _corpus_fingerprint(self, sources: list[KnowledgeSource]) -> str:
         payload = [
@@ -139,7 +331,70 @@ class HybridKnowledgeRetriever:
             json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8"),
         ).hexdigest()
 
+    @staticmethod
+    def _source_state(item: KnowledgeSource) -> list[Any]:
+        return [
+            item.path,
+            item.checksum,
+            item.imported_by,
+            item.status,
+            item.version,
+            item.superseded_by,
+        ]
+
+    def _reusable_chunks(
+        self,
+        manifest: dict[str, Any],
+        sources: list[KnowledgeSource],
+    ) -> list[Chunk] | None:
+        """Return the previous chunks when the corpus only gained new sources.
+
+        Bulk imports append files; re-chunking the whole corpus for them is
+        wasted work. Any edit, removal or lifecycle change falls back to a full
+        build, because earlier near-duplicate decisions may no longer hold.
+        """
+        previous = manifest.get("sources")
+        if (
+            manifest.get("schema_version") != self.SCHEMA_VERSION
+            or not isinstance(previous, dict)
+            or manifest.get("chunking") != self._chunking_settings()
+            or not self.chunk_path.is_file()
+        ):
+            return None
+        current = {item.id: self._source_state(item) for item in sources}
+        if any(current.get(key) != state for key, state in previous.items()):
+            return None
+        chunks = []
+        for line in self.chunk_path.read_text("utf-8").splitlines():
+            try:
+                chunks.append(Chunk.deserialize(json.loads(line)))
+            except (KeyError, TypeError, ValueError):
+                return None
+        return chunks
+
+    @contextmanager
+    def _index_build_lock(self) -> Iterator[None]:
+        """Serialize loads across worker processes sharing ``index_dir``.
+
+        The first process builds and persists the snapshot; the others wait,
+        then find a matching manifest and only read it back.
+        """
+        if fcntl is None:
+            yield
+            return
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with (self.index_dir / ".build.lock").open("a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
     def _load_or_build_lexical_index(self) -> None:
+        with self._index_build_lock():
+            self._load_or_build_lexical_index_unlocked()
+
+    def _load_or_build_lexical_index_unlocked(self) -> None:
         # Build one physical index, then enforce source ownership before
         # ranking results. Public sources remain available to every user.
         sources = self.registry.list(include_private=True)
@@ -167,7 +422,16 @@ class HybridKnowledgeRetriever:
             self._manifest = manifest
             self._load_vectors()
         else:
-            self._chunks = self._build_chunks(sources)
+            previous = self._reusable_chunks(manifest, sources)
+            if previous is None:
+                self._chunks = self._build_chunks(sources)
+            else:
+                known = set(manifest["sources"])
+                self._chunks = self._build_chunks(
+                    [item for item in sources if item.id not in known],
+                    previous=previous,
+                )
+                self._deduplicated += int(manifest.get("deduplicated_chunks") or 0)
             self._vectors = None
             if self.vector_path.exists():
                 self.vector_path.unlink()
@@ -176,7 +440,11 @@ class HybridKnowledgeRetriever:
                 "fingerprint": fingerprint,
                 "built_at": datetime.now(UTC).isoformat(),
                 "documents": len(sources),
+                "sources": {item.id: self._source_state(item) for item in sources},
+                "chunking": self._chunking_settings(),
                 "chunks": len(self._chunks),
+                "chunks_reused": len(previous or ()),
+                "deduplicated_chunks": self._deduplicated,
                 "page_visuals": sum(bool(item.visual_path) for item in self._chunks),
                 "vectors": 0,
                 "embedding_model": None,
@@ -201,18 +469,119 @@ class HybridKnowledgeRetriever:
         except (OSError, ValueError):
             self._vectors = None
 
-    def _build_chunks(self, sources: list[KnowledgeSource]) -> list[Chunk]:
-        chunks: list[Chunk] = []
+    def _build_chunks(
+        self,
+        sources: list[KnowledgeSource],
+        *,
+        previous: list[Chunk] | None = None,
+    ) -> list[Chunk]:
+        chunks: list[Chunk] = list(previous or ())
+        pdfs: list[tuple[KnowledgeSource, Path]] = []
+        chunker = self._chunker()
         for source in sources:
             path = self.config.resolve_path(source.path)
             if not path.is_file():
                 continue
             if path.suffix.lower() in {".md", ".txt"}:
-                text = path.read_text(encoding="utf-8", errors="ignore")
-                chunks.extend(self._chunk_text(source, text))
+                with path.open(encoding="utf-8", errors="ignore") as handle:
+                    chunks.extend(self._make_chunks(source, chunker.chunk_stream(handle)))
             elif path.suffix.lower() == ".pdf":
-                chunks.extend(self._chunk_pdf(source, path))
-        return chunks
+                pdfs.append((source, path))
+        for (source, _), pages in zip(pdfs, self._extract_pdfs(pdfs), strict=True):
+            chunks.extend(self._chunk_pdf(source, pages))
+        return self._deduplicate(chunks, self._sources, pinned=len(previous or ()))
+
+    def _chunking_settings(self) -> list[Any]:
+        return [
+            self.config.KNOWLEDGE_CHUNK_TOKENS,
+            self.config.KNOWLEDGE_CHUNK_SIZE,
+            self.config.KNOWLEDGE_CHUNK_OVERLAP,
+            self.config.KNOWLEDGE_DEDUP_THRESHOLD,
+        ]
+
+    def _chunker(self) -> SentenceChunker:
+        return SentenceChunker(
+            max_tokens=self.config.KNOWLEDGE_CHUNK_TOKENS,
+            max_chars=self.config.KNOWLEDGE_CHUNK_SIZE,
+            overlap_chars=self.config.KNOWLEDGE_CHUNK_OVERLAP,
+        )
+
+    def _deduplicate(
+        self,
+        chunks: list[Chunk],
+        sources: dict[str, KnowledgeSource],
+        *,
+        pinned: int = 0,
+    ) -> list[Chunk]:
+        """Drop near-identical chunks, keeping the copy from the best source.
+
+        Copies are only compared within one owner and lifecycle state, so a
+        duplicate never hides evidence that another user or a later status
+        change would still need. The first ``pinned`` chunks come from an
+        earlier build and are always kept.
+        """
+        self._deduplicated = 0
+        threshold = self.config.KNOWLEDGE_DEDUP_THRESHOLD
+        if threshold <= 0 or len(chunks) < 2:
+            return chunks
+
+        def group(chunk: Chunk) -> tuple[int | None, bool]:
+            source = sources.get(chunk.source_id)
+            if source is None:
+                return None, False
+            return source.imported_by, source.status in INACTIVE_SOURCE_STATUSES
+
+        def priority(index: int) -> tuple[bool, bool, bool, int]:
+            source = sources.get(chunks[index].source_id)
+            return (
+                index >= pinned,
+                not (source and source.verified),
+                not (source and source.source_type == "guideline"),
+                index,
+            )
+
+        order = sorted(range(len(chunks)), key=priority)
+        duplicates = MinHashDeduplicator(threshold=min(threshold, 1.0)).duplicates(
+            (group(chunks[index]), chunks[index].text) for index in order
+        )
+        dropped = {order[position] for position in duplicates if order[position] >= pinned}
+        self._deduplicated = len(dropped)
+        return [chunk for index, chunk in enumerate(chunks) if index not in dropped]
+
+    def _extract_pdfs(self, pdfs: list[tuple[KnowledgeSource, Path]]) -> list[list[str]]:
+        """Extract PDF text layers, fanning page ranges out to a process pool.
+
+        Page images are not rendered here; see ``render_page_visual``.
+        """
+        import fitz
+
+        tasks: list[tuple[int, str, int, int]] = []
+        for position, (_, path) in enumerate(pdfs):
+            with fitz.open(path) as document:
+                page_count = document.page_count
+            for start in range(0, page_count, PDF_PAGES_PER_TASK):
+                stop = min(start + PDF_PAGES_PER_TASK, page_count)
+                tasks.append((position, str(path), start, stop))
+        workers = self.config.KNOWLEDGE_INGEST_WORKERS or os.cpu_count() or 1
+        workers = min(workers, len(tasks))
+        if workers <= 1:
+            results = [_extract_pdf_pages(path, start, stop) for _, path, start, stop in tasks]
+        else:
+            # Spawned workers never inherit the event loop or open sqlite handles.
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                results = list(
+                    executor.map(
+                        _extract_pdf_pages,
+                        *zip(*((path, start, stop) for _, path, start, stop in tasks), strict=True),
+                    ),
+                )
+        pages: list[list[str]] = [[] for _ in pdfs]
+        for (position, _, _, _), texts in zip(tasks, results, strict=True):
+            pages[position].extend(texts)
+        return pages
 
     def _chunk_text(
         self,
@@ -221,57 +590,54 @@ class HybridKnowledgeRetriever:
         *,
         locator_prefix: str = "段落",
         visual_path: str | None = None,
+    ) -> list[Chunk]:
+        return self._make_chunks(
+            source,
+            self._chunker().chunk_text(text),
+            locator_prefix=locator_prefix,
+            visual_path=visual_path,
+        )
+
+    def _make_chunks(
+        self,
+        source: KnowledgeSource,
+        pieces: Iterable[TextPiece],
+        *,
+        locator_prefix: str = "段落",
+        visual_path: str | None = None,
     ) -> list[Chunk]:
         chunks: list[Chunk] = []
-        paragraphs = [
-            part.strip()
-            for part in re.split(r"\n{2,}", text)
-            if len(part.strip()) >= 20
-        ]
-        chunk_size = max(self.config.KNOWLEDGE_CHUNK_SIZE, 200)
-        overlap = min(max(self.config.KNOWLEDGE_CHUNK_OVERLAP, 0), chunk_size // 2)
-        step = chunk_size - overlap
-        for paragraph_index, paragraph in enumerate(paragraphs, start=1):
-            for start in range(0, len(paragraph), step):
-                body = paragraph[start : start + chunk_size]
-                terms = Counter(tokenize(body))
-                if not terms:
-                    continue
-                locator = f"{locator_prefix} {paragraph_index}"
-                if start:
-                    locator += f"（续 {start // step + 1}）"
-                stable = hashlib.sha1(
-                    f"{source.id}:{locator}:{start}:{body[:80]}".encode(),
-                ).hexdigest()[:20]
-                chunks.append(
-                    Chunk(
-                        id=f"chk_{stable}",
-                        source_id=source.id,
-                        title=source.title,
-                        source=source.path,
-                        locator=locator,
-                        text=body,
-                        terms=terms,
-                        visual_path=visual_path,
-                    ),
-                )
+        for piece in pieces:
+            terms = Counter(tokenize(piece.text))
+            if not terms:
+                continue
+            locator = f"{locator_prefix} {piece.paragraph}"
+            if piece.part > 1:
+                locator += f"（续 {piece.part}）"
+            stable = hashlib.sha1(
+                f"{source.id}:{locator}:{piece.part}:{piece.text[:80]}".encode(),
+            ).hexdigest()[:20]
+            chunks.append(
+                Chunk(
+                    id=f"chk_{stable}",
+                    source_id=source.id,
+                    title=source.title,
+                    source=source.path,
+                    locator=locator,
+                    text=piece.text,
+                    terms=terms,
+                    visual_path=visual_path,
+                ),
+            )
         return chunks
 
-    def _chunk_pdf(self, source: KnowledgeSource, path: Path) -> list[Chunk]:
-        import fitz
-
-        document = fitz.open(path)
+    def _chunk_pdf(self, source: KnowledgeSource, pages: list[str]) -> list[Chunk]:
         output: list[Chunk] = []
         image_dir = self.index_dir / "page_visuals" / source.id
-        image_dir.mkdir(parents=True, exist_ok=True)
-        for index, page in enumerate(document):
+        for index, text in enumerate(pages):
             page_number = index + 1
             image_path = image_dir / f"page_{page_number:04d}.png"
-            if not image_path.exists():
-                pixmap = page.get_pixmap(matrix=fitz.Matrix(1.25, 1.25), alpha=False)
-                pixmap.save(image_path)
             relative_image = portable_path(image_path, self.config)
-            text = page.get_text("text").strip()
             if len(text) < 40:
                 text = f"PDF 页面 {page_number}：文本层不足，请结合页图复核。"
             output.extend(
@@ -282,9 +648,47 @@ class HybridKnowledgeRetriever:
                     visual_path=relative_image,
                 ),
             )
-        document.close()
         return output
 
+    def render_page_visual(self, visual_path: str, *, user_id: int | None = None) -> Path:
+        """Render an evidence page image on first request and reuse it afterwards.
+
+        Raises ``KeyError`` for paths that do not name a page of a PDF visible
+        to ``user_id``.
+        """
+        visual_dir = self.index_dir / "page_visuals"
+        try:
+            relative = self.config.resolve_path(visual_path).relative_to(visual_dir)
+        except ValueError as exc:
+            raise KeyError(visual_path) from exc
+        match = PAGE_VISUAL_PATTERN.match(relative.as_posix())
+        if match is None:
+            raise KeyError(visual_path)
+        source = self._sources.get(match.group(1)) or self.registry.get(match.group(1))
+        if source.imported_by is not None and source.imported_by != user_id:
+            raise KeyError(visual_path)
+        image_path = visual_dir / relative
+        if image_path.is_file():
+            return image_path
+        import fitz
+
+        pdf_path = self.config.resolve_path(source.path)
+        if pdf_path.suffix.lower() != ".pdf":
+            raise KeyError(visual_path)
+        page_index = int(match.group(2)) - 1
+        with fitz.open(pdf_path) as document:
+            if not 0 <= page_index < document.page_count:
+                raise KeyError(visual_path)
+            pixmap = document[page_index].get_pixmap(
+                matrix=fitz.Matrix(1.25, 1.25),
+                alpha=False,
+            )
+        image_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = image_path.with_name(f".{image_path.name}.{os.getpid()}.tmp")
+        temporary.write_bytes(pixmap.tobytes("png"))
+        os.replace(temporary, image_path)
+        return image_path
+
     def _persist_chunks(self) -> None:
         assert self._chunks is not None
         self.index_dir.mkdir(parents=True, exist_ok=True)
@@ -308,25 +712,75 @@ class HybridKnowledgeRetriever:
         os.replace(temporary, self.manifest_path)
 
     def _rebuild_lexical_statistics(self) -> None:
+        """Build BM25 postings: per term, the chunk indices and saturated tf weights."""
         assert self._chunks is not None
-        self._document_frequency.clear()
-        for chunk in self._chunks:
-            self._document_frequency.update(chunk.terms.keys())
-        if self._chunks:
-            self._average_length = (
-                sum(sum(chunk.terms.values()) for chunk in self._chunks) / len(self._chunks)
+        lengths = [sum(chunk.terms.values()) for chunk in self._chunks]
+        self._average_length = sum(lengths) / len(lengths) if lengths else 1.0
+        k1, b = 1.5, 0.75
+        documents: dict[str, list[int]] = {}
+        weights: dict[str, list[float]] = {}
+        for index, (chunk, length) in enumerate(zip(self._chunks, lengths, strict=True)):
+            denominator = k1 * (1 - b + b * length / self._average_length)
+            for term, tf in chunk.terms.items():
+                documents.setdefault(term, []).append(index)
+                weights.setdefault(term, []).append(tf * (k1 + 1) / (tf + denominator))
+        self._postings = {
+            term: (
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(weights[term], dtype=np.float64),
             )
+            for term, indices in documents.items()
+        }
+        self._rebuild_visibility_masks()
+
+    def _rebuild_visibility_masks(self) -> None:
+        """Precompute which chunks each user may see, so kernels skip the rest.
+
+        The public mask covers built-in sources that are active (or any status
+        when ``KNOWLEDGE_ALLOW_EXPIRED``). Private imports are kept per owner
+        and OR-ed in when that owner searches.
+        """
+        assert self._chunks is not None
+        public = np.zeros(len(self._chunks), dtype=bool)
+        owned: dict[int, list[int]] = {}
+        allow_expired = self.config.KNOWLEDGE_ALLOW_EXPIRED
+        for index, chunk in enumerate(self._chunks):
+            source = self._sources.get(chunk.source_id)
+            if source is None:
+                continue
+            if not allow_expired and source.status in INACTIVE_SOURCE_STATUSES:
+                continue
+            if source.imported_by is None:
+                public[index] = True
+            else:
+                owned.setdefault(source.imported_by, []).append(index)
+        self._public_mask = public
+        self._owner_chunks = {
+            owner: np.asarray(indices, dtype=np.int64) for owner, indices in owned.items()
+        }
+        self._user_masks = {}
+
+    def _visible_mask(self, user_id: int | None) -> np.ndarray:
+        mask = self._user_masks.get(user_id)
+        if mask is not None:
+            return mask
+        owned = self._owner_chunks.get(user_id) if user_id is not None else None
+        if owned is None:
+            return self._public_mask
+        mask = self._public_mask.copy()
+        mask[owned] = True
+        if len(self._user_masks) >= USER_MASK_CACHE_SIZE:
+            self._user_masks.clear()
+        self._user_masks[user_id] = mask
+        return mask
 
     async def rebuild(self, *, include_embeddings: bool = True) -> KnowledgeIndexStatus:
         self._building = True
         try:
             async with self._lock:
-                self._chunks = None
-                await asyncio.to_thread(self._load_or_build_lexical_index)
+                await self._reload()
                 if include_embeddings and self._chunks:
-                    texts = [chunk.text for chunk in self._chunks]
-                    vectors = await self._embed(texts)
-                    matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+                    matrix, reused = await self._embed_chunks(self._chunks)
                     temporary = self.vector_path.with_suffix(".tmp.npy")
                     np.save(temporary, matrix, allow_pickle=False)
                     os.replace(temporary, self.vector_path)
@@ -334,6 +788,7 @@ class HybridKnowledgeRetriever:
                     self._manifest.update(
                         {
                             "vectors": len(matrix),
+                            "vectors_reused": reused,
                             "embedding_model": self.config.EMBEDDING_MODEL,
                             "built_at": datetime.now(UTC).isoformat(),
                         },
@@ -343,6 +798,65 @@ class HybridKnowledgeRetriever:
             self._building = False
         return self.status()
 
+    async def _embed_chunks(self, chunks: list[Chunk]) -> tuple[np.ndarray, int]:
+        """Embed only chunks without a checkpointed vector; return the matrix and reuse count."""
+        checkpoint = EmbeddingCheckpoint(
+            self.embedding_cache_dir,
+            self.config.EMBEDDING_MODEL,
+        )
+        cached = await asyncio.to_thread(checkpoint.load)
+        keys = [content_key(chunk.text) for chunk in chunks]
+        texts_by_key = dict(zip(keys, (chunk.text for chunk in chunks), strict=True))
+        missing = [key for key in texts_by_key if key not in cached]
+        reused = sum(key in cached for key in keys)
+
+        async def persist(start: int, vectors: list[list[float]]) -> None:
+            await asyncio.to_thread(
+                checkpoint.append,
+                missing[start : start + len(vectors)],
+                np.asarray(vectors, dtype=np.float32),
+            )
+
+        try:
+            await self._embed(
+                [texts_by_key[key] for key in missing],
+                on_batch=persist,
+            )
+        except (httpx.HTTPError, KeyError, TypeError, ValueError) as exc:
+            # Completed batches are already on disk; the next rebuild resumes.
+            self._last_embedding_error = type(exc).__name__
+            raise
+        await asyncio.to_thread(checkpoint.compact, keys)
+        cached = checkpoint.load()
+        matrix = self._normalize(np.stack([cached[key] for key in keys]))
+        return matrix, reused
+
+    async def result_scope(self, user_id: int | None) -> tuple[str, str]:
+        """Return ``(visibility scope, corpus version)`` for caching final results.
+
+        Users without private imports share the public scope. The version
+        changes with the source fingerprint, the vector index and every
+        setting that alters ranking.
+        """
+        await self._ensure_index()
+        scope = (
+            f"user:{user_id}"
+            if user_id is not None and user_id in self._owner_chunks
+            else "public"
+        )
+        version = json.dumps(
+            [
+                self._manifest.get("fingerprint"),
+                self._manifest.get("built_at"),
+                len(self._vectors) if self._vectors is not None else 0,
+                self.config.EMBEDDING_MODEL,
+                self.config.RERANK_MODEL,
+                self.config.KNOWLEDGE_MIN_RELEVANCE,
+                self.config.KNOWLEDGE_ALLOW_EXPIRED,
+            ],
+        )
+        return scope, hashlib.sha256(version.encode("utf-8")).hexdigest()
+
     async def search(
         self,
         query: str,
@@ -350,48 +864,99 @@ class HybridKnowledgeRetriever:
         *,
         user_id: int | None = None,
     ) -> list[EvidenceItem]:
+        return (await self.search_many([query], top_k, user_id=user_id))[0][0]
+
+    async def search_many(
+        self,
+        queries: list[str],
+        top_k: int = 6,
+        *,
+        user_id: int | None = None,
+    ) -> tuple[list[list[EvidenceItem]], list[bool]]:
+        """Retrieve evidence for several queries in one pass.
+
+        Query embeddings go out in one provider request, vector similarities
+        are one matrix product, and rerank requests run concurrently. Results
+        are returned in the order of ``queries``; duplicates share one result.
+        The second list flags queries whose ranking fell back because this
+        call's embedding or rerank request failed.
+        """
         await self._ensure_index()
-        assert self._chunks is not None
-        query_terms = tokenize(query)
-        if not query_terms or all(term.isdigit() for term in query_terms):
-            return []
-        expansions = self.graph.expand(query)
+        # A reload may publish a new index while this search awaits providers;
+        # keep ranking against the snapshot the candidate indices came from.
+        chunks = self._chunks
+        assert chunks is not None
+        unique = [
+            query
+            for query in dict.fromkeys(queries)
+            if (terms := tokenize(query)) and not all(term.isdigit() for term in terms)
+        ]
+        if not unique:
+            return [[] for _ in queries], [False for _ in queries]
         limit = max(top_k * 8, self.config.KNOWLEDGE_VECTOR_CANDIDATES)
-        lexical = self._bm25(query, limit)
-        candidates: dict[int, float] = {
-            index: self._normalize_rank_score(score, lexical[0][0] if lexical else 1.0)
-            for score, index in lexical
-        }
-        if expansions:
-            expanded = self._bm25(" ".join(expansions), limit)
-            maximum = expanded[0][0] if expanded else 1.0
-            for score, index in expanded:
-                candidates[index] = max(
-                    candidates.get(index, 0.0),
-                    0.15 * self._normalize_rank_score(score, maximum),
-                )
-        vector_scores = await self._vector_scores(query, [index for _, index in lexical])
-        for index, score in vector_scores.items():
-            candidates[index] = 0.45 * candidates.get(index, 0.0) + 0.55 * score
-        ordered = sorted(
-            ((score, self._chunks[index]) for index, score in candidates.items()),
-            key=lambda item: item[0],
-            reverse=True,
+        visible = self._visible_mask(user_id)
+        lexical_runs = [self._bm25(query, limit, visible) for query in unique]
+        vector_runs, vectors_fell_back = await self._vector_scores_many(
+            unique,
+            [[index for _, index in lexical] for lexical in lexical_runs],
+            visible,
         )
-        ordered = self._filter_source_access(ordered, user_id=user_id)
-        ordered = self._filter_source_lifecycle(ordered)
-        quality_ordered = sorted(
-            (
-                (self._quality_adjusted_score(score, chunk), chunk)
-                for score, chunk in ordered
+        shortlists: list[list[tuple[float, Chunk]]] = []
+        for query, lexical, vector_scores in zip(unique, lexical_runs, vector_runs, strict=True):
+            candidates: dict[int, float] = {
+                index: self._normalize_rank_score(score, lexical[0][0] if lexical else 1.0)
+                for score, index in lexical
+            }
+            expansions = self.graph.expand(query)
+            if expansions:
+                expanded = self._bm25(" ".join(expansions), limit, visible)
+                maximum = expanded[0][0] if expanded else 1.0
+                for score, index in expanded:
+                    candidates[index] = max(
+                        candidates.get(index, 0.0),
+                        0.15 * self._normalize_rank_score(score, maximum),
+                    )
+            for index, score in vector_scores.items():
+                candidates[index] = 0.45 * candidates.get(index, 0.0) + 0.55 * score
+            quality_ordered = sorted(
+                (
+                    (self._quality_adjusted_score(score, chunks[index]), chunks[index])
+                    for index, score in sorted(
+                        candidates.items(),
+                        key=lambda item: item[1],
+                        reverse=True,
+                    )
+                ),
+                key=lambda item: item[0],
+                reverse=True,
+            )
+            shortlists.append(quality_ordered[: max(top_k * 4, 20)])
+        reranked_runs = await asyncio.gather(
+            *(
+                self._rerank(query, shortlist)
+                for query, shortlist in zip(unique, shortlists, strict=True)
             ),
-            key=lambda item: item[0],
-            reverse=True,
         )
-        reranked = await self._rerank(
-            query,
-            quality_ordered[: max(top_k * 4, 20)],
+        results = {
+            query: self._select_evidence(query, reranked, top_k)
+            for query, (reranked, _) in zip(unique, reranked_runs, strict=True)
+        }
+        fell_back = {
+            query: vectors_fell_back or rerank_fell_back
+            for query, (_, rerank_fell_back) in zip(unique, reranked_runs, strict=True)
+        }
+        return (
+            [list(results.get(query, [])) for query in queries],
+            [fell_back.get(query, False) for query in queries],
         )
+
+    def _select_evidence(
+        self,
+        query: str,
+        reranked: list[tuple[float, Chunk]],
+        top_k: int,
+    ) -> list[EvidenceItem]:
+        query_terms = set(tokenize(query))
         reranked = sorted(
             (
                 (self._quality_adjusted_score(score, chunk), chunk)
@@ -407,7 +972,7 @@ class HybridKnowledgeRetriever:
         for score, chunk in reranked:
             if score < minimum or chunk.source_id in seen_sources:
                 continue
-            overlap = set(query_terms).intersection(chunk.terms)
+            overlap = query_terms.intersection(chunk.terms)
             if not overlap:
                 continue
             if self._is_low_trust(chunk):
@@ -422,107 +987,267 @@ class HybridKnowledgeRetriever:
                 selected.append(self._to_evidence(score, chunk))
         return selected
 
-    def _bm25(self, query: str, limit: int) -> list[tuple[float, int]]:
+    def _bm25(
+        self,
+        query: str,
+        limit: int,
+        visible: np.ndarray | None = None,
+    ) -> list[tuple[float, int]]:
         assert self._chunks is not None
         query_terms = tokenize(query)
         if not query_terms:
             return []
         n_docs = max(len(self._chunks), 1)
-        k1, b = 1.5, 0.75
-        scored: list[tuple[float, int]] = []
-        for index, chunk in enumerate(self._chunks):
-            length = sum(chunk.terms.values())
-            score = 0.0
-            for term in query_terms:
-                tf = chunk.terms.get(term, 0)
-                if not tf:
-                    continue
-                df = self._document_frequency.get(term, 0)
-                inverse = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
-                denominator = tf + k1 * (1 - b + b * length / self._average_length)
-                score += inverse * tf * (k1 + 1) / denominator
-            if score:
-                scored.append((score, index))
-        return sorted(scored, reverse=True)[:limit]
+        scores = np.zeros(len(self._chunks), dtype=np.float64)
+        for term in query_terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            documents, weights = posting
+            df = len(documents)
+            inverse = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[documents] += inverse * weights
+        if visible is not None:
+            scores[~visible] = 0.0
+        indices = np.flatnonzero(scores > 0)
+        if len(indices) > limit:
+            indices = indices[np.argpartition(scores[indices], -limit)[-limit:]]
+        ranked = indices[np.lexsort((-indices, -scores[indices]))]
+        return [(float(scores[index]), int(index)) for index in ranked]
 
     async def _vector_scores(
         self,
         query: str,
         lexical_indices: list[int],
+        visible: np.ndarray | None = None,
     ) -> dict[int, float]:
+        return (await self._vector_scores_many([query], [lexical_indices], visible))[0][0]
+
+    async def _vector_scores_many(
+        self,
+        queries: list[str],
+        lexical_runs: list[list[int]],
+        visible: np.ndarray | None = None,
+    ) -> tuple[list[dict[int, float]], bool]:
+        """Vector scores per query, and whether the embedding request failed."""
         key = self.config.embedding_key.get_secret_value()
         if not key or not self.config.EMBEDDING_MODEL:
-            return {}
-        assert self._chunks is not None
+            return [{} for _ in queries], False
+        chunks, vectors = self._chunks, self._vectors
+        assert chunks is not None
         try:
-            query_vector = self._normalize(
-                np.asarray(await self._embed([query]), dtype=np.float32),
-            )[0]
-            if self._vectors is not None:
-                scores = self._vectors @ query_vector
+            query_matrix = await self._query_vectors(queries)
+            if vectors is not None:
+                scores = vectors @ query_matrix.T
+                eligible = len(scores)
+                if visible is not None:
+                    scores = np.where(visible[:, None], scores, -np.inf)
+                    eligible = int(np.count_nonzero(visible))
                 count = min(
                     max(self.config.KNOWLEDGE_VECTOR_CANDIDATES, 1),
-                    len(scores),
+                    eligible,
                 )
-                indices = np.argpartition(scores, -count)[-count:]
-                return {
-                    int(index): max(0.0, min(1.0, (float(scores[index]) + 1) / 2))
-                    for index in indices
-                }
-            if not lexical_indices:
-                return {}
-            texts = [self._chunks[index].text for index in lexical_indices]
+                if not count:
+                    return [{} for _ in queries], False
+                top = np.argpartition(scores, -count, axis=0)[-count:]
+                return [
+                    {
+                        int(index): max(0.0, min(1.0, (float(scores[index, column]) + 1) / 2))
+                        for index in top[:, column]
+                    }
+                    for column in range(len(queries))
+                ], False
+            # Without a persisted matrix, embed each distinct lexical candidate once.
+            candidates = list(dict.fromkeys(index for run in lexical_runs for index in run))
+            if not candidates:
+                return [{} for _ in queries], False
             candidate_vectors = self._normalize(
-                np.asarray(await self._embed(texts), dtype=np.float32),
+                np.asarray(
+                    await self._embed([chunks[index].text for index in candidates]),
+                    dtype=np.float32,
+                ),
             )
-            similarities = candidate_vectors @ query_vector
-            return {
-                index: max(0.0, min(1.0, (float(score) + 1) / 2))
-                for index, score in zip(lexical_indices, similarities, strict=True)
-            }
+            position = {index: row for row, index in enumerate(candidates)}
+            similarities = candidate_vectors @ query_matrix.T
+            return [
+                {
+                    index: max(0.0, min(1.0, (float(similarities[position[index], column]) + 1) / 2))
+                    for index in run
+                }
+                for column, run in enumerate(lexical_runs)
+            ], False
         except (httpx.HTTPError, KeyError, TypeError, ValueError) as exc:
             self._last_embedding_error = type(exc).__name__
             self._embedding_ready = False
-            return {}
+            return [{} for _ in queries], True
+
+    async def _query_vectors(self, queries: list[str]) -> np.ndarray:
+        """Return normalized query vectors, embedding cache misses in one request."""
+        fingerprint = self._manifest.get("fingerprint")
+        keys = [(self.config.EMBEDDING_MODEL, self.normalize_query(query)) for query in queries]
+        vectors: dict[tuple[str, str], np.ndarray] = {}
+        missing: dict[tuple[str, str], str] = {}
+        for query, cache_key in zip(queries, keys, strict=True):
+            cached = self._query_vector_cache.get(fingerprint, cache_key)
+            if cached is not None:
+                vectors[cache_key] = cached
+            elif cache_key not in missing:
+                missing[cache_key] = query
+        if missing:
+            embedded = self._normalize(
+                np.asarray(await self._embed_queries(list(missing.values())), dtype=np.float32),
+            )
+            for cache_key, vector in zip(missing, embedded, strict=True):
+                vector.setflags(write=False)
+                vectors[cache_key] = vector
+                self._query_vector_cache.put(fingerprint, cache_key, vector)
+        return np.stack([vectors[cache_key] for cache_key in keys])
 
-    async def _embed(self, texts: list[str]) -> list[list[float]]:
+    async def _embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embed query texts, merged with other runs' queries arriving at the same moment."""
+        window = self.config.KNOWLEDGE_EMBED_COALESCE_MS / 1000
+        if window <= 0:
+            return await self._embed(texts)
+        self._bind_loop()
+        if self._query_batcher is None:
+            self._query_batcher = MicroBatcher(
+                self._embed,
+                window_seconds=window,
+                max_items=self.config.KNOWLEDGE_EMBED_BATCH_SIZE,
+            )
+        return await self._query_batcher.submit(texts)
+
+    async def embed_texts(self, texts: list[str]) -> np.ndarray | None:
+        """Return normalized vectors for ``texts``, or ``None`` if embedding is unavailable.
+
+        Lets other recall paths (memory search) share this provider, its
+        client pool and request coalescing instead of configuring their own.
+        """
+        key = self.config.embedding_key.get_secret_value()
+        if not texts or not key or not self.config.EMBEDDING_MODEL:
+            return None
+        try:
+            return self._normalize(
+                np.asarray(await self._embed_queries(texts), dtype=np.float32),
+            )
+        except (httpx.HTTPError, KeyError, TypeError, ValueError) as exc:
+            self._last_embedding_error = type(exc).__name__
+            self._embedding_ready = False
+            return None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(unicodedata.normalize("NFKC", query).split())
+
+    async def _embed(
+        self,
+        texts: list[str],
+        *,
+        on_batch: Callable[[int, list[list[float]]], Awaitable[None]] | None = None,
+    ) -> list[list[float]]:
+        """Embed texts with bounded concurrent batches.
+
+        A batch rejected as too large (HTTP 413) or timing out is split in
+        half, and later batches start at the reduced size. ``on_batch``
+        receives each completed batch with its offset into ``texts``.
+        """
         key = self.config.embedding_key.get_secret_value()
         if not key or not self.config.EMBEDDING_MODEL:
             raise ValueError("embedding capability unavailable")
-        url = self.config.embedding_url.rstrip("/") + "/embeddings"
-        output: list[list[float]] = []
+        output: list[list[float]] = [[] for _ in texts]
         batch_size = max(1, self.config.KNOWLEDGE_EMBED_BATCH_SIZE)
-        async with httpx.AsyncClient(
-            timeout=httpx.Timeout(self.config.REQUEST_TIMEOUT_SECONDS),
-        ) as client:
-            for start in range(0, len(texts), batch_size):
-                response: httpx.Response | None = None
-                for attempt in range(self.config.MAX_RETRIES + 1):
-                    try:
-                        response = await client.post(
-                            url,
-                            headers={
-                                "Authorization": f"Bearer {key}",
-                                "Content-Type": "application/json",
-                            },
-                            json={
-                                "model": self.config.EMBEDDING_MODEL,
-                                "input": texts[start : start + batch_size],
-                                "encoding_format": "float",
-                            },
-                        )
-                        response.raise_for_status()
-                        break
-                    except httpx.HTTPError:
-                        if attempt >= self.config.MAX_RETRIES:
-                            raise
-                        await asyncio.sleep(min(0.25 * 2**attempt, 1.0))
-                assert response is not None
-                items = sorted(response.json()["data"], key=lambda item: item["index"])
-                output.extend([item["embedding"] for item in items])
+        semaphore = asyncio.Semaphore(max(1, self.config.KNOWLEDGE_EMBED_CONCURRENCY))
+
+        async def adaptive(client: httpx.AsyncClient, batch: list[str]) -> list[list[float]]:
+            nonlocal batch_size
+            try:
+                return await self._embed_batch(client, batch)
+            except httpx.HTTPError as exc:
+                if len(batch) <= 1 or not _is_oversized_batch_error(exc):
+                    raise
+                middle = len(batch) // 2
+                batch_size = max(1, min(batch_size, middle))
+                return [
+                    *await adaptive(client, batch[:middle]),
+                    *await adaptive(client, batch[middle:]),
+                ]
+
+        async def run(client: httpx.AsyncClient, start: int, size: int) -> None:
+            try:
+                vectors = await adaptive(client, texts[start : start + size])
+            finally:
+                semaphore.release()
+            output[start : start + size] = vectors
+            if on_batch is not None:
+                await on_batch(start, vectors)
+
+        tasks: list[asyncio.Task[None]] = []
+        client = self._http_client()
+        try:
+            cursor = 0
+            while cursor < len(texts):
+                await semaphore.acquire()
+                failed = next(
+                    (task for task in tasks if task.done() and task.exception()),
+                    None,
+                )
+                if failed is not None:
+                    # Stop scheduling new batches once any batch failed.
+                    semaphore.release()
+                    await failed
+                size = batch_size
+                tasks.append(asyncio.create_task(run(client, cursor, size)))
+                cursor += size
+            await asyncio.gather(*tasks)
+        except Exception:
+            # Let in-flight batches finish so their vectors are checkpointed.
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
         self._embedding_ready = True
         return output
 
+    async def _embed_batch(
+        self,
+        client: httpx.AsyncClient,
+        texts: list[str],
+    ) -> list[list[float]]:
+        key = self.config.embedding_key.get_secret_value()
+        url = self.config.embedding_url.rstrip("/") + "/embeddings"
+        response: httpx.Response | None = None
+        for attempt in range(self.config.MAX_RETRIES + 1):
+            try:
+                response = await client.post(
+                    url,
+                    headers={
+                        "Authorization": f"Bearer {key}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": self.config.EMBEDDING_MODEL,
+                        "input": texts,
+                        "encoding_format": "float",
+                    },
+                )
+                response.raise_for_status()
+                break
+            except httpx.HTTPError as exc:
+                # Oversized batches are split by the caller instead of resent.
+                if attempt >= self.config.MAX_RETRIES or (
+                    len(texts) > 1 and _is_oversized_batch_error(exc)
+                ):
+                    raise
+                await asyncio.sleep(min(0.25 * 2**attempt, 1.0))
+        assert response is not None
+        items = sorted(response.json()["data"], key=lambda item: item["index"])
+        if len(items) != len(texts):
+            raise ValueError("embedding response size mismatch")
+        return [item["embedding"] for item in items]
+
     @staticmethod
     def _normalize(matrix: np.ndarray) -> np.ndarray:
         denominators = np.linalg.norm(matrix, axis=1, keepdims=True)
@@ -533,37 +1258,6 @@ class HybridKnowledgeRetriever:
     def _normalize_rank_score(score: float, maximum: float) -> float:
         return max(0.0, min(1.0, score / maximum if maximum else 0.0))
 
-    def _filter_source_lifecycle(
-        self,
-        candidates: list[tuple[float, Chunk]],
-    ) -> list[tuple[float, Chunk]]:
-        if self.config.KNOWLEDGE_ALLOW_EXPIRED:
-            return candidates
-        return [
-            item
-            for item in candidates
-            if self._sources.get(item[1].source_id, KnowledgeSource(
-                id="missing",
-                title=item[1].title,
-                path=item[1].source,
-            )).status not in {"expired", "superseded"}
-        ]
-
-    def _filter_source_access(
-        self,
-        candidates: list[tuple[float, Chunk]],
-        *,
-        user_id: int | None,
-    ) -> list[tuple[float, Chunk]]:
-        return [
-            item
-            for item in candidates
-            if (
-                (source := self._sources.get(item[1].source_id)) is not None
-                and (source.imported_by is None or source.imported_by == user_id)
-            )
-        ]
-
     def _to_evidence(self, score: float, chunk: Chunk) -> EvidenceItem:
         source = self._sources.get(chunk.source_id)
         low_trust = self._is_low_trust(chunk)
@@ -611,43 +1305,65 @@ class HybridKnowledgeRetriever:
         self,
         query: str,
         candidates: list[tuple[float, Chunk]],
-    ) -> list[tuple[float, Chunk]]:
+    ) -> tuple[list[tuple[float, Chunk]], bool]:
+        """Rerank ``candidates``; the flag is set when the provider call failed."""
         key = self.config.rerank_key.get_secret_value()
         if not key or not self.config.RERANK_MODEL or not candidates:
-            return candidates
-        url = self.config.rerank_url.rstrip("/") + "/rerank"
+            return candidates, False
+        fingerprint = self._manifest.get("fingerprint")
+        cache_key = (
+            self.config.RERANK_MODEL,
+            self.normalize_query(query),
+            tuple(chunk.id for _, chunk in candidates),
+        )
+        cached = self._rerank_cache.get(fingerprint, cache_key)
+        if cached is not None:
+            return [(score, candidates[index][1]) for score, index in cached], False
+        # Identical concurrent requests (a retry, a sibling role) share one call.
+        self._bind_loop()
+        inflight = self._rerank_inflight.get(cache_key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._rerank_request(key, query, candidates))
+            self._rerank_inflight[cache_key] = inflight
+            inflight.add_done_callback(lambda _: self._rerank_inflight.pop(cache_key, None))
         try:
-            async with httpx.AsyncClient(
-                timeout=self.config.REQUEST_TIMEOUT_SECONDS,
-            ) as client:
-                response = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.config.RERANK_MODEL,
-                        "query": query,
-                        "documents": [chunk.text for _, chunk in candidates],
-                        "top_n": len(candidates),
-                        "return_documents": False,
-                    },
-                )
-                response.raise_for_status()
-                rankings = response.json().get("results", [])
-                reranked = [
-                    (
-                        max(0.0, float(item["relevance_score"])),
-                        candidates[int(item["index"])][1],
-                    )
-                    for item in rankings
-                ]
-                self._rerank_ready = True
-                return reranked or candidates
+            ranked = await asyncio.shield(inflight)
         except (httpx.HTTPError, KeyError, TypeError, ValueError):
             self._rerank_ready = False
-            return candidates
+            return candidates, True
+        reranked = [(score, candidates[index][1]) for score, index in ranked]
+        self._rerank_ready = True
+        if reranked:
+            self._rerank_cache.put(fingerprint, cache_key, tuple(ranked))
+        return reranked or candidates, False
+
+    async def _rerank_request(
+        self,
+        key: str,
+        query: str,
+        candidates: list[tuple[float, Chunk]],
+    ) -> list[tuple[float, int]]:
+        url = self.config.rerank_url.rstrip("/") + "/rerank"
+        response = await self._http_client().post(
+            url,
+            headers={
+                "Authorization": f"Bearer {key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": self.config.RERANK_MODEL,
+                "query": query,
+                "documents": [chunk.text for _, chunk in candidates],
+                "top_n": len(candidates),
+                "return_documents": False,
+            },
+        )
+        response.raise_for_status()
+        rankings = response.json().get("results", [])
+        return [
+            (max(0.0, float(item["relevance_score"])), int(item["index"]))
+            for item in rankings
+        ]
 
     def status(self) -> KnowledgeIndexStatus:
         chunks = self._chunks or []
@@ -660,7 +1376,15 @@ class HybridKnowledgeRetriever:
             != self._corpus_fingerprint(current_sources)
         )
         return KnowledgeIndexStatus(
-            status="building" if self._building else ("ready" if chunks else "unavailable"),
+            status=(
+                "building"
+                if self._building
+                else "ready"
+                if chunks
+                else "warming"
+                if self.readiness == "warming"
+                else "unavailable"
+            ),
             documents=len(sources),
             chunks=len(chunks),
             page_visuals=sum(bool(item.visual_path) for item in chunks),
@@ -670,9 +1394,20 @@ class HybridKnowledgeRetriever:
             graph_edges=edges,
             stale=stale,
             built_at=self._manifest.get("built_at"),
+            cache={
+                "query_embedding": self._query_vector_cache.stats(),
+                "rerank": self._rerank_cache.stats(),
+                **(
+                    {"query_coalescing": self._query_batcher.stats()}
+                    if self._query_batcher is not None
+                    else {}
+                ),
+            },
             detail=(
                 f"embedding 最近一次降级：{self._last_embedding_error}"
                 if self._last_embedding_error
+                else f"索引预加载失败：{self._preload_error}"
+                if self._preload_error
                 else None
             ),
         )
@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import importlib.util
 import json
-import os
 import re
-import tempfile
+import sqlite3
 import threading
+from collections.abc import Callable
+from contextlib import closing
+from dataclasses import dataclass
 from datetime import UTC, datetime
 from pathlib import Path
 from uuid import uuid4
@@ -46,35 +50,18 @@ def file_checksum(path: Path) -> str:
     return digest.hexdigest()
 
 
-def _atomic_json(path: Path, value: object) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    temporary_path: Path | None = None
-    try:
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            dir=path.parent,
-            prefix=f".{path.name}.",
-            suffix=".tmp",
-            delete=False,
-        ) as temporary:
-            temporary_path = Path(temporary.name)
-            json.dump(value, temporary, ensure_ascii=False, indent=2, default=str)
-            temporary.flush()
-            os.fsync(temporary.fileno())
-        os.replace(temporary_path, path)
-    finally:
-        if temporary_path is not None:
-            temporary_path.unlink(missing_ok=True)
-
-
 def _registry_lock(path: Path) -> threading.RLock:
     key = str(path.resolve())
     with _REGISTRY_LOCKS_GUARD:
         return _REGISTRY_LOCKS.setdefault(key, threading.RLock())
 
 
-def _infer_metadata(path: Path, config: Settings) -> KnowledgeSource:
+def _infer_metadata(
+    path: Path,
+    config: Settings,
+    *,
+    checksum: str | None = None,
+) -> KnowledgeSource:
     title = path.stem.strip()
     year = YEAR_PATTERN.search(title)
     institution: str | None = None
@@ -105,21 +92,160 @@ def _infer_metadata(path: Path, config: Settings) -> KnowledgeSource:
         # baseline. User imports take the separate register_upload path and
         # always start private and unverified.
         verified=True,
-        checksum=file_checksum(path),
+        checksum=checksum or file_checksum(path),
     )
 
 
+@dataclass(slots=True)
+class _ScanState:
+    generation: int = 1
+    scanned: int = 0
+
+
+_SCAN_STATE: dict[str, _ScanState] = {}
+
+
+def _scan_key(index_dir: Path) -> str:
+    return str(index_dir.resolve())
+
+
+class SourceWatcher:
+    """Push raw-directory changes into the registry instead of polling it.
+
+    While a watcher runs, ``SourceRegistry.list()`` trusts the table until the
+    watcher reports a change. Requires the optional ``watchfiles`` package;
+    without it ``start()`` returns ``False`` and listing keeps stat-scanning.
+    """
+
+    def __init__(
+        self,
+        config: Settings = settings,
+        on_change: Callable[[], None] | None = None,
+    ) -> None:
+        self.raw_dir = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+        self._key = _scan_key(config.resolve_path(config.KNOWLEDGE_INDEX_DIR))
+        self._on_change = on_change
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> bool:
+        if self._task is not None:
+            return True
+        if importlib.util.find_spec("watchfiles") is None:
+            return False
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        _SCAN_STATE.pop(self._key, None)
+
+    async def _run(self) -> None:
+        from watchfiles import awatch
+
+        # Start dirty so the first listing after arming still scans the
+        # directory; changes made before the watch existed are not lost.
+        _SCAN_STATE[self._key] = _ScanState()
+        async for _changes in awatch(self.raw_dir, stop_event=self._stop):
+            state = _SCAN_STATE.setdefault(self._key, _ScanState())
+            state.generation += 1
+            if self._on_change is not None:
+                self._on_change()
+
+
 class SourceRegistry:
-    """Persist source provenance separately from generated retrieval indexes."""
+    """Persist source provenance separately from generated retrieval indexes.
+
+    Records live in an indexed SQLite table next to the retrieval index.
+    Checksums are cached against each file's (size, mtime, inode), so a
+    listing only rehashes files that actually changed. A legacy
+    ``sources.json`` is imported once and left untouched as a rollback source.
+    """
 
     def __init__(self, config: Settings = settings) -> None:
         self.config = config
         self.raw_dir = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
         self.index_dir = config.resolve_path(config.KNOWLEDGE_INDEX_DIR)
         self.path = self.index_dir / "sources.json"
+        self.database_path = self.index_dir / "sources.sqlite3"
         self._lock = _registry_lock(self.path)
+        self._scan_key = _scan_key(self.index_dir)
+        self.hashed_files = 0
+        with self._lock:
+            self._initialize()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout = 30000")
+        return connection
+
+    def _initialize(self) -> None:
+        try:
+            with closing(self._connect()) as connection:
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS knowledge_sources (
+                        id TEXT PRIMARY KEY,
+                        path TEXT NOT NULL UNIQUE,
+                        title TEXT NOT NULL,
+                        imported_by INTEGER,
+                        payload_json TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS ix_knowledge_source_owner
+                        ON knowledge_sources(imported_by, title);
+                    CREATE INDEX IF NOT EXISTS ix_knowledge_source_title
+                        ON knowledge_sources(title);
 
-    def _load(self) -> list[KnowledgeSource]:
+                    CREATE TABLE IF NOT EXISTS knowledge_file_stats (
+                        path TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        mtime_ns INTEGER NOT NULL,
+                        inode INTEGER NOT NULL,
+                        checksum TEXT NOT NULL
+                    );
+
+                    CREATE TABLE IF NOT EXISTS knowledge_registry_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    );
+                    """,
+                )
+                imported = connection.execute(
+                    "SELECT 1 FROM knowledge_registry_meta WHERE key = 'legacy_json_imported'",
+                ).fetchone()
+                if imported is None:
+                    legacy = self._load_legacy_json()
+                    connection.execute("BEGIN IMMEDIATE")
+                    try:
+                        if not connection.execute(
+                            "SELECT 1 FROM knowledge_sources LIMIT 1",
+                        ).fetchone():
+                            self._write_records(connection, legacy)
+                        connection.execute(
+                            "INSERT OR REPLACE INTO knowledge_registry_meta(key, value) "
+                            "VALUES ('legacy_json_imported', ?)",
+                            (datetime.now(UTC).isoformat(),),
+                        )
+                        connection.execute("COMMIT")
+                    except BaseException:
+                        connection.execute("ROLLBACK")
+                        raise
+        except sqlite3.Error as exc:
+            raise PersistentStateError(
+                f"知识源注册表损坏或不可读：{self.database_path}",
+            ) from exc
+
+    def _load_legacy_json(self) -> list[KnowledgeSource]:
         if not self.path.exists():
             return []
         try:
@@ -130,6 +256,26 @@ class SourceRegistry:
                 f"知识源注册表损坏或不可读：{self.path}",
             ) from exc
 
+    def _load(
+        self,
+        *,
+        user_id: int | None = None,
+        include_private: bool = True,
+    ) -> list[KnowledgeSource]:
+        query = "SELECT payload_json FROM knowledge_sources"
+        parameters: tuple[object, ...] = ()
+        if not include_private:
+            query += " WHERE imported_by IS NULL OR imported_by = ?"
+            parameters = (user_id,)
+        try:
+            with closing(self._connect()) as connection:
+                rows = connection.execute(query + " ORDER BY title, id", parameters).fetchall()
+            return [KnowledgeSource.model_validate_json(row["payload_json"]) for row in rows]
+        except (sqlite3.Error, ValueError) as exc:
+            raise PersistentStateError(
+                f"知识源注册表损坏或不可读：{self.database_path}",
+            ) from exc
+
     def list(
         self,
         *,
@@ -138,58 +284,161 @@ class SourceRegistry:
         include_private: bool = False,
     ) -> list[KnowledgeSource]:
         with self._lock:
-            records = self._list_unlocked(refresh=refresh)
-            if include_private:
-                return records
-            return [
-                record
-                for record in records
-                if record.imported_by is None or record.imported_by == user_id
-            ]
+            if refresh and not self._watched_and_clean():
+                self._refresh_unlocked()
+            return self._load(user_id=user_id, include_private=include_private)
 
     def _list_unlocked(self, *, refresh: bool = True) -> list[KnowledgeSource]:
-        records = self._load()
-        if not refresh:
-            return records
-        by_path = {record.path: record for record in records}
-        changed = False
-        for path in sorted(self.raw_dir.glob("*")):
-            if not path.is_file() or path.suffix.lower() not in {".md", ".txt", ".pdf"}:
-                continue
-            relative = portable_path(path, self.config)
-            checksum = file_checksum(path)
-            existing = by_path.get(relative)
-            if existing is None:
-                by_path[relative] = _infer_metadata(path, self.config)
-                changed = True
-            elif existing.checksum != checksum:
-                by_path[relative] = existing.model_copy(
-                    update={"checksum": checksum, "verified": False},
-                )
-                changed = True
-        active_paths = {
-            portable_path(path, self.config)
-            for path in self.raw_dir.glob("*")
+        if refresh and not self._watched_and_clean():
+            self._refresh_unlocked()
+        return self._load()
+
+    def _watched_and_clean(self) -> bool:
+        state = _SCAN_STATE.get(self._scan_key)
+        return state is not None and state.scanned == state.generation
+
+    def _refresh_unlocked(self) -> None:
+        state = _SCAN_STATE.get(self._scan_key)
+        generation = state.generation if state is not None else 0
+        files = [
+            path
+            for path in sorted(self.raw_dir.glob("*"))
             if path.is_file() and path.suffix.lower() in {".md", ".txt", ".pdf"}
-        }
-        result = sorted(
-            (record for path, record in by_path.items() if path in active_paths),
-            key=lambda item: item.title,
-        )
-        if changed or len(result) != len(records):
-            self.save(result)
-        return result
+        ]
+        try:
+            with closing(self._connect()) as connection:
+                cached_stats = {
+                    row["path"]: row
+                    for row in connection.execute("SELECT * FROM knowledge_file_stats")
+                }
+                records = {
+                    row["path"]: row["payload_json"]
+                    for row in connection.execute(
+                        "SELECT path, payload_json FROM knowledge_sources",
+                    )
+                }
+                upserts: list[KnowledgeSource] = []
+                stat_rows: list[tuple[str, int, int, int, str]] = []
+                active_paths: set[str] = set()
+                for path in files:
+                    relative = portable_path(path, self.config)
+                    active_paths.add(relative)
+                    stat = path.stat()
+                    cached = cached_stats.get(relative)
+                    if (
+                        cached is not None
+                        and cached["size"] == stat.st_size
+                        and cached["mtime_ns"] == stat.st_mtime_ns
+                        and cached["inode"] == stat.st_ino
+                    ):
+                        checksum = cached["checksum"]
+                    else:
+                        checksum = file_checksum(path)
+                        self.hashed_files += 1
+                        stat_rows.append(
+                            (relative, stat.st_size, stat.st_mtime_ns, stat.st_ino, checksum),
+                        )
+                    payload = records.get(relative)
+                    if payload is None:
+                        upserts.append(_infer_metadata(path, self.config, checksum=checksum))
+                        continue
+                    existing = KnowledgeSource.model_validate_json(payload)
+                    if existing.checksum != checksum:
+                        upserts.append(
+                            existing.model_copy(update={"checksum": checksum, "verified": False}),
+                        )
+                removed = [path for path in records if path not in active_paths]
+                stale_stats = [path for path in cached_stats if path not in active_paths]
+                if upserts or removed or stat_rows or stale_stats:
+                    connection.execute("BEGIN IMMEDIATE")
+                    try:
+                        connection.executemany(
+                            "INSERT OR REPLACE INTO knowledge_file_stats"
+                            "(path, size, mtime_ns, inode, checksum) VALUES (?, ?, ?, ?, ?)",
+                            stat_rows,
+                        )
+                        connection.executemany(
+                            "DELETE FROM knowledge_file_stats WHERE path = ?",
+                            [(path,) for path in stale_stats],
+                        )
+                        connection.executemany(
+                            "DELETE FROM knowledge_sources WHERE path = ?",
+                            [(path,) for path in removed],
+                        )
+                        self._upsert_records(connection, upserts)
+                        connection.execute("COMMIT")
+                    except BaseException:
+                        connection.execute("ROLLBACK")
+                        raise
+        except (sqlite3.Error, ValueError) as exc:
+            raise PersistentStateError(
+                f"知识源注册表损坏或不可读：{self.database_path}",
+            ) from exc
+        if state is not None:
+            state.scanned = generation
 
     def get(self, source_id: str) -> KnowledgeSource:
         with self._lock:
-            for record in self._list_unlocked():
-                if record.id == source_id:
-                    return record
-            raise KeyError(source_id)
+            if not self._watched_and_clean():
+                self._refresh_unlocked()
+            try:
+                with closing(self._connect()) as connection:
+                    row = connection.execute(
+                        "SELECT payload_json FROM knowledge_sources WHERE id = ?",
+                        (source_id,),
+                    ).fetchone()
+            except sqlite3.Error as exc:
+                raise PersistentStateError(
+                    f"知识源注册表损坏或不可读：{self.database_path}",
+                ) from exc
+            if row is None:
+                raise KeyError(source_id)
+            return KnowledgeSource.model_validate_json(row["payload_json"])
 
     def save(self, records: list[KnowledgeSource]) -> None:
         with self._lock:
-            _atomic_json(self.path, [record.model_dump(mode="json") for record in records])
+            with closing(self._connect()) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    self._write_records(connection, records)
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+
+    @classmethod
+    def _write_records(
+        cls,
+        connection: sqlite3.Connection,
+        records: list[KnowledgeSource],
+    ) -> None:
+        connection.execute("DELETE FROM knowledge_sources")
+        cls._upsert_records(connection, records)
+
+    @staticmethod
+    def _upsert_records(
+        connection: sqlite3.Connection,
+        records: list[KnowledgeSource],
+    ) -> None:
+        # Replacing by path keeps one record per file even when the id changes.
+        connection.executemany(
+            "DELETE FROM knowledge_sources WHERE path = ? AND id <> ?",
+            [(record.path, record.id) for record in records],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO knowledge_sources"
+            "(id, path, title, imported_by, payload_json) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    record.id,
+                    record.path,
+                    record.title,
+                    record.imported_by,
+                    record.model_dump_json(),
+                )
+                for record in records
+            ],
+        )
 
     def update(
         self,
@@ -240,7 +489,7 @@ class SourceRegistry:
                     changes.update({"verified_by": None, "verified_at": None})
                 updated = record.model_copy(update=changes)
                 records[index] = KnowledgeSource.model_validate(updated)
-                self.save(records)
+                self._store(records[index])
                 return records[index]
             raise KeyError(source_id)
 
@@ -255,7 +504,7 @@ class SourceRegistry:
         published_at: str | None = None,
     ) -> KnowledgeSource:
         with self._lock:
-            records = self._list_unlocked()
+            self._list_unlocked()
             relative = portable_path(path, self.config)
             record = KnowledgeSource(
                 id=f"src_{uuid4().hex}",
@@ -270,7 +519,20 @@ class SourceRegistry:
                 verified=False,
                 checksum=file_checksum(path),
             )
-            records = [item for item in records if item.path != relative]
-            records.append(record)
-            self.save(sorted(records, key=lambda item: item.title))
+            self._store(record)
             return record
+
+    def _store(self, record: KnowledgeSource) -> None:
+        try:
+            with closing(self._connect()) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    self._upsert_records(connection, [record])
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as exc:
+            raise PersistentStateError(
+                f"知识源注册表不可写：{self.database_path}",
+            ) from exc
@@ -16,11 +16,12 @@ from app.auth.router import router as auth_router
 from app.core.config import settings
 from app.db.database import create_db_and_tables
 from app.evolution.continuous import ContinuousEvolutionController
+from app.knowledge.sources import SourceWatcher
 from app.observability.tracing import configure_tracing, safe_span
 from app.runtime.orchestrator import RunOrchestrator
 from app.runtime.store import RuntimeStore
 from app.services.provider_config import ProviderConfigStore
-from app.services.state import MemoryStore, SkillStore
+from app.services.state import MemoryExpirySweeper, MemoryStore, SkillStore
 from app.tools.capabilities import CapabilityClients
 
 
@@ -34,7 +35,11 @@ async def lifespan(app: FastAPI):
     store = RuntimeStore(settings)
     clients = CapabilityClients(settings)
     evolution_controller = ContinuousEvolutionController(settings)
-    memory_store = MemoryStore(settings, evolution_controller)
+    memory_store = MemoryStore(
+        settings,
+        evolution_controller,
+        embedder=clients.retriever.embed_texts if settings.MEMORY_VECTOR_RECALL else None,
+    )
     app.state.runtime_store = store
     app.state.capability_clients = clients
     app.state.memory_store = memory_store
@@ -50,12 +55,30 @@ async def lifespan(app: FastAPI):
         evolution_controller=evolution_controller,
     )
     await app.state.orchestrator.recover_interrupted()
+    source_watcher = SourceWatcher(settings, on_change=clients.retriever.refresh)
+    if settings.KNOWLEDGE_WATCH_SOURCES:
+        source_watcher.start()
+    memory_sweeper = MemoryExpirySweeper(
+        memory_store,
+        settings,
+        on_expired=lambda memory: evolution_controller.record_memory_action(memory, "expired"),
+    )
+    memory_sweeper.start()
+    preload = clients.retriever.start_preload() if settings.KNOWLEDGE_PRELOAD else None
     yield
-    tasks = list(app.state.orchestrator._tasks.values())
+    if preload is not None:
+        preload.cancel()
+    await source_watcher.stop()
+    await memory_sweeper.stop()
+    tasks = [
+        *app.state.orchestrator._tasks.values(),
+        *app.state.orchestrator._precompactions.values(),
+    ]
     for task in tasks:
         task.cancel()
     if tasks:
         await asyncio.gather(*tasks, return_exceptions=True)
+    await memory_store.flush_access_times()
     await clients.close()
 
 
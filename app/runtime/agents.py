@@ -2,17 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
+import copy
 import hashlib
 import inspect
 import json
 import os
-from collections.abc import Awaitable, Callable
+import ssl
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Mapping
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, Protocol
 
-import frontmatter
 import httpx
+import openai
 from agentscope.agent import ReActAgent
 from agentscope.formatter import OpenAIChatFormatter
 from agentscope.memory import InMemoryMemory
@@ -22,7 +29,9 @@ from agentscope.plan import PlanNotebook
 from agentscope.tool import Toolkit, ToolResponse
 
 from app.core.config import Settings, settings
+from app.knowledge.retrieval import HybridKnowledgeRetriever
 from app.runtime.governance import untrusted_data_envelope
+from app.services.skill_catalog import CatalogSkill, skill_catalog
 from app.services.skill_policy import (
     SAFETY_CRITICAL_SKILLS,
     requires_offline_skill_review,
@@ -109,6 +118,11 @@ ROLE_CAPABILITIES = {
         "triage",
     },
 }
+
+AGENT_TEMPLATE_CACHE_SIZE = 256
+TOOL_ROLES = {"SupervisorAgent", "EvidenceAgent", "OphthalmologySpecialistAgent"}
+
+
 @dataclass(slots=True)
 class AgentReply:
     text: str
@@ -141,11 +155,100 @@ class CountingOpenAIChatModel(OpenAIChatModel):
         return response
 
 
+@dataclass(frozen=True, slots=True)
+class AgentTemplate:
+    """Run-independent parts of one role's agent: prompts, schemas, model config.
+
+    A template holds only strings and plain JSON-like data. Tool callables,
+    model clients, counters and memory stay per run, so sharing a template
+    across runs and users cannot carry patient context.
+    """
+
+    sys_prompt: str
+    skill_prompt: str
+    skill_ids: tuple[str, ...]
+    skills: tuple[tuple[str, str, str], ...]
+    tool_schemas: Mapping[str, dict]
+    model_kwargs: Mapping[str, Any]
+
+    def model(self) -> CountingOpenAIChatModel:
+        """A fresh model (own counters and connection pool) from the cached config."""
+        kwargs = copy.deepcopy(dict(self.model_kwargs))
+        kwargs["client_kwargs"]["http_client"] = openai.DefaultAsyncHttpxClient(
+            verify=_provider_ssl_context(),
+        )
+        return CountingOpenAIChatModel(**kwargs)
+
+    def toolkit(self, tools: list[Callable[..., Awaitable[ToolResponse]]]) -> Toolkit:
+        """A fresh toolkit with ``tools`` bound to the run, reusing parsed schemas."""
+        toolkit = Toolkit()
+        for tool in tools:
+            toolkit.register_tool_function(
+                tool,
+                json_schema=copy.deepcopy(self.tool_schemas[tool.__name__]),
+            )
+        for name, description, directory in self.skills:
+            toolkit.skills[name] = {"name": name, "description": description, "dir": directory}
+        return toolkit
+
+
+@lru_cache(maxsize=1)
+def _provider_ssl_context() -> ssl.SSLContext:
+    # Loading the CA bundle dominates client construction; the context holds
+    # no per-run state and is safe to share between connection pools.
+    return httpx.create_ssl_context()
+
+
+class AgentTemplateCache:
+    """Process-wide LRU of ``AgentTemplate`` keyed by role, Skill set and provider.
+
+    Building a template parses tool signatures and every enabled ``SKILL.md``;
+    a key includes each Skill's checksum and a hash of the provider settings,
+    so an edited Skill or a reconfigured model yields a new template.
+    """
+
+    def __init__(self, max_entries: int = AGENT_TEMPLATE_CACHE_SIZE) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[tuple, AgentTemplate] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, build: Callable[[], AgentTemplate]) -> AgentTemplate:
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return template
+        template = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = template
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+agent_templates = AgentTemplateCache()
+
+
 class AgentScopeRunner:
     """Creates isolated AgentScope agents per run/role.
 
-    Isolation prevents patient context from leaking between runs. Long-term
-    memory is handled separately through confirmed MemoryRecords.
+    Isolation prevents patient context from leaking between runs: every run
+    gets its own agents, memory, model counters and tool callables bound to
+    its clients and user. Only the immutable ``AgentTemplate`` (prompt text,
+    tool schemas, model config) is shared. Long-term memory is handled
+    separately through confirmed MemoryRecords.
+
+    Within one run, identical ``medical_retrieval``/``web_search`` calls from
+    any role share one result; ``tool_calls_deduplicated`` counts the reuse.
     """
 
     def __init__(self, clients: CapabilityClients, config: Settings = settings) -> None:
@@ -159,6 +262,8 @@ class AgentScopeRunner:
         self.user_id: int | None = None
         self.used_skill_ids: set[str] = set()
         self._skill_utility_provider: Callable[[str, str], float] | None = None
+        self._tool_memo: dict[tuple, asyncio.Future[str | None]] = {}
+        self.tool_calls_deduplicated = 0
 
     def set_run_context(
         self,
@@ -187,130 +292,180 @@ class AgentScopeRunner:
         bound = self.config.EVOLUTION_SKILL_RANKING_BOUND
         return min(1.0 + bound, max(1.0 - bound, value))
 
-    def _model(self, role: str) -> CountingOpenAIChatModel:
-        key = self.config.main_model_key.get_secret_value()
-        return CountingOpenAIChatModel(
-            model_name=self.config.main_model_name,
-            api_key=key,
-            stream=False,
-            reasoning_effort=self.config.AGENT_REASONING_EFFORT,
-            client_kwargs={
+    def _model_kwargs(self, role: str) -> dict[str, Any]:
+        return {
+            "model_name": self.config.main_model_name,
+            "api_key": self.config.main_model_key.get_secret_value(),
+            "stream": False,
+            "reasoning_effort": self.config.AGENT_REASONING_EFFORT,
+            "client_kwargs": {
                 "base_url": self.config.main_model_url,
                 "timeout": self.config.REQUEST_TIMEOUT_SECONDS,
                 "max_retries": self.config.MAX_RETRIES,
             },
-            generate_kwargs={
+            "generate_kwargs": {
                 "temperature": self.config.TEMPERATURE,
                 "max_tokens": self._max_output_tokens(role),
             },
-        )
+        }
 
-    def _toolkit(self, role: str) -> Toolkit:
+    def _template(self, role: str) -> AgentTemplate:
+        """The shared template for ``role`` and the Skills enabled in this run."""
         base_role = self._base_role(role)
-        toolkit = Toolkit()
+        skills = self._enabled_skills(base_role)
+        model_kwargs = self._model_kwargs(base_role)
+        provider = hashlib.sha256(
+            json.dumps(model_kwargs, sort_keys=True, default=str).encode("utf-8"),
+        ).hexdigest()
+        key = (
+            base_role,
+            tuple((skill.id, skill.checksum, str(skill.directory)) for skill in skills),
+            provider,
+        )
+        template = agent_templates.get(
+            key,
+            lambda: self._build_template(base_role, skills, model_kwargs),
+        )
+        self.used_skill_ids.update(template.skill_ids)
+        return template
+
+    def _build_template(
+        self,
+        base_role: str,
+        skills: list[CatalogSkill],
+        model_kwargs: dict[str, Any],
+    ) -> AgentTemplate:
+        prototype = Toolkit()
+        for tool in self._tool_functions(base_role):
+            prototype.register_tool_function(tool)
+        for skill in skills:
+            prototype.register_agent_skill(str(skill.directory))
+        skill_prompt = prototype.get_agent_skill_prompt() or ""
+        return AgentTemplate(
+            sys_prompt=AGENT_PROMPTS[base_role] + "\n" + skill_prompt + IMMUTABLE_SKILL_BOUNDARY,
+            skill_prompt=skill_prompt,
+            skill_ids=tuple(skill.id for skill in skills),
+            skills=tuple(
+                (skill["name"], skill["description"], skill["dir"])
+                for skill in prototype.skills.values()
+            ),
+            tool_schemas=MappingProxyType(
+                {name: copy.deepcopy(tool.json_schema) for name, tool in prototype.tools.items()},
+            ),
+            model_kwargs=MappingProxyType(model_kwargs),
+        )
+
+    def _toolkit(self, role: str, template: AgentTemplate | None = None) -> Toolkit:
+        template = template or self._template(role)
+        return template.toolkit(self._tool_functions(self._base_role(role)))
+
+    def _tool_functions(self, base_role: str) -> list[Callable[..., Awaitable[ToolResponse]]]:
+        """Tool callables bound to this run's clients and user."""
+        if base_role not in TOOL_ROLES:
+            return []
 
         async def medical_retrieval(query: str, top_k: int = 6) -> ToolResponse:
             """检索本地眼科指南，返回带来源与定位的证据。"""
-            result = await self.clients.retrieve_medical_evidence(
-                query,
-                top_k,
-                user_id=self.user_id,
-            )
-            payload = untrusted_data_envelope(
-                "retrieved_medical_evidence",
-                result.model_dump(mode="json"),
-            )
-            return ToolResponse(
-                content=[{"type": "text", "text": json.dumps(payload, ensure_ascii=False)}],
-            )
+            query = HybridKnowledgeRetriever.normalize_query(query)
+
+            async def call() -> str:
+                result = await self.clients.retrieve_medical_evidence(
+                    query,
+                    top_k,
+                    user_id=self.user_id,
+                )
+                payload = untrusted_data_envelope(
+                    "retrieved_medical_evidence",
+                    result.model_dump(mode="json"),
+                )
+                return json.dumps(payload, ensure_ascii=False)
+
+            text = await self._memoized_tool(("medical_retrieval", self.user_id, query, top_k), call)
+            return ToolResponse(content=[{"type": "text", "text": text}])
 
         async def web_search(query: str, max_results: int = 5) -> ToolResponse:
             """在本地证据不足或需要最新信息时检索外部资料。"""
-            result = await self.clients.search_web(SearchRequest(query=query, max_results=max_results))
-            payload = untrusted_data_envelope(
-                "web_search_results",
-                result.model_dump(mode="json"),
-            )
-            return ToolResponse(
-                content=[{"type": "text", "text": json.dumps(payload, ensure_ascii=False)}],
-            )
+            query = HybridKnowledgeRetriever.normalize_query(query)
 
-        if base_role in {
-            "SupervisorAgent",
-            "EvidenceAgent",
-            "OphthalmologySpecialistAgent",
-        }:
-            toolkit.register_tool_function(medical_retrieval)
-            toolkit.register_tool_function(web_search)
-
-        for path in self._enabled_skill_paths(base_role):
-            toolkit.register_agent_skill(str(path))
-            try:
-                post = frontmatter.load(path / "SKILL.md")
-                skill_id = str(post.get("name") or path.name)
-            except (OSError, ValueError, TypeError):
-                skill_id = path.name
-            self.used_skill_ids.add(skill_id)
-        return toolkit
+            async def call() -> str:
+                result = await self.clients.search_web(SearchRequest(query=query, max_results=max_results))
+                payload = untrusted_data_envelope(
+                    "web_search_results",
+                    result.model_dump(mode="json"),
+                )
+                return json.dumps(payload, ensure_ascii=False)
+
+            text = await self._memoized_tool(("web_search", self.user_id, query, max_results), call)
+            return ToolResponse(content=[{"type": "text", "text": text}])
+
+        return [medical_retrieval, web_search]
+
+    async def _memoized_tool(self, key: tuple, call: Callable[[], Awaitable[str]]) -> str:
+        """Run ``call`` once per ``key`` in this run; concurrent callers share it.
+
+        Failed calls are not remembered: waiters then retry on their own.
+        """
+        while (pending := self._tool_memo.get(key)) is not None:
+            text = await asyncio.shield(pending)
+            if text is not None:
+                self.tool_calls_deduplicated += 1
+                return text
+        future: asyncio.Future[str | None] = asyncio.get_running_loop().create_future()
+        self._tool_memo[key] = future
+        try:
+            text = await call()
+        except BaseException:
+            self._tool_memo.pop(key, None)
+            future.set_result(None)
+            raise
+        future.set_result(text)
+        return text
+
+    def _skill_prompt(self, role: str) -> str:
+        """The role's Skill prompt from its cached template."""
+        return self._template(role).skill_prompt
 
     def _enabled_skill_paths(self, role: str) -> list[Path]:
-        skill_root = self.config.resolve_path(self.config.SKILL_ROOT)
-        state_path = self.config.resolve_path(self.config.SKILL_STATE_PATH)
-        states: dict[str, dict] = {}
-        if state_path.is_file():
-            try:
-                raw = json.loads(state_path.read_text("utf-8"))
-                states = {
-                    str(key): ({"status": value} if isinstance(value, str) else dict(value))
-                    for key, value in raw.items()
-                }
-            except (OSError, ValueError, TypeError):
-                states = {}
-        selected: list[tuple[int, float, str, Path]] = []
+        return [skill.directory for skill in self._enabled_skills(role)]
+
+    def _enabled_skills(self, role: str) -> list[CatalogSkill]:
+        """Select the role's Skills from the process-wide catalog (no file reads)."""
+        snapshot = skill_catalog(self.config).snapshot()
+        states = snapshot.states or {}
+        selected: list[tuple[int, float, str, CatalogSkill]] = []
         for skill_name in ROLE_SKILLS.get(role, []):
-            path = skill_root / skill_name
-            if path.is_dir() and states.get(skill_name, {}).get("status", "enabled") == "enabled":
-                try:
-                    post = frontmatter.load(path / "SKILL.md")
-                    risk_level = str(post.get("risk_level") or "routine")
-                except (OSError, ValueError, TypeError):
-                    risk_level = "routine"
+            skill = snapshot.role_skill(skill_name)
+            if skill is not None and states.get(skill_name, {}).get("status", "enabled") == "enabled":
+                risk_level = skill.risk_level if skill.parsed else "routine"
                 priority = 3 if skill_name in SAFETY_CRITICAL_SKILLS else 2
                 selected.append(
                     (
                         priority,
                         self._skill_utility(skill_name, risk_level),
                         skill_name,
-                        path,
+                        skill,
                     ),
                 )
-        for skill_md in sorted((skill_root / ".candidates").glob("**/SKILL.md")):
-            try:
-                post = frontmatter.load(skill_md)
-            except (OSError, ValueError, TypeError):
+        for skill in snapshot.candidates():
+            if not skill.parsed:
                 continue
-            skill_id = str(post.get("name") or "")
-            risk_level = str(post.get("risk_level") or "routine")
-            dependencies = list(post.get("dependencies") or [])
+            skill_id = skill.name
+            risk_level = skill.risk_level
+            dependencies = list(skill.dependencies)
             if states.get(skill_id, {}).get("status") != "enabled":
                 continue
             if self.requested_skill_ids and skill_id not in self.requested_skill_ids:
                 continue
-            plugins = set(post.get("plugins") or [])
-            capabilities = set(post.get("capabilities") or [])
+            plugins = set(skill.plugins)
+            capabilities = set(skill.capabilities)
             if self.active_plugin_ids and plugins and not self.active_plugin_ids.intersection(plugins):
                 continue
             if capabilities and not capabilities.intersection(ROLE_CAPABILITIES.get(role, set())):
                 continue
-            evaluation_path = (
-                self.config.resolve_path(self.config.SKILL_EVALUATION_DIR)
-                / f"{skill_id}.json"
-            )
-            try:
-                evaluation = json.loads(evaluation_path.read_text("utf-8"))
-                checksum = hashlib.sha256(skill_md.read_bytes()).hexdigest()
-            except (OSError, ValueError, TypeError):
+            evaluation = snapshot.evaluations.get(skill_id)
+            if not evaluation:
                 continue
+            checksum = skill.checksum
             approval = evaluation.get("user_approval")
             user_approved = (
                 isinstance(approval, dict)
@@ -352,7 +507,7 @@ class AgentScopeRunner:
                         4 if explicitly_requested else 1,
                         utility,
                         skill_id,
-                        skill_md.parent,
+                        skill,
                     ),
                 )
         selected.sort(
@@ -364,19 +519,13 @@ class AgentScopeRunner:
     def _agent(self, role: str) -> ReActAgent:
         base_role = self._base_role(role)
         if role not in self._agents:
-            toolkit = self._toolkit(role)
-            skill_prompt = toolkit.get_agent_skill_prompt() or ""
+            template = self._template(role)
             self._agents[role] = ReActAgent(
                 name=role.replace(":", "_"),
-                sys_prompt=(
-                    AGENT_PROMPTS[base_role]
-                    + "\n"
-                    + skill_prompt
-                    + IMMUTABLE_SKILL_BOUNDARY
-                ),
-                model=self._model(base_role),
+                sys_prompt=template.sys_prompt,
+                model=template.model(),
                 formatter=OpenAIChatFormatter(),
-                toolkit=toolkit,
+                toolkit=self._toolkit(role, template),
                 memory=InMemoryMemory(),
                 plan_notebook=(
                     PlanNotebook(max_subtasks=12)
@@ -483,7 +632,7 @@ class AgentScopeRunner:
                     "content": (
                         AGENT_PROMPTS[self._base_role(role)]
                         + "\n"
-                        + (self._toolkit(role).get_agent_skill_prompt() or "")
+                        + self._skill_prompt(role)
                     ),
                 },
                 {"role": "user", "content": prompt},
@@ -24,27 +24,19 @@ from app.domain.models import (
     PlanNode,
     RunInput,
     RunRecord,
-    RunStatus,
     TaskRoute,
     utc_now,
 )
 from app.runtime.errors import BudgetExceeded, ContextCompactionError
+from app.runtime.tokens import TokenCounter, token_counter
 
 if TYPE_CHECKING:
     from app.runtime.store import RuntimeStore
 
 
-_TERMINAL_WITH_ANSWER = {
-    RunStatus.COMPLETED,
-    RunStatus.COMPLETED_WITH_WARNINGS,
-}
-_CONTEXT_SOURCE_STATUSES = {
-    *_TERMINAL_WITH_ANSWER,
-    RunStatus.WAITING,
-    RunStatus.FAILED,
-    RunStatus.CANCELLED,
-}
 _EVIDENCE_ID = re.compile(r"\[ev_[A-Za-z0-9_-]+\]")
+_TURN_SEPARATOR = "\n\n"
+_RECENT_HEADER = "高价值历史原文：\n"
 _HIGH_VALUE_USER_TURN = re.compile(
     r"(不是|更正|纠正|改为|撤回|已停|停用|过敏|左眼|右眼|双眼|"
     r"\d+(?:\.\d+)?\s*(?:mg|g|ml|mmHg|次|片|滴|天|周|月|年))",
@@ -57,32 +49,12 @@ _SUMMARY_CLINICAL_DETAIL = re.compile(
 )
 
 
-def _encoding_for_model(model_name: str):
-    import tiktoken
-
-    try:
-        return tiktoken.encoding_for_model(model_name)
-    except KeyError:
-        return tiktoken.get_encoding("o200k_base")
-
-
 def _token_count(text: str, model_name: str) -> int:
-    if not text:
-        return 0
-    return len(_encoding_for_model(model_name).encode(text))
+    return token_counter(model_name).count(text)
 
 
 def _truncate(text: str, max_tokens: int, model_name: str) -> str:
-    if not text or max_tokens <= 0:
-        return ""
-    encoding = _encoding_for_model(model_name)
-    tokens = encoding.encode(text)
-    if len(tokens) <= max_tokens:
-        return text.strip()
-    suffix = "…"
-    suffix_tokens = encoding.encode(suffix)
-    keep = max(0, max_tokens - len(suffix_tokens))
-    return encoding.decode(tokens[:keep]).rstrip() + suffix
+    return token_counter(model_name).truncate_within(text, max_tokens)
 
 
 class ConversationTurn(BaseModel):
@@ -91,6 +63,10 @@ class ConversationTurn(BaseModel):
     answer: str
     created_at: datetime
     route: TaskRoute | None = None
+    version: int = 1
+    # Persisted in the context ledger for the configured main model.
+    turn_tokens: int | None = None
+    raw_tokens: int | None = None
 
 
 class ConversationSummary(BaseModel):
@@ -147,19 +123,14 @@ class ConversationContextManager:
             return None
 
         excluded = await self._regeneration_ancestors(run_input.regenerated_from)
-        runs = await self.store.list_conversation_runs(
+        turns = await self._ledger_turns(
             user_id,
             conversation_id,
-            limit=self.config.CONTEXT_MAX_SOURCE_TURNS * 3,
+            exclude=excluded,
+            limit=self.config.CONTEXT_MAX_SOURCE_TURNS,
         )
-        turns = self._latest_answer_versions(runs, excluded)
-        if len(turns) > self.config.CONTEXT_MAX_SOURCE_TURNS:
-            turns = turns[-self.config.CONTEXT_MAX_SOURCE_TURNS :]
 
-        source_signature = "|".join(
-            f"{turn.run_id}:{next(item.version for item in runs if item.id == turn.run_id)}"
-            for turn in turns
-        )
+        source_signature = "|".join(f"{turn.run_id}:{turn.version}" for turn in turns)
         source_hash = hashlib.sha256(source_signature.encode("utf-8")).hexdigest()
         cache_key = self._cache_key(user_id, conversation_id, source_hash)
         cached = await self.store.find_context_snapshot(
@@ -167,22 +138,11 @@ class ConversationContextManager:
             conversation_id,
             cache_key,
         )
-        if cached is not None and cached.get("compaction_status") in {
-            "not_needed",
-            "completed",
-        }:
-            snapshot = ConversationContextSnapshot.model_validate(cached).model_copy(
-                update={
-                    "id": f"ctx_{run_id.removeprefix('run_')}",
-                    "run_id": run_id,
-                    "stats": ContextStats.model_validate(cached["stats"]).model_copy(
-                        update={"cache_hit": True},
-                    ),
-                    "created_at": utc_now(),
-                },
-            )
-            return snapshot
+        reused = self.reuse(cached, run_id)
+        if reused is not None:
+            return reused
 
+        await self._count_turns(turns)
         (
             prompt_text,
             retained_source_run_ids,
@@ -209,6 +169,28 @@ class ConversationContextManager:
         )
         return snapshot
 
+    @staticmethod
+    def reuse(
+        cached: dict[str, Any] | None,
+        run_id: str,
+    ) -> ConversationContextSnapshot | None:
+        """Adopt a stored snapshot for ``run_id`` if it needs no more compaction."""
+        if cached is None or cached.get("compaction_status") not in {
+            "not_needed",
+            "completed",
+        }:
+            return None
+        return ConversationContextSnapshot.model_validate(cached).model_copy(
+            update={
+                "id": f"ctx_{run_id.removeprefix('run_')}",
+                "run_id": run_id,
+                "stats": ContextStats.model_validate(cached["stats"]).model_copy(
+                    update={"cache_hit": True},
+                ),
+                "created_at": utc_now(),
+            },
+        )
+
     def cache_key(self, snapshot: ConversationContextSnapshot) -> str:
         return self._cache_key(
             snapshot.user_id,
@@ -234,60 +216,62 @@ class ConversationContextManager:
         ).hexdigest()
 
     async def _regeneration_ancestors(self, run_id: str | None) -> set[str]:
-        excluded: set[str] = set()
-        cursor = run_id
-        while cursor and cursor not in excluded:
-            excluded.add(cursor)
-            run = await self.store.get_run(cursor)
-            cursor = run.input.regenerated_from if run is not None else None
-        return excluded
+        if not run_id:
+            return set()
+        return await self.store.regeneration_lineage(run_id)
 
-    @staticmethod
-    def _latest_answer_versions(
-        runs: list[RunRecord],
-        excluded: set[str],
+    async def _ledger_turns(
+        self,
+        user_id: int,
+        conversation_id: int,
+        *,
+        exclude: set[str] | None = None,
+        limit: int,
     ) -> list[ConversationTurn]:
-        candidates = [
-            run
-            for run in runs
-            if run.id not in excluded
-            and run.status in _CONTEXT_SOURCE_STATUSES
-            and bool(run.input.query.strip())
-        ]
-        by_id = {run.id: run for run in candidates}
-
-        def family_root(run: RunRecord) -> str:
-            cursor = run
-            seen: set[str] = set()
-            while cursor.input.regenerated_from and cursor.input.regenerated_from not in seen:
-                seen.add(cursor.id)
-                parent = by_id.get(cursor.input.regenerated_from)
-                if parent is None:
-                    return cursor.input.regenerated_from
-                cursor = parent
-            return cursor.id
-
-        latest: dict[str, RunRecord] = {}
-        for run in candidates:
-            root = family_root(run)
-            current = latest.get(root)
-            if current is None or (run.created_at, run.version) > (
-                current.created_at,
-                current.version,
-            ):
-                latest[root] = run
-        selected = sorted(latest.values(), key=lambda item: item.created_at)
+        """Read the latest answer of each turn from the context ledger.
+
+        The store keeps one ledger row per answer-bearing Run, written in the
+        same transaction as the Run revision, so only turns that changed since
+        the last build need to be counted again. Regeneration families are
+        resolved by the store's indexed lineage columns.
+        """
+        rows = await self.store.list_context_turns(
+            user_id,
+            conversation_id,
+            exclude=exclude or (),
+            limit=limit,
+        )
+        model = self.config.main_model_name
         return [
             ConversationTurn(
-                run_id=run.id,
-                query=run.input.query,
-                answer=run.answer or "",
-                created_at=run.created_at,
-                route=run.route,
+                run_id=row["run_id"],
+                query=row["query"],
+                answer=row["answer"],
+                created_at=row["created_at"],
+                route=(
+                    TaskRoute.model_validate_json(row["route_json"])
+                    if row["route_json"]
+                    else None
+                ),
+                version=row["version"],
+                turn_tokens=row["turn_tokens"] if row["token_model"] == model else None,
+                raw_tokens=row["raw_tokens"] if row["token_model"] == model else None,
             )
-            for run in selected
+            for row in rows
         ]
 
+    async def _count_turns(self, turns: list[ConversationTurn]) -> None:
+        """Count turns the ledger has no tokens for yet and persist the counts."""
+        counter = token_counter(self.config.main_model_name)
+        counted: dict[str, tuple[int, int]] = {}
+        for turn in turns:
+            if turn.turn_tokens is not None and turn.raw_tokens is not None:
+                continue
+            turn.turn_tokens = counter.count(self._render_turn(turn))
+            turn.raw_tokens = counter.count(f"{turn.query}\n{turn.answer}")
+            counted[turn.run_id] = (turn.turn_tokens, turn.raw_tokens)
+        await self.store.save_context_turn_tokens(self.config.main_model_name, counted)
+
     def _pack_initial(
         self,
         turns: list[ConversationTurn],
@@ -295,12 +279,14 @@ class ConversationContextManager:
     ) -> tuple[str, list[str], Literal["not_needed", "pending"], ContextStats]:
         """Keep full history below the trigger; otherwise stage model compaction."""
 
-        model = self.config.main_model_name
+        counter = token_counter(self.config.main_model_name)
         max_tokens = self.config.CONVERSATION_CONTEXT_MAX_INPUT_TOKENS
-        all_text = "\n".join(f"{item.query}\n{item.answer}" for item in turns)
-        tokens_before = _token_count(all_text, model)
+        # Totals are summed from per-turn ledger counts, so building turn N+1
+        # only encodes the new turn instead of the whole rendered history.
+        tokens_before = sum(self._raw_tokens(counter, turn) for turn in turns)
+        if len(turns) > 1:
+            tokens_before += counter.count("\n") * (len(turns) - 1)
         prefix = self._history_prefix()
-        full_prompt = self._render_history(prefix, None, turns)
         trigger = max(
             256,
             int(
@@ -308,8 +294,8 @@ class ConversationContextManager:
                 * min(0.95, max(0.5, self.config.CONTEXT_COMPRESSION_TRIGGER_RATIO))
             ),
         )
-        if _token_count(full_prompt, model) <= trigger:
-            prompt_text = full_prompt
+        if self._history_tokens(counter, prefix, turns) <= trigger:
+            selected = turns
             retained = [turn.run_id for turn in turns]
             status: Literal["not_needed", "pending"] = "not_needed"
         else:
@@ -325,21 +311,25 @@ class ConversationContextManager:
                 for turn in turns
                 if turn.run_id in recent_ids or _HIGH_VALUE_USER_TURN.search(turn.query)
             ]
+            # Count each rendered turn once and add up, instead of re-rendering
+            # and re-encoding the growing selection for every candidate.
             selected: list[ConversationTurn] = []
+            selected_tokens = 0
+            separator_tokens = counter.count(_TURN_SEPARATOR)
             for turn in reversed(candidates):
-                candidate = [turn, *selected]
+                turn_tokens = self._turn_tokens(counter, turn) + (
+                    separator_tokens if selected else 0
+                )
                 is_mandatory = bool(_HIGH_VALUE_USER_TURN.search(turn.query))
-                if (
-                    not is_mandatory
-                    and _token_count(self._render_recent(candidate), model) > recent_limit
-                ):
+                if not is_mandatory and selected_tokens + turn_tokens > recent_limit:
                     continue
-                selected = candidate
-            prompt_text = self._render_history(prefix, None, selected)
+                selected = [turn, *selected]
+                selected_tokens += turn_tokens
             retained = [turn.run_id for turn in selected]
             status = "pending"
 
-        tokens_after = _token_count(prompt_text, model)
+        prompt_text = self._render_history(prefix, None, selected)
+        tokens_after = self._history_tokens(counter, prefix, selected)
         stats = ContextStats(
             source_turns=len(turns),
             retained_turns=len(retained),
@@ -526,12 +516,11 @@ class ConversationContextManager:
         self,
         snapshot: ConversationContextSnapshot,
     ) -> list[ConversationTurn]:
-        runs = await self.store.list_conversation_runs(
+        turns = await self._ledger_turns(
             snapshot.user_id,
             snapshot.conversation_id,
             limit=self.config.CONTEXT_MAX_SOURCE_TURNS * 3,
         )
-        turns = self._latest_answer_versions(runs, set())
         by_id = {turn.run_id: turn for turn in turns}
         selected = [
             by_id[run_id]
@@ -554,14 +543,46 @@ class ConversationContextManager:
         )
 
     @staticmethod
-    def _render_recent(turns: list[ConversationTurn]) -> str:
-        return "\n\n".join(
-            (
-                f"[历史原文 run_id={turn.run_id}]\n"
-                f"用户：{turn.query}\n"
-                f"历史助手回答（待核验）：{_EVIDENCE_ID.sub('', turn.answer)}"
-            )
-            for turn in turns
+    def _render_turn(turn: ConversationTurn) -> str:
+        return (
+            f"[历史原文 run_id={turn.run_id}]\n"
+            f"用户：{turn.query}\n"
+            f"历史助手回答（待核验）：{_EVIDENCE_ID.sub('', turn.answer)}"
+        )
+
+    @classmethod
+    def _render_recent(cls, turns: list[ConversationTurn]) -> str:
+        return _TURN_SEPARATOR.join(cls._render_turn(turn) for turn in turns)
+
+    @classmethod
+    def _turn_tokens(cls, counter: TokenCounter, turn: ConversationTurn) -> int:
+        if turn.turn_tokens is None:
+            return counter.count(cls._render_turn(turn))
+        return turn.turn_tokens
+
+    @staticmethod
+    def _raw_tokens(counter: TokenCounter, turn: ConversationTurn) -> int:
+        if turn.raw_tokens is None:
+            return counter.count(f"{turn.query}\n{turn.answer}")
+        return turn.raw_tokens
+
+    @classmethod
+    def _history_tokens(
+        cls,
+        counter: TokenCounter,
+        prefix: str,
+        turns: list[ConversationTurn],
+    ) -> int:
+        """Token size of ``_render_history(prefix, None, turns)`` from turn counts."""
+        if not turns:
+            return 0
+        separator_tokens = counter.count(_TURN_SEPARATOR)
+        return (
+            counter.count(prefix)
+            + separator_tokens
+            + counter.count(_RECENT_HEADER)
+            + sum(cls._turn_tokens(counter, turn) for turn in turns)
+            + separator_tokens * (len(turns) - 1)
         )
 
     def _render_history(
@@ -578,7 +599,7 @@ class ConversationContextManager:
             )
         recent_text = self._render_recent(retained_turns)
         if recent_text:
-            sections.append("高价值历史原文：\n" + recent_text)
+            sections.append(_RECENT_HEADER + recent_text)
         return "\n\n".join(sections) if retained_turns or summary is not None else ""
 
 
@@ -694,55 +715,115 @@ def _merge_context(base: dict[str, Any], overlay: dict[str, Any]) -> dict[str, A
     return merged
 
 
+class _ContextPacker:
+    """Compact JSON payloads, serializing each node of the input once.
+
+    Fit checks and budget allocation count the exact serialized text, as the
+    former recursive compactor did, so BPE merges across delimiters are
+    priced correctly. Serialized fragments and their token counts are
+    memoized per input node, and candidates are assembled from fragments
+    instead of re-serializing every subtree at each level.
+    """
+
+    def __init__(self, counter: TokenCounter) -> None:
+        self.counter = counter
+        self._fragments: dict[int, str] = {}
+        self._sizes: dict[int, int] = {}
+
+    def fragment(self, value: Any) -> str:
+        """Return ``json_dumps(value)`` built from memoized child fragments."""
+        key = id(value)
+        cached = self._fragments.get(key)
+        if cached is not None:
+            return cached
+        if isinstance(value, dict) and all(isinstance(item_key, str) for item_key in value):
+            serialized = _json_object({item_key: self.fragment(item) for item_key, item in value.items()})
+        elif isinstance(value, list):
+            serialized = _json_array([self.fragment(item) for item in value])
+        else:
+            serialized = json_dumps(value)
+        self._fragments[key] = serialized
+        return serialized
+
+    def size(self, value: Any) -> int:
+        key = id(value)
+        cached = self._sizes.get(key)
+        if cached is None:
+            cached = self._sizes[key] = self.counter.count(self.fragment(value))
+        return cached
+
+    def pack(self, value: Any, max_tokens: int) -> tuple[Any, int]:
+        """Return ``(compacted value, its token size)`` within ``max_tokens``."""
+        compacted, serialized = self._pack(value, max_tokens)
+        if compacted is value:
+            return compacted, self.size(value)
+        return compacted, self.counter.count(serialized)
+
+    def _pack(self, value: Any, max_tokens: int) -> tuple[Any, str]:
+        if max_tokens <= 0:
+            return None, "null"
+        if self.size(value) <= max_tokens:
+            return value, self.fragment(value)
+        if isinstance(value, str):
+            return self._leaf(self.counter.truncate_within(value, max_tokens))
+        if isinstance(value, (int, float, bool)) or value is None:
+            return value, self.fragment(value)
+        if isinstance(value, list):
+            if not value:
+                return [], "[]"
+            result: list[Any] = []
+            parts: list[str] = []
+            item_budget = max(12, max_tokens // min(len(value), 8))
+            for item in value[:8]:
+                compacted, part = self._pack(item, item_budget)
+                if self.counter.count(_json_array([*parts, part])) > max_tokens:
+                    break
+                result.append(compacted)
+                parts.append(part)
+            return result, _json_array(parts)
+        if isinstance(value, dict):
+            ordered = sorted(
+                value.items(),
+                key=lambda item: (_CONTEXT_KEY_PRIORITY.get(str(item[0]), 100), str(item[0])),
+            )
+            packed: dict[str, Any] = {}
+            fragments: dict[str, str] = {}
+            used = self.counter.count("{}")
+            for index, (key, item) in enumerate(ordered):
+                remaining_keys = max(1, len(ordered) - index)
+                remaining = max_tokens - used
+                if remaining < 8:
+                    break
+                compacted, part = self._pack(item, max(8, remaining // remaining_keys))
+                candidate_tokens = self.counter.count(_json_object({**fragments, str(key): part}))
+                if candidate_tokens <= max_tokens:
+                    packed[str(key)] = compacted
+                    fragments[str(key)] = part
+                    used = candidate_tokens
+            return packed, _json_object(fragments)
+        return self._leaf(self.counter.truncate_within(str(value), max_tokens))
+
+    @staticmethod
+    def _leaf(value: str) -> tuple[str, str]:
+        return value, json_dumps(value)
+
+
+def _json_array(fragments: list[str]) -> str:
+    return "[" + ", ".join(fragments) + "]"
+
+
+def _json_object(fragments: dict[str, str]) -> str:
+    # Same layout as json_dumps: sorted keys, ", " and ": " separators.
+    return "{" + ", ".join(f"{json_dumps(key)}: {fragments[key]}" for key in sorted(fragments)) + "}"
+
+
 def _compact_context_value(
     value: Any,
     max_tokens: int,
     model_name: str,
 ) -> Any:
     """Compact valid JSON values while retaining safety and provenance keys first."""
-    if max_tokens <= 0:
-        return None
-    serialized = json_dumps(value)
-    if _token_count(serialized, model_name) <= max_tokens:
-        return value
-    if isinstance(value, str):
-        return _truncate(value, max_tokens, model_name)
-    if isinstance(value, (int, float, bool)) or value is None:
-        return value
-    if isinstance(value, list):
-        if not value:
-            return []
-        result: list[Any] = []
-        item_budget = max(12, max_tokens // min(len(value), 8))
-        for item in value[:8]:
-            compacted = _compact_context_value(item, item_budget, model_name)
-            candidate = [*result, compacted]
-            if _token_count(json_dumps(candidate), model_name) > max_tokens:
-                break
-            result.append(compacted)
-        return result
-    if isinstance(value, dict):
-        ordered = sorted(
-            value.items(),
-            key=lambda item: (_CONTEXT_KEY_PRIORITY.get(str(item[0]), 100), str(item[0])),
-        )
-        result: dict[str, Any] = {}
-        for index, (key, item) in enumerate(ordered):
-            remaining_keys = max(1, len(ordered) - index)
-            used = _token_count(json_dumps(result), model_name)
-            remaining = max_tokens - used
-            if remaining < 8:
-                break
-            compacted = _compact_context_value(
-                item,
-                max(8, remaining // remaining_keys),
-                model_name,
-            )
-            candidate = {**result, str(key): compacted}
-            if _token_count(json_dumps(candidate), model_name) <= max_tokens:
-                result[str(key)] = compacted
-        return result
-    return _truncate(str(value), max_tokens, model_name)
+    return _ContextPacker(token_counter(model_name)).pack(value, max_tokens)[0]
 
 
 def json_dumps(value: Any) -> str:
@@ -779,7 +860,8 @@ class ExecutionContextManager:
             max(0.5, self.config.CONTEXT_COMPRESSION_TRIGGER_RATIO),
         )
         soft_limit = max(256, int(limit * trigger_ratio))
-        tokens_before = _token_count(json_dumps(raw), model)
+        raw_json = json_dumps(raw)
+        tokens_before = _token_count(raw_json, model)
         compressed = tokens_before > soft_limit
         critical_payload, preserved_fields = _critical_context(raw)
         critical_tokens = _token_count(json_dumps(critical_payload), model)
@@ -807,7 +889,7 @@ class ExecutionContextManager:
                 "红旗、用药、过敏、未解决问题或证据定位超过上下文安全预算；"
                 "不能静默截断关键临床字段",
             )
-        source_hash = hashlib.sha256(json_dumps(raw).encode()).hexdigest()
+        source_hash = hashlib.sha256(raw_json.encode()).hexdigest()
         checkpoint = NodeContextCheckpoint(
             id=(
                 f"nctx_{run.id.removeprefix('run_')}_{node.id}_"
@@ -62,6 +62,7 @@ from app.runtime.safety import (
     validate_public_medical_output,
 )
 from app.runtime.store import FINAL_EVENT_TYPES, TERMINAL, RuntimeStore
+from app.runtime.tokens import TokenizerUsage, current_tokenizer_usage, token_counter
 from app.services.memory_evolution import parse_online_memory_commands
 from app.services.provider_config import ProviderConfigStore
 from app.services.state import MemoryStore
@@ -207,6 +208,9 @@ class RunOrchestrator:
             default=None,
         )
         self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._precompactions: dict[tuple[int, int], asyncio.Task[None]] = {}
+        self._precompaction_slot = asyncio.Semaphore(1)
+        self._precompaction_holder: asyncio.Task[Any] | None = None
         self._cancelled: set[str] = set()
         self._interruptions: dict[str, str] = {}
 
@@ -1089,6 +1093,8 @@ class RunOrchestrator:
         attempt_deadline_token = self._attempt_deadline.set(
             time.monotonic() + run.budget.max_seconds,
         )
+        tokenizer_usage = TokenizerUsage()
+        tokenizer_token = current_tokenizer_usage.set(tokenizer_usage)
         runner = self.runner_factory(active_clients)
         set_context = getattr(runner, "set_run_context", None)
         if callable(set_context):
@@ -1351,15 +1357,137 @@ class RunOrchestrator:
                 error_code=run.error_code,
             )
         finally:
+            run.budget.tokenizer_cpu_ms = round(
+                run.budget.tokenizer_cpu_ms + tokenizer_usage.seconds * 1000,
+                3,
+            )
+            run.budget.tool_calls_deduplicated += getattr(runner, "tool_calls_deduplicated", 0)
             await self.store.save_run(run)
             self._tasks.pop(run_id, None)
             self._client_context.reset(client_token)
             self._conversation_context.reset(conversation_token)
             self._attempt_deadline.reset(attempt_deadline_token)
+            current_tokenizer_usage.reset(tokenizer_token)
             if owns_clients:
                 await active_clients.close()
             if reschedule:
                 self._spawn(run_id)
+            else:
+                self._schedule_precompaction(run)
+
+    def _schedule_precompaction(self, run: RunRecord) -> None:
+        """Queue background compaction of the history the next turn will see."""
+        conversation_id = run.input.conversation_id
+        if (
+            not self.config.CONTEXT_PRECOMPACTION
+            or conversation_id is None
+            or run.status not in {RunStatus.COMPLETED, RunStatus.COMPLETED_WITH_WARNINGS}
+        ):
+            return
+        key = (run.user_id, conversation_id)
+        previous = self._precompactions.get(key)
+        task = asyncio.create_task(
+            self._precompact(run, after=previous),
+            name=f"ophagent:precompact:{run.id}",
+        )
+        self._precompactions[key] = task
+
+        def release(done: asyncio.Task[None]) -> None:
+            if self._precompactions.get(key) is done:
+                del self._precompactions[key]
+
+        task.add_done_callback(release)
+
+    async def _precompact(
+        self,
+        run: RunRecord,
+        *,
+        after: asyncio.Task[None] | None,
+    ) -> None:
+        """Validate a summary between turns so the next Run finds it cached.
+
+        The snapshot is built exactly as the next Run in this conversation
+        would build it, so a success is stored under the same cache key. Any
+        failure is dropped: that Run then compacts synchronously as before.
+        """
+        if after is not None and not after.done():
+            await asyncio.wait({after})
+        async with self._precompaction_slot:
+            self._precompaction_holder = asyncio.current_task()
+            try:
+                await self._precompact_holding_slot(run)
+            finally:
+                self._precompaction_holder = None
+
+    async def _precompact_holding_slot(self, run: RunRecord) -> None:
+        snapshot = await self.context_manager.build(
+            run_id=f"run_precompact_{run.id.removeprefix('run_')}",
+            user_id=run.user_id,
+            run_input=RunInput(query=run.input.query, conversation_id=run.input.conversation_id),
+        )
+        if snapshot is None or snapshot.compaction_status != "pending":
+            return
+        source = await self.store.get_run(run.id)
+        if source is None:
+            return
+        # Charge the summary to the Run whose history it compacts, with the
+        # same allowance the synchronous path reserves; an exhausted budget
+        # makes _ask raise and the next Run compacts synchronously instead.
+        attempts = max(1, self.config.CONTEXT_SUMMARY_MAX_ATTEMPTS)
+        before = source.budget.model_copy()
+        source.budget.max_model_calls = min(
+            source.budget.max_model_calls + attempts,
+            self.config.RUN_MAX_MODEL_CALLS,
+        )
+        source.budget.max_tokens = min(
+            source.budget.max_tokens
+            + (self.config.CONVERSATION_CONTEXT_MAX_INPUT_TOKENS + self.config.CONTEXT_SUMMARY_MAX_TOKENS)
+            * attempts,
+            self.config.RUN_MAX_TOKENS,
+        )
+        active_clients = self.clients
+        owns_clients = False
+        try:
+            if self.provider_config_store and await self.provider_config_store.has_overrides(
+                run.user_id,
+            ):
+                active_clients = CapabilityClients(
+                    await self.provider_config_store.resolved_settings(run.user_id)
+                )
+                owns_clients = True
+            runner = self.runner_factory(active_clients)
+            issues: list[str] = []
+            for attempt in range(1, attempts + 1):
+                try:
+                    prompt = await self.context_manager.compaction_prompt(
+                        snapshot,
+                        previous_issues=issues or None,
+                    )
+                    async with asyncio.timeout(self.config.REQUEST_TIMEOUT_SECONDS):
+                        raw = await self._ask(source, runner, "ContextCompactorAgent", prompt)
+                    compacted = await self.context_manager.complete_compaction(
+                        snapshot,
+                        _parse_context_summary(raw),
+                        attempt=attempt,
+                    )
+                except ContextCompactionError as exc:
+                    issues = list(exc.issues)
+                    continue
+                await self.store.save_precompacted_context(
+                    compacted,
+                    self.context_manager.cache_key(compacted),
+                    source_run_id=run.id,
+                )
+                return
+        except Exception:
+            # Best effort only; budget, provider or store errors surface on
+            # the synchronous path of the next Run instead.
+            return
+        finally:
+            if owns_clients:
+                await active_clients.close()
+            if source.budget.model_calls != before.model_calls:
+                await self.store.add_run_usage(source.id, source.budget, since=before)
 
     async def _prepare_conversation_context(
         self,
@@ -1371,6 +1499,47 @@ class RunOrchestrator:
 
         if snapshot.compaction_status in {"not_needed", "completed"}:
             return snapshot
+        precompaction = self._precompactions.get((snapshot.user_id, snapshot.conversation_id))
+        if precompaction is not None and not precompaction.done():
+            # Waiting is only worth it once the summary is being generated;
+            # one still queued for the shared slot is cancelled and this Run
+            # compacts synchronously instead of idling behind other users.
+            if precompaction is self._precompaction_holder:
+                await asyncio.wait({precompaction})
+            else:
+                precompaction.cancel()
+        precompacted = self.context_manager.reuse(
+            await self.store.find_context_snapshot(
+                snapshot.user_id,
+                snapshot.conversation_id,
+                self.context_manager.cache_key(snapshot),
+            ),
+            run.id,
+        )
+        if precompacted is not None:
+            await self.store.save_context_snapshot(
+                precompacted,
+                self.context_manager.cache_key(precompacted),
+            )
+            run.context_stats = precompacted.stats
+            await self.store.save_run(run)
+            await self._event(
+                run,
+                "context.compacted",
+                (
+                    f"已复用后台生成的历史摘要，"
+                    f"保留 {precompacted.stats.retained_turns} 轮高价值原文"
+                ),
+                data={
+                    "summarized_turns": precompacted.stats.summarized_turns,
+                    "retained_turns": precompacted.stats.retained_turns,
+                    "tokens_before": precompacted.stats.tokens_before,
+                    "tokens_after": precompacted.stats.tokens_after,
+                    "attempt": 0,
+                    "method": precompacted.stats.compaction_method,
+                },
+            )
+            return precompacted
         await self._event(
             run,
             "context.compacting",
@@ -1394,16 +1563,9 @@ class RunOrchestrator:
                     "ContextCompactorAgent",
                     prompt,
                 )
-                try:
-                    parsed = parse_json_object(raw)
-                except Exception as exc:
-                    raise ContextCompactionError(
-                        "摘要模型未返回合法 JSON",
-                        issues=["invalid_summary_json", str(exc)[:300]],
-                    ) from exc
                 compacted = await self.context_manager.complete_compaction(
                     snapshot,
-                    parsed,
+                    _parse_context_summary(raw),
                     attempt=attempt,
                 )
                 await self.store.save_context_snapshot(
@@ -2916,25 +3078,22 @@ class RunOrchestrator:
         )
 
 
-def _encoding_for_model(model_name: str):
-    import tiktoken
-
-    try:
-        return tiktoken.encoding_for_model(model_name)
-    except KeyError:
-        return tiktoken.get_encoding("o200k_base")
-
-
 def _token_count(text: str, model_name: str) -> int:
-    return max(1, len(_encoding_for_model(model_name).encode(text)))
+    return max(1, token_counter(model_name).count(text))
 
 
 def _truncate_to_tokens(text: str, max_tokens: int, model_name: str) -> str:
-    encoding = _encoding_for_model(model_name)
-    tokens = encoding.encode(text)
-    if len(tokens) <= max_tokens:
-        return text
-    return encoding.decode(tokens[:max_tokens]).rstrip() + "…"
+    return token_counter(model_name).truncate(text, max_tokens)
+
+
+def _parse_context_summary(raw: str) -> dict[str, Any]:
+    try:
+        return parse_json_object(raw)
+    except Exception as exc:
+        raise ContextCompactionError(
+            "摘要模型未返回合法 JSON",
+            issues=["invalid_summary_json", str(exc)[:300]],
+        ) from exc
 
 
 def _json_for_prompt(value: Any, max_tokens: int, model_name: str) -> str:
@@ -2994,6 +3153,7 @@ def _pack_evidence(
     max_tokens: int,
     model_name: str,
 ) -> list[dict[str, Any]]:
+    counter = token_counter(model_name)
     packed: list[dict[str, Any]] = []
     used = 2
     for item in evidence:
@@ -3004,22 +3164,22 @@ def _pack_evidence(
             "locator": item.locator,
             "source_type": item.source_type,
         }
-        base_tokens = _token_count(
-            json.dumps(base, ensure_ascii=False, default=str),
-            model_name,
-        )
+        base_json = json.dumps(base, ensure_ascii=False, default=str)
+        base_tokens = max(1, counter.count(base_json))
         remaining = max_tokens - used - base_tokens
         if remaining < 80:
             break
-        excerpt = _truncate_to_tokens(
-            item.excerpt,
-            min(420, remaining),
-            model_name,
-        )
+        excerpt = counter.truncate(item.excerpt, min(420, remaining))
         candidate = {**base, "excerpt": excerpt}
-        candidate_tokens = _token_count(
-            json.dumps(candidate, ensure_ascii=False, default=str),
-            model_name,
+        # The item's JSON is the base object with the excerpt spliced in;
+        # count it from cached parts rather than encoding the item twice.
+        candidate_tokens = counter.count_segments(
+            [
+                base_json[:-1],
+                ', "excerpt": ',
+                json.dumps(excerpt, ensure_ascii=False),
+                "}",
+            ],
         )
         if used + candidate_tokens > max_tokens:
             continue
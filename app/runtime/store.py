@@ -7,6 +7,7 @@ idempotently on startup and remain untouched as a rollback source.
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import sqlite3
 from collections.abc import AsyncIterator, Iterable
@@ -18,6 +19,7 @@ from app.domain.models import (
     AttachmentRecord,
     InterventionMode,
     InterventionStatus,
+    RunBudget,
     RunEvent,
     RunIntervention,
     RunRecord,
@@ -33,6 +35,14 @@ TERMINAL = {
     RunStatus.CANCELLED,
 }
 FINAL_EVENT_TYPES = {"run.completed", "run.failed", "run.cancelled"}
+# Runs in these states feed the conversation history of later turns.
+CONTEXT_SOURCE_STATUSES = {
+    RunStatus.COMPLETED,
+    RunStatus.COMPLETED_WITH_WARNINGS,
+    RunStatus.WAITING,
+    RunStatus.FAILED,
+    RunStatus.CANCELLED,
+}
 
 
 class RuntimeStore:
@@ -72,6 +82,18 @@ class RuntimeStore:
     def _initialize(self) -> None:
         with self._connect() as connection:
             connection.execute("PRAGMA journal_mode = WAL")
+            has_context_turns = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'runtime_context_turns'"
+            ).fetchone()
+            legacy_snapshots = "payload_json" in {
+                row["name"]
+                for row in connection.execute("PRAGMA table_info(runtime_context_snapshots)")
+            }
+            if legacy_snapshots:
+                connection.execute("DROP INDEX IF EXISTS ix_runtime_context_cache")
+                connection.execute(
+                    "ALTER TABLE runtime_context_snapshots RENAME TO runtime_context_snapshots_v1"
+                )
             connection.executescript(
                 """
                 CREATE TABLE IF NOT EXISTS runtime_runs (
@@ -83,7 +105,9 @@ class RuntimeStore:
                     version INTEGER NOT NULL DEFAULT 1,
                     payload_json TEXT NOT NULL,
                     created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
+                    updated_at TEXT NOT NULL,
+                    regenerated_from TEXT,
+                    family_root_id TEXT
                 );
                 CREATE UNIQUE INDEX IF NOT EXISTS ux_runtime_run_idempotency
                     ON runtime_runs(user_id, idempotency_key)
@@ -136,12 +160,91 @@ class RuntimeStore:
                     user_id INTEGER NOT NULL,
                     conversation_id INTEGER NOT NULL,
                     cache_key TEXT NOT NULL,
-                    payload_json TEXT NOT NULL,
+                    snapshot_id TEXT NOT NULL,
+                    body_hash TEXT NOT NULL,
+                    cache_hit INTEGER NOT NULL DEFAULT 0,
                     created_at TEXT NOT NULL,
                     FOREIGN KEY(run_id) REFERENCES runtime_runs(id) ON DELETE CASCADE
                 );
                 CREATE INDEX IF NOT EXISTS ix_runtime_context_cache
                     ON runtime_context_snapshots(user_id, conversation_id, cache_key);
+                -- Snapshot bodies are shared by every Run that reused the same
+                -- packed history; the triggers keep refcount exact, including
+                -- for rows removed by ON DELETE CASCADE.
+                CREATE TABLE IF NOT EXISTS runtime_context_bodies (
+                    body_hash TEXT PRIMARY KEY,
+                    payload_json TEXT NOT NULL,
+                    refcount INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TRIGGER IF NOT EXISTS tr_runtime_context_ref_insert
+                    AFTER INSERT ON runtime_context_snapshots
+                BEGIN
+                    UPDATE runtime_context_bodies SET refcount = refcount + 1
+                    WHERE body_hash = NEW.body_hash;
+                END;
+                CREATE TRIGGER IF NOT EXISTS tr_runtime_context_ref_update
+                    AFTER UPDATE OF body_hash ON runtime_context_snapshots
+                    WHEN OLD.body_hash <> NEW.body_hash
+                BEGIN
+                    UPDATE runtime_context_bodies SET refcount = refcount + 1
+                    WHERE body_hash = NEW.body_hash;
+                    UPDATE runtime_context_bodies SET refcount = refcount - 1
+                    WHERE body_hash = OLD.body_hash;
+                    DELETE FROM runtime_context_bodies
+                    WHERE body_hash = OLD.body_hash AND refcount <= 0;
+                END;
+                CREATE TRIGGER IF NOT EXISTS tr_runtime_context_ref_delete
+                    AFTER DELETE ON runtime_context_snapshots
+                BEGIN
+                    UPDATE runtime_context_bodies SET refcount = refcount - 1
+                    WHERE body_hash = OLD.body_hash;
+                    DELETE FROM runtime_context_bodies
+                    WHERE body_hash = OLD.body_hash AND refcount <= 0;
+                END;
+                -- Summaries compacted in the background after a Run finished,
+                -- waiting for the conversation's next Run to reuse them.
+                CREATE TABLE IF NOT EXISTS runtime_context_precompacted (
+                    source_run_id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    conversation_id INTEGER NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    snapshot_id TEXT NOT NULL,
+                    body_hash TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    FOREIGN KEY(source_run_id) REFERENCES runtime_runs(id) ON DELETE CASCADE
+                );
+                CREATE INDEX IF NOT EXISTS ix_runtime_context_precompacted
+                    ON runtime_context_precompacted(user_id, conversation_id, cache_key);
+                CREATE TRIGGER IF NOT EXISTS tr_runtime_context_precompacted_insert
+                    AFTER INSERT ON runtime_context_precompacted
+                BEGIN
+                    UPDATE runtime_context_bodies SET refcount = refcount + 1
+                    WHERE body_hash = NEW.body_hash;
+                END;
+                CREATE TRIGGER IF NOT EXISTS tr_runtime_context_precompacted_delete
+                    AFTER DELETE ON runtime_context_precompacted
+                BEGIN
+                    UPDATE runtime_context_bodies SET refcount = refcount - 1
+                    WHERE body_hash = OLD.body_hash;
+                    DELETE FROM runtime_context_bodies
+                    WHERE body_hash = OLD.body_hash AND refcount <= 0;
+                END;
+                CREATE TABLE IF NOT EXISTS runtime_context_turns (
+                    run_id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    conversation_id INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    query TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    route_json TEXT,
+                    token_model TEXT,
+                    turn_tokens INTEGER,
+                    raw_tokens INTEGER,
+                    created_at TEXT NOT NULL,
+                    FOREIGN KEY(run_id) REFERENCES runtime_runs(id) ON DELETE CASCADE
+                );
+                CREATE INDEX IF NOT EXISTS ix_runtime_context_turns
+                    ON runtime_context_turns(user_id, conversation_id, created_at);
                 CREATE INDEX IF NOT EXISTS ix_runtime_attachment_user
                     ON runtime_attachments(user_id, created_at DESC);
                 CREATE INDEX IF NOT EXISTS ix_runtime_attachment_conversation
@@ -170,6 +273,81 @@ class RuntimeStore:
             # own failure. Terminal uniqueness is now enforced per attempt in
             # append_event().
             connection.execute("DROP INDEX IF EXISTS ux_runtime_terminal_event")
+            run_columns = {
+                row["name"] for row in connection.execute("PRAGMA table_info(runtime_runs)")
+            }
+            if "family_root_id" not in run_columns:
+                self._backfill_regeneration_lineage(connection)
+            connection.executescript(
+                """
+                CREATE INDEX IF NOT EXISTS ix_runtime_run_regenerated_from
+                    ON runtime_runs(regenerated_from)
+                    WHERE regenerated_from IS NOT NULL;
+                CREATE INDEX IF NOT EXISTS ix_runtime_run_family
+                    ON runtime_runs(family_root_id, created_at);
+                """
+            )
+            if has_context_turns is None:
+                self._backfill_context_turns(connection)
+            if legacy_snapshots:
+                self._migrate_context_snapshots(connection)
+
+    def _migrate_context_snapshots(self, connection: sqlite3.Connection) -> None:
+        """Move full per-Run snapshot payloads into shared, refcounted bodies."""
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT cache_key, payload_json FROM runtime_context_snapshots_v1"
+            ).fetchall()
+            for row in rows:
+                self._store_context_snapshot(connection, json.loads(row["payload_json"]), row["cache_key"])
+            connection.execute("DROP TABLE runtime_context_snapshots_v1")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    @staticmethod
+    def _backfill_regeneration_lineage(connection: sqlite3.Connection) -> None:
+        """Add and fill the lineage columns on databases that predate them."""
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("ALTER TABLE runtime_runs ADD COLUMN regenerated_from TEXT")
+            connection.execute("ALTER TABLE runtime_runs ADD COLUMN family_root_id TEXT")
+            roots: dict[str, str] = {}
+            rows = connection.execute(
+                "SELECT id, payload_json FROM runtime_runs ORDER BY created_at"
+            ).fetchall()
+            for row in rows:
+                parent = json.loads(row["payload_json"]).get("input", {}).get("regenerated_from")
+                roots[row["id"]] = roots.get(parent, parent) if parent else row["id"]
+                connection.execute(
+                    "UPDATE runtime_runs SET regenerated_from = ?, family_root_id = ? WHERE id = ?",
+                    (parent, roots[row["id"]], row["id"]),
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def _backfill_context_turns(self, connection: sqlite3.Connection) -> None:
+        """Seed the context ledger once for databases created before it existed."""
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                f"""
+                SELECT payload_json FROM runtime_runs
+                WHERE conversation_id IS NOT NULL
+                  AND status IN ({",".join("?" for _ in CONTEXT_SOURCE_STATUSES)})
+                """,
+                [status.value for status in CONTEXT_SOURCE_STATUSES],
+            ).fetchall()
+            for row in rows:
+                self._sync_context_turn(connection, RunRecord.model_validate_json(row["payload_json"]))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
 
     async def get_provider_config(self, user_id: int) -> dict:
         with self._connect() as connection:
@@ -265,12 +443,22 @@ class RuntimeStore:
     @staticmethod
     def _insert_run(connection: sqlite3.Connection, run: RunRecord, *, ignore: bool = False) -> None:
         command = "INSERT OR IGNORE" if ignore else "INSERT"
-        connection.execute(
+        parent = run.input.regenerated_from
+        family_root_id = run.id
+        if parent:
+            # Regenerations of regenerations share the first answer's id, so
+            # "latest answer per family" is a single indexed partition.
+            row = connection.execute(
+                "SELECT family_root_id FROM runtime_runs WHERE id = ?",
+                (parent,),
+            ).fetchone()
+            family_root_id = row["family_root_id"] if row and row["family_root_id"] else parent
+        cursor = connection.execute(
             f"""
             {command} INTO runtime_runs
                 (id, user_id, conversation_id, idempotency_key, status, version,
-                 payload_json, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 payload_json, created_at, updated_at, regenerated_from, family_root_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 run.id,
@@ -282,6 +470,59 @@ class RuntimeStore:
                 run.model_dump_json(),
                 run.created_at.isoformat(),
                 run.updated_at.isoformat(),
+                parent,
+                family_root_id,
+            ),
+        )
+        if cursor.rowcount:
+            RuntimeStore._sync_context_turn(connection, run)
+
+    @staticmethod
+    def _sync_context_turn(connection: sqlite3.Connection, run: RunRecord) -> None:
+        """Keep the per-conversation history ledger in step with one Run revision.
+
+        Context building reads these rows instead of parsing every Run payload.
+        Token counts are filled lazily by the context manager and are cleared
+        whenever the turn text changes.
+        """
+        if (
+            run.input.conversation_id is None
+            or run.status not in CONTEXT_SOURCE_STATUSES
+            or not run.input.query.strip()
+        ):
+            connection.execute("DELETE FROM runtime_context_turns WHERE run_id = ?", (run.id,))
+            return
+        connection.execute(
+            """
+            INSERT INTO runtime_context_turns
+                (run_id, user_id, conversation_id, version, query, answer,
+                 route_json, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(run_id) DO UPDATE SET
+                conversation_id = excluded.conversation_id,
+                version = excluded.version,
+                query = excluded.query,
+                answer = excluded.answer,
+                route_json = excluded.route_json,
+                token_model = CASE WHEN runtime_context_turns.query = excluded.query
+                    AND runtime_context_turns.answer = excluded.answer
+                    THEN runtime_context_turns.token_model END,
+                turn_tokens = CASE WHEN runtime_context_turns.query = excluded.query
+                    AND runtime_context_turns.answer = excluded.answer
+                    THEN runtime_context_turns.turn_tokens END,
+                raw_tokens = CASE WHEN runtime_context_turns.query = excluded.query
+                    AND runtime_context_turns.answer = excluded.answer
+                    THEN runtime_context_turns.raw_tokens END
+            """,
+            (
+                run.id,
+                run.user_id,
+                run.input.conversation_id,
+                run.version,
+                run.input.query,
+                run.answer or "",
+                run.route.model_dump_json() if run.route is not None else None,
+                run.created_at.isoformat(),
             ),
         )
 
@@ -357,6 +598,43 @@ class RuntimeStore:
                         run.id,
                     ),
                 )
+                self._sync_context_turn(connection, run)
+                connection.commit()
+                return True
+
+    async def add_run_usage(self, run_id: str, budget: RunBudget, *, since: RunBudget) -> bool:
+        """Add model usage recorded in ``budget`` after ``since`` to a stored Run.
+
+        Used for background work charged to an already finished Run. Limits
+        are raised to those of ``budget``. The context-turn ledger is left
+        alone, so snapshots cached for the conversation stay valid.
+        """
+        async with self._lock(run_id):
+            with self._connect() as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute(
+                    "SELECT version, payload_json FROM runtime_runs WHERE id = ?",
+                    (run_id,),
+                ).fetchone()
+                if row is None:
+                    connection.rollback()
+                    return False
+                run = RunRecord.model_validate_json(row["payload_json"])
+                stored = run.budget
+                stored.model_calls += budget.model_calls - since.model_calls
+                stored.prompt_tokens += budget.prompt_tokens - since.prompt_tokens
+                stored.completion_tokens += budget.completion_tokens - since.completion_tokens
+                stored.token_usage_estimated = (
+                    stored.token_usage_estimated or budget.token_usage_estimated
+                )
+                stored.max_model_calls = max(stored.max_model_calls, budget.max_model_calls)
+                stored.max_tokens = max(stored.max_tokens, budget.max_tokens)
+                run.version = int(row["version"]) + 1
+                run.updated_at = utc_now()
+                connection.execute(
+                    "UPDATE runtime_runs SET version = ?, payload_json = ?, updated_at = ? WHERE id = ?",
+                    (run.version, run.model_dump_json(), run.updated_at.isoformat(), run_id),
+                )
                 connection.commit()
                 return True
 
@@ -413,35 +691,206 @@ class RuntimeStore:
                 run.interventions = self._load_interventions(connection, run.id)
         return runs
 
+    async def list_context_turns(
+        self,
+        user_id: int,
+        conversation_id: int,
+        *,
+        exclude: Iterable[str] = (),
+        limit: int = 300,
+    ) -> list[dict]:
+        """Return the newest history turns of a conversation, oldest first.
+
+        Only the latest revision of each regeneration family is returned,
+        after dropping ``exclude`` (for example the lineage being regenerated).
+        """
+        excluded = list(dict.fromkeys(exclude))
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"""
+                SELECT run_id, version, query, answer, route_json,
+                       token_model, turn_tokens, raw_tokens, created_at
+                FROM (
+                    SELECT turn.*, ROW_NUMBER() OVER (
+                        PARTITION BY run.family_root_id
+                        ORDER BY turn.created_at DESC, turn.version DESC
+                    ) AS family_rank
+                    FROM runtime_context_turns AS turn
+                    JOIN runtime_runs AS run ON run.id = turn.run_id
+                    WHERE turn.user_id = ? AND turn.conversation_id = ?
+                      AND turn.run_id NOT IN ({",".join("?" for _ in excluded)})
+                )
+                WHERE family_rank = 1
+                ORDER BY created_at DESC
+                LIMIT ?
+                """,
+                (user_id, conversation_id, *excluded, limit),
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    async def regeneration_lineage(self, run_id: str) -> set[str]:
+        """Return ``run_id`` and every Run it was regenerated from, in one query."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                """
+                WITH RECURSIVE lineage(id, parent) AS (
+                    SELECT id, regenerated_from FROM runtime_runs WHERE id = ?
+                    UNION
+                    SELECT run.id, run.regenerated_from
+                    FROM runtime_runs AS run
+                    JOIN lineage ON run.id = lineage.parent
+                )
+                SELECT id, parent FROM lineage
+                """,
+                (run_id,),
+            ).fetchall()
+        # A parent that no longer exists still ends the chain, as before.
+        return {run_id, *(row["id"] for row in rows), *(row["parent"] for row in rows if row["parent"])}
+
+    async def save_context_turn_tokens(
+        self,
+        model_name: str,
+        counts: dict[str, tuple[int, int]],
+    ) -> None:
+        """Persist ``(turn_tokens, raw_tokens)`` per run so each turn is counted once."""
+        if not counts:
+            return
+        with self._connect() as connection:
+            connection.executemany(
+                """
+                UPDATE runtime_context_turns
+                SET token_model = ?, turn_tokens = ?, raw_tokens = ?
+                WHERE run_id = ?
+                """,
+                [
+                    (model_name, turn_tokens, raw_tokens, run_id)
+                    for run_id, (turn_tokens, raw_tokens) in counts.items()
+                ],
+            )
+
+    @staticmethod
+    def _store_context_body(connection: sqlite3.Connection, payload: dict) -> str:
+        """Insert the shared body of a snapshot payload and return its hash."""
+        body = dict(payload)
+        for key in ("id", "run_id", "created_at"):
+            body.pop(key)
+        stats = dict(body.get("stats") or {})
+        stats.pop("cache_hit", None)
+        body["stats"] = stats
+        body_json = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        body_hash = hashlib.sha256(body_json.encode("utf-8")).hexdigest()
+        connection.execute(
+            "INSERT OR IGNORE INTO runtime_context_bodies (body_hash, payload_json) VALUES (?, ?)",
+            (body_hash, body_json),
+        )
+        return body_hash
+
+    @staticmethod
+    def _store_context_snapshot(
+        connection: sqlite3.Connection,
+        payload: dict,
+        cache_key: str,
+    ) -> None:
+        body_hash = RuntimeStore._store_context_body(connection, payload)
+        connection.execute(
+            """
+            INSERT INTO runtime_context_snapshots
+                (run_id, user_id, conversation_id, cache_key, snapshot_id, body_hash,
+                 cache_hit, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(run_id) DO UPDATE SET
+                cache_key = excluded.cache_key,
+                snapshot_id = excluded.snapshot_id,
+                body_hash = excluded.body_hash,
+                cache_hit = excluded.cache_hit,
+                created_at = excluded.created_at
+            """,
+            (
+                payload["run_id"],
+                payload["user_id"],
+                payload["conversation_id"],
+                cache_key,
+                payload["id"],
+                body_hash,
+                int(bool(payload.get("stats", {}).get("cache_hit"))),
+                payload["created_at"],
+            ),
+        )
+
+    @staticmethod
+    def _load_context_snapshot(row: sqlite3.Row | None) -> dict | None:
+        if row is None:
+            return None
+        payload = json.loads(row["payload_json"])
+        payload.update(id=row["snapshot_id"], run_id=row["run_id"], created_at=row["created_at"])
+        payload["stats"]["cache_hit"] = bool(row["cache_hit"])
+        return payload
+
     async def save_context_snapshot(self, snapshot, cache_key: str) -> None:
+        """Store a Run's context snapshot, sharing the body with identical ones.
+
+        A cache hit or a resumed Run only adds a small reference row; the
+        packed history is written once per distinct content.
+        """
+        payload = json.loads(snapshot.model_dump_json())
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            self._store_context_snapshot(connection, payload, cache_key)
+            connection.commit()
+
+    async def save_precompacted_context(
+        self,
+        snapshot,
+        cache_key: str,
+        *,
+        source_run_id: str,
+    ) -> None:
+        """Keep a background-compacted snapshot for the conversation's next Run.
+
+        Only the newest pre-compaction per conversation is kept; it is found
+        by ``find_context_snapshot`` under its cache key and released when the
+        Run that triggered it is deleted.
+        """
+        payload = json.loads(snapshot.model_dump_json())
         with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            body_hash = self._store_context_body(connection, payload)
+            connection.execute(
+                "DELETE FROM runtime_context_precompacted WHERE user_id = ? AND conversation_id = ?",
+                (snapshot.user_id, snapshot.conversation_id),
+            )
             connection.execute(
                 """
-                INSERT INTO runtime_context_snapshots
-                    (run_id, user_id, conversation_id, cache_key, payload_json, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(run_id) DO UPDATE SET
-                    cache_key = excluded.cache_key,
-                    payload_json = excluded.payload_json,
-                    created_at = excluded.created_at
+                INSERT INTO runtime_context_precompacted
+                    (source_run_id, user_id, conversation_id, cache_key, snapshot_id,
+                     body_hash, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
-                    snapshot.run_id,
+                    source_run_id,
                     snapshot.user_id,
                     snapshot.conversation_id,
                     cache_key,
-                    snapshot.model_dump_json(),
-                    snapshot.created_at.isoformat(),
+                    payload["id"],
+                    body_hash,
+                    payload["created_at"],
                 ),
             )
+            connection.commit()
 
     async def get_context_snapshot(self, run_id: str) -> dict | None:
         with self._connect() as connection:
             row = connection.execute(
-                "SELECT payload_json FROM runtime_context_snapshots WHERE run_id = ?",
+                """
+                SELECT snapshot.snapshot_id, snapshot.run_id, snapshot.cache_hit,
+                       snapshot.created_at, body.payload_json
+                FROM runtime_context_snapshots AS snapshot
+                JOIN runtime_context_bodies AS body USING (body_hash)
+                WHERE snapshot.run_id = ?
+                """,
                 (run_id,),
             ).fetchone()
-        return json.loads(row["payload_json"]) if row else None
+        return self._load_context_snapshot(row)
 
     async def find_context_snapshot(
         self,
@@ -449,17 +898,35 @@ class RuntimeStore:
         conversation_id: int,
         cache_key: str,
     ) -> dict | None:
+        """Return the best snapshot stored under ``cache_key``.
+
+        Usable snapshots (no compaction needed, or a validated summary) win
+        over newer pending or failed ones; background pre-compactions count.
+        """
         with self._connect() as connection:
             row = connection.execute(
                 """
-                SELECT payload_json FROM runtime_context_snapshots
-                WHERE user_id = ? AND conversation_id = ? AND cache_key = ?
-                ORDER BY created_at DESC
+                SELECT snapshot.snapshot_id, snapshot.run_id, snapshot.cache_hit,
+                       snapshot.created_at, body.payload_json
+                FROM (
+                    SELECT snapshot_id, run_id, cache_hit, created_at, body_hash
+                    FROM runtime_context_snapshots
+                    WHERE user_id = ? AND conversation_id = ? AND cache_key = ?
+                    UNION ALL
+                    SELECT snapshot_id, source_run_id, 0, created_at, body_hash
+                    FROM runtime_context_precompacted
+                    WHERE user_id = ? AND conversation_id = ? AND cache_key = ?
+                ) AS snapshot
+                JOIN runtime_context_bodies AS body USING (body_hash)
+                ORDER BY
+                    json_extract(body.payload_json, '$.compaction_status')
+                        IN ('not_needed', 'completed') DESC,
+                    snapshot.created_at DESC
                 LIMIT 1
                 """,
-                (user_id, conversation_id, cache_key),
+                (user_id, conversation_id, cache_key) * 2,
             ).fetchone()
-        return json.loads(row["payload_json"]) if row else None
+        return self._load_context_snapshot(row)
 
     async def list_all_runs(self) -> list[RunRecord]:
         with self._connect() as connection:
@@ -795,6 +1262,7 @@ class RuntimeStore:
                         run.id,
                     ),
                 )
+                self._sync_context_turn(connection, run)
                 for artifact in bundled_artifacts:
                     connection.execute(
                         """
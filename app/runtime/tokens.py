@@ -0,0 +1,171 @@
+"""Shared token accounting with memoized counts and token arrays.
+
+Context packing, evidence packing and budget checks count the same strings
+(history blocks, dependency outputs, evidence excerpts) many times per run
+and again on every resume. ``TokenCounter`` resolves the tiktoken encoding
+once per model and keeps token arrays keyed by a content hash, so a string is
+encoded at most once while it stays in the LRU. Composed prompts are counted
+additively from their cached segments instead of re-encoding the join.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+FALLBACK_ENCODING = "o200k_base"
+TOKEN_CACHE_MAX_TOKENS = 2_000_000
+
+
+@dataclass(slots=True)
+class TokenizerUsage:
+    """Tokenizer work attributed to one run (or any other scope that sets it)."""
+
+    seconds: float = 0.0
+    encoded: int = 0
+    cached: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, seconds: float, *, encoded: int = 0, cached: int = 0) -> None:
+        with self._lock:
+            self.seconds += seconds
+            self.encoded += encoded
+            self.cached += cached
+
+
+current_tokenizer_usage: ContextVar[TokenizerUsage | None] = ContextVar(
+    "ophagent_tokenizer_usage",
+    default=None,
+)
+
+
+class TokenCounter:
+    """Count, split and truncate text for one model with an LRU of token arrays.
+
+    The cache is bounded by the total number of cached tokens, not entries,
+    so a few long histories cannot pin unbounded memory. CPU time spent here
+    is added to ``current_tokenizer_usage`` when a run has set it.
+    """
+
+    def __init__(self, model_name: str, *, max_cached_tokens: int = TOKEN_CACHE_MAX_TOKENS) -> None:
+        self.model_name = model_name
+        self.max_cached_tokens = max(0, max_cached_tokens)
+        self._encoding: Any = None
+        self._entries: OrderedDict[bytes, array] = OrderedDict()
+        self._cached_tokens = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encoding(self) -> Any:
+        if self._encoding is None:
+            self._encoding = self._resolve_encoding()
+        return self._encoding
+
+    def _resolve_encoding(self) -> Any:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(self.model_name)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+    def tokens(self, text: str) -> array:
+        """Return the (shared, read-only by convention) token array for ``text``."""
+        started = time.thread_time()
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if cached is not None:
+            self._record(started, cached=1)
+            return cached
+        encoded = array("I", self.encoding.encode(text))
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries and len(encoded) <= self.max_cached_tokens:
+                self._entries[key] = encoded
+                self._cached_tokens += len(encoded)
+                while self._cached_tokens > self.max_cached_tokens:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._cached_tokens -= len(evicted)
+        self._record(started, encoded=1)
+        return encoded
+
+    def count(self, text: str) -> int:
+        return len(self.tokens(text)) if text else 0
+
+    def count_segments(self, segments: Iterable[str], *, separator: str = "") -> int:
+        """Count ``separator.join(segments)`` from the cached segment counts.
+
+        BPE can merge across a boundary, so this may differ from encoding the
+        joined string by about one token per boundary. It is meant for
+        selection loops; final prompts are still counted exactly.
+        """
+        parts = list(segments)
+        total = sum(self.count(segment) for segment in parts)
+        if separator and len(parts) > 1:
+            total += self.count(separator) * (len(parts) - 1)
+        return total
+
+    def truncate(self, text: str, max_tokens: int, *, suffix: str = "…") -> str:
+        """Cut ``text`` to ``max_tokens`` tokens and append ``suffix`` when cut.
+
+        The suffix is not counted against ``max_tokens``; callers that need a
+        hard bound subtract it first (see ``truncate_within``).
+        """
+        tokens = self.tokens(text)
+        if len(tokens) <= max_tokens:
+            return text
+        started = time.thread_time()
+        result = self.encoding.decode(tokens[: max(0, max_tokens)].tolist()).rstrip() + suffix
+        self._record(started)
+        return result
+
+    def truncate_within(self, text: str, max_tokens: int, *, suffix: str = "…") -> str:
+        """Like ``truncate`` but the result, suffix included, fits ``max_tokens``."""
+        if not text or max_tokens <= 0:
+            return ""
+        if len(self.tokens(text)) <= max_tokens:
+            return text.strip()
+        return self.truncate(text, max(0, max_tokens - self.count(suffix)), suffix=suffix)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "cached_tokens": self._cached_tokens,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _record(started: float, *, encoded: int = 0, cached: int = 0) -> None:
+        usage = current_tokenizer_usage.get()
+        if usage is not None:
+            usage.add(time.thread_time() - started, encoded=encoded, cached=cached)
+
+
+_counters: dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def token_counter(model_name: str) -> TokenCounter:
+    """Return the process-wide counter for ``model_name``."""
+    counter = _counters.get(model_name)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.setdefault(model_name, TokenCounter(model_name))
+    return counter
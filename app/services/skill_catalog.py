@@ -0,0 +1,236 @@
+"""Process-wide catalog of Skill files, states and evaluation reports.
+
+Building a toolkit, listing Skills in the management API and selecting
+candidates for a role all need the same data: every ``SKILL.md`` parsed,
+its checksum, ``skills.json`` and the evaluation reports. ``SkillCatalog``
+parses each file once and keeps the result until a file's (size, mtime,
+inode) or a directory listing changes, or ``SkillStore`` reports a write.
+Validating a snapshot costs a handful of ``stat`` calls; lookups on it are
+pure in-memory.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+
+import frontmatter
+
+from app.core.config import Settings, settings
+
+_FileKey = tuple[int, int, int] | None
+
+
+def _file_key(path: Path) -> _FileKey:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSkill:
+    """One parsed ``SKILL.md``; ``parsed`` is false when its frontmatter is unreadable."""
+
+    directory: Path
+    candidate: bool
+    parsed: bool
+    name: str = ""
+    version: str = "1.0.0"
+    description: str = ""
+    risk_level: str = "routine"
+    capabilities: tuple[str, ...] = ()
+    dependencies: tuple[str, ...] = ()
+    plugins: tuple[str, ...] = ()
+    checksum: str = ""
+
+    @property
+    def skill_md(self) -> Path:
+        return self.directory / "SKILL.md"
+
+    @property
+    def id(self) -> str:
+        return self.name or self.directory.name
+
+
+@dataclass(frozen=True, slots=True)
+class SkillCatalogSnapshot:
+    """Immutable view of the Skill tree at one validation point.
+
+    ``states`` is ``None`` when ``skills.json`` exists but cannot be read;
+    callers decide whether that fails closed or counts as empty.
+    """
+
+    root: Path
+    skills: tuple[CatalogSkill, ...]
+    states: Mapping[str, Mapping] | None
+    evaluations: Mapping[str, Mapping]
+
+    def role_skill(self, name: str) -> CatalogSkill | None:
+        """The built-in Skill at ``<root>/<name>``, if it exists."""
+        directory = self.root / name
+        return next((skill for skill in self.skills if skill.directory == directory), None)
+
+    def candidates(self) -> tuple[CatalogSkill, ...]:
+        return tuple(skill for skill in self.skills if skill.candidate)
+
+
+class SkillCatalog:
+    def __init__(self, config: Settings = settings) -> None:
+        self.root = config.resolve_path(config.SKILL_ROOT)
+        self.state_path = config.resolve_path(config.SKILL_STATE_PATH)
+        self.evaluation_dir = config.resolve_path(config.SKILL_EVALUATION_DIR)
+        self._lock = threading.Lock()
+        self._signature: tuple | None = None
+        self._snapshot: SkillCatalogSnapshot | None = None
+        self._parsed: dict[Path, tuple[_FileKey, CatalogSkill]] = {}
+        self._directories: tuple[Path, ...] = ()
+        self._evaluation_files: tuple[Path, ...] = ()
+        self.parses = 0
+
+    def snapshot(self) -> SkillCatalogSnapshot:
+        with self._lock:
+            if self._snapshot is not None and self._signature == self._current_signature():
+                return self._snapshot
+            self._snapshot = self._rebuild()
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Force the next snapshot to rescan (``SkillStore`` calls this after writes)."""
+        with self._lock:
+            self._signature = None
+
+    def _current_signature(self) -> tuple:
+        return (
+            _file_key(self.state_path),
+            tuple(_file_key(path) for path in self._directories),
+            tuple(_file_key(path) for path in self._parsed),
+            _file_key(self.evaluation_dir),
+            tuple(_file_key(path) for path in self._evaluation_files),
+        )
+
+    def _rebuild(self) -> SkillCatalogSnapshot:
+        # Every key is taken before the file or directory is read, so a write
+        # racing the rebuild leaves a stale key and forces another rescan.
+        state_key = _file_key(self.state_path)
+        directories: list[tuple[Path, _FileKey]] = []
+        skill_files: list[Path] = []
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            key = _file_key(directory)
+            if key is None or not directory.is_dir():
+                continue
+            directories.append((directory, key))
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+                elif entry.name == "SKILL.md":
+                    skill_files.append(Path(entry.path))
+        parsed: dict[Path, tuple[_FileKey, CatalogSkill]] = {}
+        for skill_md in sorted(skill_files):
+            key = _file_key(skill_md)
+            cached = self._parsed.get(skill_md)
+            parsed[skill_md] = (
+                cached
+                if cached is not None and cached[0] == key and key is not None
+                else (key, self._parse(skill_md))
+            )
+        evaluation_dir_key = _file_key(self.evaluation_dir)
+        evaluation_files = (
+            sorted(self.evaluation_dir.glob("*.json")) if self.evaluation_dir.is_dir() else []
+        )
+        evaluation_keys = [_file_key(path) for path in evaluation_files]
+        snapshot = SkillCatalogSnapshot(
+            root=self.root,
+            skills=tuple(skill for _, skill in parsed.values()),
+            states=self._load_states(),
+            evaluations=MappingProxyType(
+                {path.stem: self._load_evaluation(path) for path in evaluation_files},
+            ),
+        )
+        self._parsed = parsed
+        self._directories = tuple(directory for directory, _ in directories)
+        self._evaluation_files = tuple(evaluation_files)
+        self._signature = (
+            state_key,
+            tuple(key for _, key in directories),
+            tuple(key for key, _ in parsed.values()),
+            evaluation_dir_key,
+            tuple(evaluation_keys),
+        )
+        return snapshot
+
+    def _parse(self, skill_md: Path) -> CatalogSkill:
+        self.parses += 1
+        candidate = ".candidates" in skill_md.relative_to(self.root).parts
+        try:
+            content = skill_md.read_bytes()
+            post = frontmatter.loads(content.decode("utf-8"))
+        except (OSError, ValueError, TypeError):
+            return CatalogSkill(directory=skill_md.parent, candidate=candidate, parsed=False)
+        return CatalogSkill(
+            directory=skill_md.parent,
+            candidate=candidate,
+            parsed=True,
+            name=str(post.get("name") or ""),
+            version=str(post.get("version") or "1.0.0"),
+            description=str(post.get("description") or ""),
+            risk_level=str(post.get("risk_level") or "routine"),
+            capabilities=tuple(post.get("capabilities") or []),
+            dependencies=tuple(post.get("dependencies") or []),
+            plugins=tuple(post.get("plugins") or []),
+            checksum=hashlib.sha256(content).hexdigest(),
+        )
+
+    def _load_states(self) -> Mapping[str, Mapping] | None:
+        if not self.state_path.exists():
+            return MappingProxyType({})
+        try:
+            raw = json.loads(self.state_path.read_text("utf-8"))
+            return MappingProxyType(
+                {
+                    str(key): MappingProxyType(
+                        {"status": value} if isinstance(value, str) else dict(value),
+                    )
+                    for key, value in raw.items()
+                },
+            )
+        except (OSError, ValueError, TypeError, AttributeError):
+            return None
+
+    @staticmethod
+    def _load_evaluation(path: Path) -> Mapping:
+        try:
+            return MappingProxyType(dict(json.loads(path.read_text("utf-8"))))
+        except (OSError, ValueError, TypeError):
+            return MappingProxyType({})
+
+
+_catalogs: dict[tuple[Path, Path, Path], SkillCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def skill_catalog(config: Settings = settings) -> SkillCatalog:
+    """Return the process-wide catalog for ``config``'s Skill paths."""
+    key = (
+        config.resolve_path(config.SKILL_ROOT),
+        config.resolve_path(config.SKILL_STATE_PATH),
+        config.resolve_path(config.SKILL_EVALUATION_DIR),
+    )
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.setdefault(key, SkillCatalog(config))
+    return catalog
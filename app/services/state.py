@@ -3,17 +3,25 @@
 from __future__ import annotations
 
 import asyncio
+import copy
 import hashlib
 import importlib.util
 import json
 import math
 import os
 import re
+import sqlite3
 import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Sequence
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
 from datetime import UTC, datetime
 from pathlib import Path
 
 import frontmatter
+import numpy as np
 
 from app.core.config import Settings, settings
 from app.domain.models import (
@@ -24,6 +32,7 @@ from app.domain.models import (
     utc_now,
 )
 from app.services.memory_evolution import is_runtime_memory_content_allowed
+from app.services.skill_catalog import skill_catalog
 from app.services.skill_policy import (
     SAFETY_CRITICAL_SKILLS,
     requires_offline_skill_review,
@@ -32,6 +41,9 @@ from app.services.skill_policy import (
 WORD_PATTERN = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9]+")
 SKILL_ID_PATTERN = re.compile(r"^[a-z][a-z0-9_-]{2,63}$")
 SEMVER_PATTERN = re.compile(r"^\d+\.\d+\.\d+(?:[-+][A-Za-z0-9.-]+)?$")
+MEMORY_ACCESS_FLUSH_SIZE = 128
+MEMORY_ACCESS_FLUSH_SECONDS = 30.0
+MEMORY_INDEX_CACHE_USERS = 256
 
 
 class PersistentStateError(RuntimeError):
@@ -74,14 +86,258 @@ def _tokens(value: str) -> set[str]:
     return {item.casefold() for item in WORD_PATTERN.findall(value)}
 
 
+def _timestamp(value: datetime | None) -> str | None:
+    return value.astimezone(UTC).isoformat(timespec="microseconds") if value else None
+
+
+@dataclass(slots=True)
+class _MemoryIndex:
+    """One user's confirmed memories as arrays that ``search`` scores in bulk.
+
+    Positions follow the store's listing order (newest first), and each
+    term's postings hold the positions whose content contains it.
+    """
+
+    version: int
+    ids: list[str]
+    fingerprints: list[str]
+    categories: np.ndarray
+    mutable: np.ndarray
+    updated: np.ndarray
+    expires: np.ndarray
+    restricted: np.ndarray
+    conflicted: np.ndarray
+    term_counts: np.ndarray
+    postings: dict[str, np.ndarray]
+
+    @classmethod
+    def build(cls, connection: sqlite3.Connection, user_id: int, version: int) -> _MemoryIndex:
+        rows = connection.execute(
+            "SELECT id, category, fingerprint, updated_at, expires_at, sensitivity, term_count, conflicts "
+            "FROM memory_records WHERE user_id = ? AND status = 'confirmed' "
+            "ORDER BY updated_at DESC, rowid",
+            (user_id,),
+        ).fetchall()
+        ids = [row["id"] for row in rows]
+        positions = {memory_id: position for position, memory_id in enumerate(ids)}
+        postings: dict[str, list[int]] = {}
+        for row in connection.execute(
+            "SELECT term, memory_id FROM memory_terms WHERE user_id = ?",
+            (user_id,),
+        ):
+            position = positions.get(row["memory_id"])
+            if position is not None:
+                postings.setdefault(row["term"], []).append(position)
+        categories = np.array([row["category"] for row in rows], dtype=object)
+        return cls(
+            version=version,
+            ids=ids,
+            fingerprints=[row["fingerprint"] or "" for row in rows],
+            categories=categories,
+            mutable=np.isin(categories, ["preference", "workspace"]),
+            updated=np.array(
+                [datetime.fromisoformat(row["updated_at"]).timestamp() for row in rows],
+                dtype=np.float64,
+            ),
+            expires=np.array(
+                [
+                    datetime.fromisoformat(row["expires_at"]).timestamp() if row["expires_at"] else math.inf
+                    for row in rows
+                ],
+                dtype=np.float64,
+            ),
+            restricted=np.array([row["sensitivity"] == "restricted" for row in rows], dtype=bool),
+            conflicted=np.array(
+                [any(conflict in positions for conflict in row["conflicts"].split()) for row in rows],
+                dtype=bool,
+            ),
+            term_counts=np.array([row["term_count"] for row in rows], dtype=np.float64),
+            postings={term: np.array(items, dtype=np.intp) for term, items in postings.items()},
+        )
+
+
 class MemoryStore:
-    def __init__(self, config: Settings = settings, evolution: object | None = None) -> None:
+    """User memories in an indexed SQLite table, one row per record.
+
+    Every query is scoped to ``user_id`` through the (user_id, status,
+    category) and (user_id, fingerprint) indexes, so an operation touches only
+    the caller's rows. Writes also maintain a per-user term index, which
+    ``search`` loads into a cached ``_MemoryIndex`` and scores with array
+    operations; an optional ``embedder`` adds embedding-similarity recall.
+    ``search`` does not write records: access times are buffered
+    and flushed in one batch by the next write, when the buffer grows, or at
+    shutdown. A legacy ``memories.json`` is imported on first use and left
+    untouched as a rollback source; if it is unreadable every operation fails
+    closed until it is repaired.
+    """
+
+    def __init__(
+        self,
+        config: Settings = settings,
+        evolution: object | None = None,
+        *,
+        embedder: Callable[[list[str]], Awaitable[np.ndarray | None]] | None = None,
+    ) -> None:
         self.path = config.resolve_path(config.MEMORY_STATE_PATH)
+        self.database_path = self.path.with_suffix(".sqlite3")
         self.preference_path = config.resolve_path(config.MEMORY_PREFERENCE_PATH)
         self.evolution = evolution
+        self.embedder = embedder
+        self.embedding_model = config.EMBEDDING_MODEL
+        self.vector_min_similarity = config.MEMORY_VECTOR_MIN_SIMILARITY
         self._lock = asyncio.Lock()
+        self._initialized = False
+        self._accessed: dict[str, datetime] = {}
+        self._accessed_since = 0.0
+        self._indexes: OrderedDict[int, _MemoryIndex] = OrderedDict()
+        self._next_expiry: dict[int, tuple[int, float]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA busy_timeout = 30000")
+        return connection
+
+    def _initialize(self) -> None:
+        if self._initialized:
+            return
+        try:
+            with closing(self._connect()) as connection:
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS memory_records (
+                        id TEXT PRIMARY KEY,
+                        user_id INTEGER NOT NULL,
+                        category TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        key TEXT,
+                        fingerprint TEXT,
+                        expires_at TEXT,
+                        updated_at TEXT NOT NULL,
+                        sensitivity TEXT NOT NULL DEFAULT 'sensitive',
+                        term_count INTEGER NOT NULL DEFAULT 0,
+                        conflicts TEXT NOT NULL DEFAULT '',
+                        payload_json TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS ix_memory_user_status_category
+                        ON memory_records(user_id, status, category);
+                    CREATE INDEX IF NOT EXISTS ix_memory_user_fingerprint
+                        ON memory_records(user_id, fingerprint);
+                    CREATE INDEX IF NOT EXISTS ix_memory_user_key
+                        ON memory_records(user_id, key);
+                    CREATE INDEX IF NOT EXISTS ix_memory_mutable_expiry
+                        ON memory_records(user_id, expires_at)
+                        WHERE expires_at IS NOT NULL AND category IN ('preference', 'workspace');
 
-    def _load(self) -> list[MemoryRecord]:
+                    CREATE TABLE IF NOT EXISTS memory_terms (
+                        user_id INTEGER NOT NULL,
+                        term TEXT NOT NULL,
+                        memory_id TEXT NOT NULL,
+                        PRIMARY KEY (user_id, term, memory_id)
+                    ) WITHOUT ROWID;
+                    CREATE INDEX IF NOT EXISTS ix_memory_terms_memory
+                        ON memory_terms(memory_id);
+
+                    CREATE TABLE IF NOT EXISTS memory_vectors (
+                        memory_id TEXT PRIMARY KEY,
+                        user_id INTEGER NOT NULL,
+                        model TEXT NOT NULL,
+                        fingerprint TEXT NOT NULL,
+                        vector BLOB NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS ix_memory_vectors_user
+                        ON memory_vectors(user_id);
+
+                    CREATE TRIGGER IF NOT EXISTS tr_memory_records_delete
+                    AFTER DELETE ON memory_records
+                    BEGIN
+                        DELETE FROM memory_terms WHERE memory_id = old.id;
+                        DELETE FROM memory_vectors WHERE memory_id = old.id;
+                        INSERT INTO memory_user_versions(user_id, version) VALUES (old.user_id, 1)
+                            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+                    END;
+
+                    -- Bumped by every change search ranks on (access-time
+                    -- flushes only touch payload_json), so cached per-user
+                    -- indexes stay valid across processes.
+                    CREATE TABLE IF NOT EXISTS memory_user_versions (
+                        user_id INTEGER PRIMARY KEY,
+                        version INTEGER NOT NULL
+                    );
+                    CREATE TRIGGER IF NOT EXISTS tr_memory_records_insert
+                    AFTER INSERT ON memory_records
+                    BEGIN
+                        INSERT INTO memory_user_versions(user_id, version) VALUES (new.user_id, 1)
+                            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS tr_memory_records_update
+                    AFTER UPDATE OF user_id, category, status, fingerprint, expires_at, updated_at,
+                        sensitivity, term_count, conflicts ON memory_records
+                    BEGIN
+                        INSERT INTO memory_user_versions(user_id, version) VALUES (new.user_id, 1)
+                            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+                    END;
+
+                    CREATE TABLE IF NOT EXISTS memory_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    );
+                    """,
+                )
+                self._index_existing_records(connection)
+                imported = connection.execute(
+                    "SELECT 1 FROM memory_meta WHERE key = 'legacy_json_imported'",
+                ).fetchone()
+                if imported is None:
+                    legacy = self._load_legacy_json()
+                    connection.execute("BEGIN IMMEDIATE")
+                    try:
+                        if not connection.execute(
+                            "SELECT 1 FROM memory_records LIMIT 1",
+                        ).fetchone():
+                            self._write(connection, legacy)
+                        connection.execute(
+                            "INSERT OR REPLACE INTO memory_meta(key, value) "
+                            "VALUES ('legacy_json_imported', ?)",
+                            (datetime.now(UTC).isoformat(),),
+                        )
+                        connection.execute("COMMIT")
+                    except BaseException:
+                        connection.execute("ROLLBACK")
+                        raise
+        except sqlite3.Error as exc:
+            raise PersistentStateError(
+                f"Memory 数据库损坏或不可读：{self.database_path}",
+            ) from exc
+        self._initialized = True
+
+    @classmethod
+    def _index_existing_records(cls, connection: sqlite3.Connection) -> None:
+        """Add the search columns and term index to databases created without them."""
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(memory_records)")}
+        if "term_count" in columns:
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "ALTER TABLE memory_records ADD COLUMN sensitivity TEXT NOT NULL DEFAULT 'sensitive'",
+            )
+            connection.execute(
+                "ALTER TABLE memory_records ADD COLUMN term_count INTEGER NOT NULL DEFAULT 0",
+            )
+            connection.execute("ALTER TABLE memory_records ADD COLUMN conflicts TEXT NOT NULL DEFAULT ''")
+            cls._write(
+                connection,
+                cls._select(connection, "SELECT payload_json FROM memory_records ORDER BY rowid", ()),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _load_legacy_json(self) -> list[MemoryRecord]:
         if not self.path.exists():
             return []
         try:
@@ -94,6 +350,159 @@ class MemoryStore:
                 f"Memory 状态文件损坏或不可读：{self.path}",
             ) from exc
 
+    def _query(self, sql: str, parameters: Sequence[object]) -> list[MemoryRecord]:
+        self._initialize()
+        try:
+            with closing(self._connect()) as connection:
+                rows = connection.execute(sql, parameters).fetchall()
+            return [MemoryRecord.model_validate_json(row["payload_json"]) for row in rows]
+        except (sqlite3.Error, ValueError) as exc:
+            raise PersistentStateError(
+                f"Memory 数据库损坏或不可读：{self.database_path}",
+            ) from exc
+
+    def _rows(self, sql: str, parameters: Sequence[object]) -> list[sqlite3.Row]:
+        self._initialize()
+        try:
+            with closing(self._connect()) as connection:
+                return connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error as exc:
+            raise PersistentStateError(
+                f"Memory 数据库损坏或不可读：{self.database_path}",
+            ) from exc
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        self._initialize()
+        try:
+            with closing(self._connect()) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    # Pending access times land first so read-modify-write
+                    # below never resurrects a stale ``last_accessed_at``.
+                    flushed = self._flush_accessed(connection)
+                    yield connection
+                    connection.execute("COMMIT")
+                    # Drop only what committed; a rollback keeps the buffer.
+                    for memory_id, accessed_at in flushed.items():
+                        if self._accessed.get(memory_id) == accessed_at:
+                            del self._accessed[memory_id]
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as exc:
+            raise PersistentStateError(
+                f"Memory 数据库不可写：{self.database_path}",
+            ) from exc
+
+    @staticmethod
+    def _select(connection: sqlite3.Connection, sql: str, parameters: Sequence[object]) -> list[MemoryRecord]:
+        return [
+            MemoryRecord.model_validate_json(row["payload_json"])
+            for row in connection.execute(sql, parameters).fetchall()
+        ]
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, records: Iterable[MemoryRecord]) -> None:
+        records = list(records)
+        terms = {record.id: _tokens(record.content) for record in records}
+        # An upsert (not INSERT OR REPLACE) keeps the rowid, which preserves
+        # insertion order for the first-match lookups below.
+        connection.executemany(
+            "INSERT INTO memory_records"
+            "(id, user_id, category, status, key, fingerprint, expires_at, updated_at, "
+            "sensitivity, term_count, conflicts, payload_json) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET user_id = excluded.user_id, "
+            "category = excluded.category, status = excluded.status, key = excluded.key, "
+            "fingerprint = excluded.fingerprint, expires_at = excluded.expires_at, "
+            "updated_at = excluded.updated_at, sensitivity = excluded.sensitivity, "
+            "term_count = excluded.term_count, conflicts = excluded.conflicts, "
+            "payload_json = excluded.payload_json",
+            [
+                (
+                    record.id,
+                    record.user_id,
+                    record.category,
+                    record.status,
+                    record.key,
+                    record.fingerprint,
+                    _timestamp(record.expires_at),
+                    _timestamp(record.updated_at),
+                    record.sensitivity,
+                    len(terms[record.id]),
+                    " ".join(record.conflicts_with),
+                    record.model_dump_json(),
+                )
+                for record in records
+            ],
+        )
+        connection.executemany(
+            "DELETE FROM memory_terms WHERE memory_id = ?",
+            [(record.id,) for record in records],
+        )
+        connection.executemany(
+            "INSERT INTO memory_terms(user_id, term, memory_id) VALUES (?, ?, ?)",
+            [(record.user_id, term, record.id) for record in records for term in terms[record.id]],
+        )
+
+    @classmethod
+    def _remove(
+        cls,
+        connection: sqlite3.Connection,
+        user_id: int,
+        removed: list[MemoryRecord],
+    ) -> None:
+        removed_ids = {item.id for item in removed}
+        connection.executemany(
+            "DELETE FROM memory_records WHERE id = ?",
+            [(memory_id,) for memory_id in removed_ids],
+        )
+        # Conflicts are only ever recorded between one user's records.
+        cls._write(
+            connection,
+            [
+                item.model_copy(
+                    update={
+                        "conflicts_with": [
+                            conflict
+                            for conflict in item.conflicts_with
+                            if conflict not in removed_ids
+                        ],
+                    },
+                )
+                for item in cls._select(
+                    connection,
+                    "SELECT payload_json FROM memory_records WHERE user_id = ? ORDER BY rowid",
+                    (user_id,),
+                )
+                if removed_ids.intersection(item.conflicts_with)
+            ],
+        )
+
+    def _flush_accessed(self, connection: sqlite3.Connection) -> dict[str, datetime]:
+        """Write buffered access times in ``connection``'s transaction and return them."""
+        pending = dict(self._accessed)
+        if not pending:
+            return pending
+        connection.executemany(
+            "UPDATE memory_records SET payload_json = json_set(payload_json, '$.last_accessed_at', ?) "
+            "WHERE id = ?",
+            [
+                (accessed_at.isoformat().replace("+00:00", "Z"), memory_id)
+                for memory_id, accessed_at in pending.items()
+            ],
+        )
+        return pending
+
+    async def flush_access_times(self) -> None:
+        """Persist buffered ``last_accessed_at`` updates in one transaction."""
+        if not self._accessed:
+            return
+        async with self._lock:
+            with self._transaction():
+                pass
+
     def _preferences(self) -> dict[str, bool]:
         if not self.preference_path.exists():
             return {}
@@ -120,11 +529,21 @@ class MemoryStore:
         return enabled
 
     async def list(self, user_id: int) -> list[MemoryRecord]:
-        return sorted(
-            (record for record in self._load() if record.user_id == user_id),
-            key=lambda item: item.updated_at,
-            reverse=True,
+        # Expired preference/workspace rows are hidden until a purge removes them.
+        records = self._query(
+            "SELECT payload_json FROM memory_records WHERE user_id = ? "
+            "AND NOT (category IN ('preference', 'workspace') AND expires_at IS NOT NULL "
+            "AND expires_at <= ?) ORDER BY updated_at DESC, rowid",
+            (user_id, _timestamp(utc_now())),
         )
+        if not self._accessed:
+            return records
+        return [
+            record.model_copy(update={"last_accessed_at": self._accessed[record.id]})
+            if record.id in self._accessed
+            else record
+            for record in records
+        ]
 
     async def create(self, record: MemoryRecord) -> MemoryRecord:
         if not is_runtime_memory_content_allowed(record.content):
@@ -135,45 +554,59 @@ class MemoryStore:
         ).hexdigest()
         record = record.model_copy(update={"fingerprint": fingerprint})
         async with self._lock:
-            records = self._load()
-            duplicate = next(
-                (
-                    item
-                    for item in records
-                    if item.user_id == record.user_id
-                    and (
-                        item.fingerprint == fingerprint
+            with self._transaction() as connection:
+                duplicate = next(
+                    (
+                        item
+                        for item in self._select(
+                            connection,
+                            "SELECT payload_json FROM memory_records "
+                            "WHERE user_id = ? AND (fingerprint = ? OR category = ?) ORDER BY rowid",
+                            (record.user_id, fingerprint, record.category),
+                        )
+                        if item.fingerprint == fingerprint
                         or (
                             item.category == record.category
                             and _normalize(item.content) == normalized
                         )
-                    )
-                ),
-                None,
-            )
-            if duplicate:
-                return duplicate
-            conflict_ids = [
-                item.id
-                for item in records
-                if record.key
-                and item.user_id == record.user_id
-                and item.key == record.key
-                and item.status != "rejected"
-                and _normalize(item.content) != normalized
-            ]
-            record = record.model_copy(update={"conflicts_with": conflict_ids})
-            if conflict_ids:
-                for index, existing in enumerate(records):
-                    if existing.id in conflict_ids and record.id not in existing.conflicts_with:
-                        records[index] = existing.model_copy(
-                            update={
-                                "conflicts_with": [*existing.conflicts_with, record.id],
-                                "updated_at": utc_now(),
-                            },
+                    ),
+                    None,
+                )
+                if duplicate:
+                    return duplicate
+                conflicts = (
+                    [
+                        item
+                        for item in self._select(
+                            connection,
+                            "SELECT payload_json FROM memory_records "
+                            "WHERE user_id = ? AND key = ? AND status <> 'rejected' ORDER BY rowid",
+                            (record.user_id, record.key),
                         )
-            records.append(record)
-            atomic_json(self.path, [item.model_dump(mode="json") for item in records])
+                        if _normalize(item.content) != normalized
+                    ]
+                    if record.key
+                    else []
+                )
+                record = record.model_copy(
+                    update={"conflicts_with": [item.id for item in conflicts]},
+                )
+                self._write(
+                    connection,
+                    [
+                        *(
+                            existing.model_copy(
+                                update={
+                                    "conflicts_with": [*existing.conflicts_with, record.id],
+                                    "updated_at": utc_now(),
+                                },
+                            )
+                            for existing in conflicts
+                            if record.id not in existing.conflicts_with
+                        ),
+                        record,
+                    ],
+                )
         return record
 
     async def upsert_mutable(
@@ -199,40 +632,35 @@ class MemoryStore:
         ).hexdigest()
         target_normalized = _normalize(target or "")
         async with self._lock:
-            records = self._load()
-            existing_index: int | None = None
-            for index, item in enumerate(records):
-                if (
-                    item.user_id != user_id
-                    or item.category != category
-                    or item.status == "rejected"
+            with self._transaction() as connection:
+                previous: MemoryRecord | None = None
+                for item in self._select(
+                    connection,
+                    "SELECT payload_json FROM memory_records "
+                    "WHERE user_id = ? AND status <> 'rejected' AND category = ? ORDER BY rowid",
+                    (user_id, category),
                 ):
-                    continue
-                if key and item.key == key:
-                    existing_index = index
-                    break
-                if target_normalized and target_normalized in _normalize(item.content):
-                    existing_index = index
-                    break
-                if item.fingerprint == fingerprint:
-                    existing_index = index
-                    break
-            if existing_index is None:
-                record = MemoryRecord(
-                    user_id=user_id,
-                    category=category,
-                    content=content,
-                    source=source,
-                    key=key,
-                    fingerprint=fingerprint,
-                    status="confirmed",
-                    sensitivity="normal",
-                    confirmation_note="用户明确指令在线创建",
-                )
-                records.append(record)
-                action = "created"
-            else:
-                previous = records[existing_index]
+                    if (
+                        (key and item.key == key)
+                        or (target_normalized and target_normalized in _normalize(item.content))
+                        or item.fingerprint == fingerprint
+                    ):
+                        previous = item
+                        break
+                if previous is None:
+                    record = MemoryRecord(
+                        user_id=user_id,
+                        category=category,
+                        content=content,
+                        source=source,
+                        key=key,
+                        fingerprint=fingerprint,
+                        status="confirmed",
+                        sensitivity="normal",
+                        confirmation_note="用户明确指令在线创建",
+                    )
+                    self._write(connection, [record])
+                    return record, "created"
                 if (
                     _normalize(previous.content) == normalized
                     and previous.status == "confirmed"
@@ -251,21 +679,31 @@ class MemoryStore:
                         "updated_at": utc_now(),
                     },
                 )
-                records[existing_index] = record
-                for index, item in enumerate(records):
-                    if record.id in item.conflicts_with:
-                        records[index] = item.model_copy(
-                            update={
-                                "conflicts_with": [
-                                    conflict
-                                    for conflict in item.conflicts_with
-                                    if conflict != record.id
-                                ],
-                            },
-                        )
-                action = "updated"
-            atomic_json(self.path, [item.model_dump(mode="json") for item in records])
-            return record, action
+                self._write(
+                    connection,
+                    [
+                        record,
+                        *(
+                            item.model_copy(
+                                update={
+                                    "conflicts_with": [
+                                        conflict
+                                        for conflict in item.conflicts_with
+                                        if conflict != record.id
+                                    ],
+                                },
+                            )
+                            for item in self._select(
+                                connection,
+                                "SELECT payload_json FROM memory_records "
+                                "WHERE user_id = ? AND id <> ? ORDER BY rowid",
+                                (user_id, record.id),
+                            )
+                            if record.id in item.conflicts_with
+                        ),
+                    ],
+                )
+                return record, "updated"
 
     async def delete_mutable(
         self,
@@ -281,112 +719,144 @@ class MemoryStore:
             raise ValueError("在线 Memory CRUD 只允许偏好和工作区记忆")
         normalized = _normalize(content)
         async with self._lock:
-            records = self._load()
-            removed = [
-                item
-                for item in records
-                if item.user_id == user_id
-                and item.category == category
-                and (
-                    clear_all
+            with self._transaction() as connection:
+                removed = [
+                    item
+                    for item in self._select(
+                        connection,
+                        "SELECT payload_json FROM memory_records "
+                        "WHERE user_id = ? AND category = ? ORDER BY rowid",
+                        (user_id, category),
+                    )
+                    if clear_all
                     or (key is not None and item.key == key)
                     or (normalized and normalized in _normalize(item.content))
-                )
-            ]
-            if not removed:
-                return []
-            removed_ids = {item.id for item in removed}
-            retained = [
-                item.model_copy(
-                    update={
-                        "conflicts_with": [
-                            conflict
-                            for conflict in item.conflicts_with
-                            if conflict not in removed_ids
-                        ],
-                    },
-                )
-                for item in records
-                if item.id not in removed_ids
-            ]
-            atomic_json(self.path, [item.model_dump(mode="json") for item in retained])
-            return removed
+                ]
+                if removed:
+                    self._remove(connection, user_id, removed)
+                return removed
 
     async def purge_expired_mutable(self, user_id: int) -> list[MemoryRecord]:
-        """Remove expired preference/workspace memory while retaining clinical history."""
+        """Remove expired preference/workspace memory while retaining clinical history.
+
+        Runs call this before every turn, so it first checks the user's next
+        expiry and usually returns without opening a write transaction.
+        """
         now = utc_now()
+        if self._next_mutable_expiry(user_id) > now.timestamp():
+            return []
         async with self._lock:
-            records = self._load()
-            removed = [
-                item
-                for item in records
-                if item.user_id == user_id
-                and item.category in {"preference", "workspace"}
-                and item.expires_at is not None
-                and item.expires_at <= now
-            ]
-            if not removed:
-                return []
-            removed_ids = {item.id for item in removed}
-            retained = [
-                item.model_copy(
-                    update={
-                        "conflicts_with": [
-                            conflict
-                            for conflict in item.conflicts_with
-                            if conflict not in removed_ids
-                        ],
-                    },
+            with self._transaction() as connection:
+                removed = self._select(
+                    connection,
+                    "SELECT payload_json FROM memory_records "
+                    "WHERE user_id = ? AND category IN ('preference', 'workspace') "
+                    "AND expires_at IS NOT NULL AND expires_at <= ? ORDER BY rowid",
+                    (user_id, _timestamp(now)),
                 )
-                for item in records
-                if item.id not in removed_ids
-            ]
-            atomic_json(self.path, [item.model_dump(mode="json") for item in retained])
-            return removed
+                if removed:
+                    self._remove(connection, user_id, removed)
+                return removed
+
+    async def sweep_expired_mutable(self) -> list[MemoryRecord]:
+        """Purge expired preference/workspace memory of every user that has some."""
+        rows = self._rows(
+            "SELECT DISTINCT user_id FROM memory_records "
+            "WHERE expires_at IS NOT NULL AND category IN ('preference', 'workspace') "
+            "AND expires_at <= ?",
+            (_timestamp(utc_now()),),
+        )
+        removed: list[MemoryRecord] = []
+        for row in rows:
+            removed.extend(await self.purge_expired_mutable(row["user_id"]))
+        return removed
+
+    def _next_mutable_expiry(self, user_id: int) -> float:
+        """Earliest preference/workspace expiry of ``user_id`` as a timestamp.
+
+        Cached against the user's version, so the common case is one primary
+        key lookup; ``math.inf`` means nothing is due to expire.
+        """
+        self._initialize()
+        try:
+            with closing(self._connect()) as connection:
+                connection.execute("BEGIN")
+                try:
+                    row = connection.execute(
+                        "SELECT version FROM memory_user_versions WHERE user_id = ?",
+                        (user_id,),
+                    ).fetchone()
+                    version = row["version"] if row else 0
+                    cached = self._next_expiry.get(user_id)
+                    if cached is not None and cached[0] == version:
+                        return cached[1]
+                    earliest = connection.execute(
+                        "SELECT MIN(expires_at) AS expires_at FROM memory_records "
+                        "WHERE user_id = ? AND expires_at IS NOT NULL "
+                        "AND category IN ('preference', 'workspace')",
+                        (user_id,),
+                    ).fetchone()["expires_at"]
+                finally:
+                    connection.execute("COMMIT")
+        except (sqlite3.Error, ValueError) as exc:
+            raise PersistentStateError(
+                f"Memory 数据库损坏或不可读：{self.database_path}",
+            ) from exc
+        next_expiry = datetime.fromisoformat(earliest).timestamp() if earliest else math.inf
+        self._next_expiry[user_id] = (version, next_expiry)
+        return next_expiry
 
     async def update(self, memory_id: str, user_id: int, values: dict) -> MemoryRecord:
         async with self._lock:
-            records = self._load()
-            for index, record in enumerate(records):
-                if record.id == memory_id and record.user_id == user_id:
-                    allowed = {
-                        key: value
-                        for key, value in values.items()
-                        if key in {
-                            "content",
-                            "status",
-                            "expires_at",
-                            "confirmation_note",
-                        }
+            with self._transaction() as connection:
+                found = self._select(
+                    connection,
+                    "SELECT payload_json FROM memory_records WHERE id = ? AND user_id = ?",
+                    (memory_id, user_id),
+                )
+                if not found:
+                    raise KeyError(memory_id)
+                record = found[0]
+                allowed = {
+                    key: value
+                    for key, value in values.items()
+                    if key in {
+                        "content",
+                        "status",
+                        "expires_at",
+                        "confirmation_note",
                     }
-                    if "content" in allowed:
-                        if not is_runtime_memory_content_allowed(
-                            str(allowed["content"]),
-                        ):
-                            raise ValueError(
-                                "Memory 只能记录用户事实和偏好，不能修改系统或业务规则",
-                            )
-                        normalized = _normalize(str(allowed["content"]))
-                        allowed["fingerprint"] = hashlib.sha256(
-                            f"{user_id}:{record.category}:{normalized}".encode(),
-                        ).hexdigest()
-                    updated = record.model_copy(
-                        update={**allowed, "updated_at": utc_now()},
+                }
+                if "content" in allowed:
+                    if not is_runtime_memory_content_allowed(str(allowed["content"])):
+                        raise ValueError(
+                            "Memory 只能记录用户事实和偏好，不能修改系统或业务规则",
+                        )
+                    normalized = _normalize(str(allowed["content"]))
+                    allowed["fingerprint"] = hashlib.sha256(
+                        f"{user_id}:{record.category}:{normalized}".encode(),
+                    ).hexdigest()
+                updated = MemoryRecord.model_validate(
+                    record.model_copy(update={**allowed, "updated_at": utc_now()}),
+                )
+                if not record.key:
+                    self._write(connection, [updated])
+                    return updated
+                peers = [
+                    updated if item.id == updated.id else item
+                    for item in self._select(
+                        connection,
+                        "SELECT payload_json FROM memory_records "
+                        "WHERE user_id = ? AND key = ? ORDER BY rowid",
+                        (user_id, record.key),
                     )
-                    records[index] = MemoryRecord.model_validate(updated)
-                    if record.key:
-                        active = [
-                            item
-                            for item in records
-                            if item.user_id == user_id
-                            and item.key == record.key
-                            and item.status != "rejected"
-                        ]
-                        active_ids = {item.id for item in active}
-                        for item_index, item in enumerate(records):
-                            if item.user_id != user_id or item.key != record.key:
-                                continue
-                            conflicts = (
+                ]
+                active = [item for item in peers if item.status != "rejected"]
+                active_ids = {item.id for item in active}
+                peers = [
+                    item.model_copy(
+                        update={
+                            "conflicts_with": (
                                 [
                                     peer.id
                                     for peer in active
@@ -395,40 +865,25 @@ class MemoryStore:
                                 ]
                                 if item.id in active_ids
                                 else []
-                            )
-                            records[item_index] = item.model_copy(
-                                update={"conflicts_with": conflicts},
-                            )
-                    atomic_json(
-                        self.path,
-                        [item.model_dump(mode="json") for item in records],
+                            ),
+                        },
                     )
-                    return records[index]
-        raise KeyError(memory_id)
+                    for item in peers
+                ]
+                self._write(connection, peers)
+                return next(item for item in peers if item.id == memory_id)
 
     async def delete(self, memory_id: str, user_id: int) -> None:
         async with self._lock:
-            records = self._load()
-            filtered = [
-                item
-                for item in records
-                if not (item.id == memory_id and item.user_id == user_id)
-            ]
-            if len(filtered) == len(records):
-                raise KeyError(memory_id)
-            filtered = [
-                item.model_copy(
-                    update={
-                        "conflicts_with": [
-                            conflict
-                            for conflict in item.conflicts_with
-                            if conflict != memory_id
-                        ],
-                    },
+            with self._transaction() as connection:
+                removed = self._select(
+                    connection,
+                    "SELECT payload_json FROM memory_records WHERE id = ? AND user_id = ?",
+                    (memory_id, user_id),
                 )
-                for item in filtered
-            ]
-            atomic_json(self.path, [item.model_dump(mode="json") for item in filtered])
+                if not removed:
+                    raise KeyError(memory_id)
+                self._remove(connection, user_id, removed)
 
     async def search(
         self,
@@ -442,72 +897,185 @@ class MemoryStore:
         if not await self.enabled(user_id):
             return []
         now = utc_now()
+        index = self._user_index(user_id)
+        if not index.ids:
+            return []
         query_terms = _tokens(query)
-        ranked: list[tuple[float, MemoryRecord]] = []
-        records = await self.list(user_id)
-        by_id = {record.id: record for record in records}
-        for record in records:
-            if record.status != "confirmed":
-                continue
-            if record.expires_at and record.expires_at <= now:
-                continue
-            if record.sensitivity == "restricted" and not allow_restricted:
-                continue
-            if categories and record.category not in categories:
-                continue
-            # Contradictory confirmed medical memories are withheld instead of
-            # asking the model to guess which patient fact is current.
-            if any(
-                by_id.get(conflict_id)
-                and by_id[conflict_id].status == "confirmed"
-                for conflict_id in record.conflicts_with
+        eligible = (index.expires > now.timestamp()) & ~index.conflicted
+        if not allow_restricted:
+            eligible &= ~index.restricted
+        in_categories = (
+            np.isin(index.categories, sorted(categories))
+            if categories
+            else np.zeros(len(index.ids), dtype=bool)
+        )
+        if categories:
+            eligible &= in_categories
+        shared = np.zeros(len(index.ids), dtype=np.float64)
+        for term in query_terms:
+            positions = index.postings.get(term)
+            if positions is not None:
+                shared[positions] += 1
+        overlap = (
+            shared / np.maximum(len(query_terms) + index.term_counts - shared, 1)
+            if query_terms
+            else np.zeros(len(index.ids), dtype=np.float64)
+        )
+        similarities = await self._vector_similarities(user_id, query, index, eligible)
+        if similarities is not None:
+            overlap = np.maximum(overlap, similarities)
+        category_bonus = np.where(in_categories, 0.22, np.where(index.mutable, 0.18, 0.0))
+        # Contradictory confirmed medical memories are withheld (``conflicted``)
+        # instead of asking the model to guess which patient fact is current.
+        # Category-scoped recalls deliberately include safety-critical history
+        # even when a terse follow-up has little lexical overlap.
+        candidates = np.flatnonzero(eligible & ((overlap > 0) | (category_bonus > 0)))
+        if not len(candidates):
+            return []
+        age_days = np.maximum((now.timestamp() - index.updated[candidates]) / 86400, 0)
+        recency = np.exp(-age_days / 365)
+        scores = 0.68 * overlap[candidates] + 0.20 * recency + category_bonus[candidates]
+        factors = self._utility_factors(index, candidates)
+        if factors is not None:
+            # Non-clinical preference/workspace records may move only within
+            # a bounded ranking range; CRUD remains user-controlled.
+            scores *= factors
+        order = np.lexsort((candidates, -index.updated[candidates], -scores))[:limit]
+        selected_ids = [index.ids[position] for position in candidates[order]]
+        if not selected_ids:
+            return []
+        by_id = {
+            record.id: record
+            for record in self._query(
+                "SELECT payload_json FROM memory_records "
+                f"WHERE id IN ({', '.join('?' * len(selected_ids))})",
+                selected_ids,
+            )
+        }
+        selected = [by_id[memory_id] for memory_id in selected_ids if memory_id in by_id]
+        if selected:
+            if not self._accessed:
+                self._accessed_since = time.monotonic()
+            self._accessed.update((record.id, now) for record in selected)
+            if (
+                len(self._accessed) >= MEMORY_ACCESS_FLUSH_SIZE
+                or time.monotonic() - self._accessed_since >= MEMORY_ACCESS_FLUSH_SECONDS
             ):
-                continue
-            memory_terms = _tokens(record.content)
-            overlap = (
-                len(query_terms & memory_terms) / max(len(query_terms | memory_terms), 1)
-                if query_terms
-                else 0.0
+                await self.flush_access_times()
+        return selected
+
+    def _user_index(self, user_id: int) -> _MemoryIndex:
+        """Return the user's cached search index, rebuilt when their version moved."""
+        self._initialize()
+        try:
+            with closing(self._connect()) as connection:
+                # One read transaction, so the version matches the rows indexed.
+                connection.execute("BEGIN")
+                try:
+                    row = connection.execute(
+                        "SELECT version FROM memory_user_versions WHERE user_id = ?",
+                        (user_id,),
+                    ).fetchone()
+                    version = row["version"] if row else 0
+                    cached = self._indexes.get(user_id)
+                    if cached is not None and cached.version == version:
+                        self._indexes.move_to_end(user_id)
+                        return cached
+                    index = _MemoryIndex.build(connection, user_id, version)
+                finally:
+                    connection.execute("COMMIT")
+        except (sqlite3.Error, ValueError) as exc:
+            raise PersistentStateError(
+                f"Memory 数据库损坏或不可读：{self.database_path}",
+            ) from exc
+        self._indexes[user_id] = index
+        while len(self._indexes) > MEMORY_INDEX_CACHE_USERS:
+            self._indexes.popitem(last=False)
+        return index
+
+    def _utility_factors(self, index: _MemoryIndex, candidates: np.ndarray) -> np.ndarray | None:
+        batched = getattr(self.evolution, "memory_utility_factors", None)
+        utility = getattr(self.evolution, "memory_utility_factor", None)
+        if not callable(batched) and not callable(utility):
+            return None
+        categories = {index.ids[position]: index.categories[position] for position in candidates}
+        factors = (
+            batched(categories)
+            if callable(batched)
+            else {memory_id: utility(memory_id, category) for memory_id, category in categories.items()}
+        )
+        return np.array([float(factors[index.ids[position]]) for position in candidates])
+
+    async def _vector_similarities(
+        self,
+        user_id: int,
+        query: str,
+        index: _MemoryIndex,
+        eligible: np.ndarray,
+    ) -> np.ndarray | None:
+        """Embedding similarity per indexed memory, zero below the recall threshold.
+
+        Record vectors are cached per model and content fingerprint, so only
+        new or edited memories are embedded, in the same request as the query.
+        Ineligible memories (restricted unless allowed, expired, conflicted)
+        are neither embedded nor scored.
+        """
+        if self.embedder is None or not query.strip():
+            return None
+        fingerprints = dict(zip(index.ids, index.fingerprints, strict=True))
+        cached = {
+            row["memory_id"]: row["vector"]
+            for row in self._rows(
+                "SELECT memory_id, fingerprint, vector FROM memory_vectors "
+                "WHERE user_id = ? AND model = ?",
+                (user_id, self.embedding_model),
             )
-            age_days = max((now - record.updated_at).total_seconds() / 86400, 0)
-            recency = math.exp(-age_days / 365)
-            category_bonus = (
-                0.22
-                if categories and record.category in categories
-                else 0.18 if record.category in {"preference", "workspace"} else 0.0
+            if fingerprints.get(row["memory_id"]) == row["fingerprint"]
+        }
+        candidates = [index.ids[position] for position in np.flatnonzero(eligible)]
+        pending = [memory_id for memory_id in candidates if memory_id not in cached]
+        missing = (
+            self._query(
+                f"SELECT payload_json FROM memory_records WHERE id IN ({', '.join('?' * len(pending))})",
+                pending,
             )
-            score = 0.68 * overlap + 0.20 * recency + category_bonus
-            utility = getattr(self.evolution, "memory_utility_factor", None)
-            if callable(utility):
-                # Non-clinical preference/workspace records may move only
-                # within a bounded ranking range; CRUD remains user-controlled.
-                score *= float(utility(record.id, record.category))
-            # Category-scoped recalls deliberately include safety-critical
-            # history even when a terse follow-up has little lexical overlap.
-            if overlap > 0 or category_bonus > 0:
-                ranked.append((score, record))
-        selected = [
-            record
-            for _, record in sorted(
-                ranked,
-                key=lambda item: (item[0], item[1].updated_at),
-                reverse=True,
-            )[:limit]
-        ]
-        if selected:
-            selected_ids = {item.id for item in selected}
+            if pending
+            else []
+        )
+        vectors = await self.embedder([query, *(record.content for record in missing)])
+        if vectors is None or len(vectors) != len(missing) + 1:
+            return None
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if missing:
             async with self._lock:
-                records = self._load()
-                for index, record in enumerate(records):
-                    if record.id in selected_ids:
-                        records[index] = record.model_copy(
-                            update={"last_accessed_at": now},
-                        )
-                atomic_json(
-                    self.path,
-                    [item.model_dump(mode="json") for item in records],
-                )
-        return selected
+                with self._transaction() as connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO memory_vectors"
+                        "(memory_id, user_id, model, fingerprint, vector) VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (
+                                record.id,
+                                user_id,
+                                self.embedding_model,
+                                fingerprints[record.id],
+                                vector.tobytes(),
+                            )
+                            for record, vector in zip(missing, vectors[1:], strict=True)
+                        ],
+                    )
+            cached.update(
+                (record.id, vector.tobytes()) for record, vector in zip(missing, vectors[1:], strict=True)
+            )
+        similarities = np.zeros(len(index.ids), dtype=np.float64)
+        positions = [position for position in np.flatnonzero(eligible) if index.ids[position] in cached]
+        if positions:
+            matrix = np.frombuffer(
+                b"".join(cached[index.ids[position]] for position in positions),
+                dtype=np.float32,
+            ).reshape(len(positions), -1)
+            scores = np.minimum((matrix @ vectors[0] + 1) / 2, 1.0)
+            similarities[positions] = np.where(scores >= self.vector_min_similarity, scores, 0.0)
+        return similarities
 
     async def propose_from_clinical_state(
         self,
@@ -544,6 +1112,54 @@ class MemoryStore:
         return candidates
 
 
+class MemoryExpirySweeper:
+    """Purge expired preference/workspace memory in the background.
+
+    Together with the lazy filters in ``MemoryStore.list``/``search`` this
+    keeps expiry off the run path; ``on_expired`` receives every removed
+    record (the app reports them to the evolution controller).
+    """
+
+    def __init__(
+        self,
+        store: MemoryStore,
+        config: Settings = settings,
+        on_expired: Callable[[MemoryRecord], Awaitable[None]] | None = None,
+    ) -> None:
+        self.store = store
+        self.interval = config.MEMORY_EXPIRY_SWEEP_SECONDS
+        self._on_expired = on_expired
+        self._task: asyncio.Task[None] | None = None
+        self.last_error: str | None = None
+
+    def start(self) -> bool:
+        if self._task is not None:
+            return True
+        if self.interval <= 0:
+            return False
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                for memory in await self.store.sweep_expired_mutable():
+                    if self._on_expired is not None:
+                        await self._on_expired(memory)
+                self.last_error = None
+            except (PersistentStateError, OSError, TypeError, ValueError) as exc:
+                # A failed sweep is retried next interval; runs still purge lazily.
+                self.last_error = type(exc).__name__
+
+
 class SkillStore:
     """Skill registry with quarantine, deterministic validation and promotion."""
 
@@ -555,6 +1171,7 @@ class SkillStore:
         self.root = config.resolve_path(config.SKILL_ROOT)
         self.candidate_root = self.root / ".candidates"
         self.evaluation_dir = config.resolve_path(config.SKILL_EVALUATION_DIR)
+        self.catalog = skill_catalog(config)
         self._lock = asyncio.Lock()
 
     def _states(self) -> dict[str, dict]:
@@ -572,35 +1189,35 @@ class SkillStore:
             ) from exc
 
     async def list(self) -> list[SkillRecord]:
-        states = self._states()
+        snapshot = self.catalog.snapshot()
+        if snapshot.states is None:
+            raise PersistentStateError(f"Skill 状态文件损坏或不可读：{self.path}")
         records: list[SkillRecord] = []
-        for skill_md in sorted(self.root.glob("**/SKILL.md")):
+        for skill in snapshot.skills:
+            if not skill.parsed:
+                continue
             try:
-                post = frontmatter.load(skill_md)
-                name = str(post.get("name") or skill_md.parent.name)
-                risk = RiskLevel(str(post.get("risk_level") or "routine"))
-            except (OSError, ValueError, TypeError):
+                risk = RiskLevel(skill.risk_level)
+            except ValueError:
                 continue
-            relative = skill_md.relative_to(self.root)
-            default_status = "candidate" if ".candidates" in relative.parts else "enabled"
-            state = states.get(name, {})
-            evaluation = self._load_evaluation(name)
+            default_status = "candidate" if skill.candidate else "enabled"
+            state = snapshot.states.get(skill.id, {})
             records.append(
                 SkillRecord(
-                    id=name,
-                    version=str(post.get("version") or "1.0.0"),
-                    description=str(post.get("description") or ""),
+                    id=skill.id,
+                    version=skill.version,
+                    description=skill.description,
                     path=(
-                        str(skill_md.parent.relative_to(self.config.project_root))
-                        if self.config.project_root in skill_md.parent.parents
-                        else str(skill_md.parent)
+                        str(skill.directory.relative_to(self.config.project_root))
+                        if self.config.project_root in skill.directory.parents
+                        else str(skill.directory)
                     ),
-                    capabilities=list(post.get("capabilities") or []),
-                    dependencies=list(post.get("dependencies") or []),
+                    capabilities=list(skill.capabilities),
+                    dependencies=list(skill.dependencies),
                     risk_level=risk,
-                    plugins=list(post.get("plugins") or []),
+                    plugins=list(skill.plugins),
                     status=state.get("status", default_status),
-                    evaluation=evaluation,
+                    evaluation=copy.deepcopy(dict(snapshot.evaluations.get(skill.id, {}))),
                 ),
             )
         return records
@@ -644,10 +1261,12 @@ class SkillStore:
         if resolved_root not in target.resolve().parents:
             raise ValueError("非法 skill 路径")
         target.write_text(markdown, "utf-8")
+        self.catalog.invalidate()
         async with self._lock:
             states = self._states()
             states[skill_id] = {"status": "candidate"}
             atomic_json(self.path, states)
+            self.catalog.invalidate()
         return await self.list_by_id(skill_id)
 
     async def validate(self, skill_id: str) -> SkillRecord:
@@ -716,6 +1335,7 @@ class SkillStore:
         }
         self.evaluation_dir.mkdir(parents=True, exist_ok=True)
         atomic_json(self.evaluation_dir / f"{skill_id}.json", report)
+        self.catalog.invalidate()
         async with self._lock:
             states = self._states()
             states[skill_id] = {
@@ -723,6 +1343,7 @@ class SkillStore:
                 "checksum": checksum,
             }
             atomic_json(self.path, states)
+            self.catalog.invalidate()
         return await self.list_by_id(skill_id)
 
     async def approve_offline(self, skill_id: str, reviewer: str) -> SkillRecord:
@@ -747,6 +1368,7 @@ class SkillStore:
                 "approved_at": datetime.now(UTC).isoformat(),
             }
             atomic_json(self.evaluation_dir / f"{skill_id}.json", report)
+            self.catalog.invalidate()
         return await self.list_by_id(skill_id)
 
     async def set_status(
@@ -819,11 +1441,13 @@ class SkillStore:
                     "approved_at": datetime.now(UTC).isoformat(),
                 }
                 atomic_json(self.evaluation_dir / f"{skill_id}.json", report)
+                self.catalog.invalidate()
         async with self._lock:
             states = self._states()
             previous = states.get(skill_id, {})
             states[skill_id] = {**previous, "status": status}
             atomic_json(self.path, states)
+            self.catalog.invalidate()
         return await self.list_by_id(skill_id)
 
     async def list_by_id(self, skill_id: str) -> SkillRecord:
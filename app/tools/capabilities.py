@@ -15,6 +15,7 @@ from pydantic import BaseModel, Field
 
 from app.core.config import Settings, settings
 from app.domain.models import EvidenceItem, ImageRegion
+from app.knowledge.cache import EvidenceCache
 from app.knowledge.retrieval import HybridKnowledgeRetriever
 from app.observability.tracing import safe_span
 from app.runtime.errors import CapabilityUnavailable
@@ -55,6 +56,9 @@ class SynthesisRequest(BaseModel):
     voice: str | None = None
 
 
+_PER_RETRIEVAL_EVIDENCE_FIELDS = frozenset({"id", "retrieved_at"})
+
+
 def _normalize_image_analysis_payload(decoded: Any) -> dict[str, Any]:
     """Normalize common OpenAI-compatible JSON response shapes."""
 
@@ -174,8 +178,14 @@ class CapabilityClients:
         )
         self._owns_http = http_client is None
         self.health: dict[str, str] = {}
+        self.evidence_cache = EvidenceCache(
+            self.retriever.index_dir / "evidence_cache.sqlite3",
+            config.KNOWLEDGE_EVIDENCE_CACHE_SIZE,
+            config.KNOWLEDGE_EVIDENCE_CACHE_TTL_SECONDS,
+        )
 
     async def close(self) -> None:
+        await self.retriever.aclose()
         if self._owns_http:
             await self.http.aclose()
 
@@ -317,16 +327,71 @@ class CapabilityClients:
         *,
         user_id: int | None = None,
     ) -> ToolResult:
-        evidence = await self.retriever.search(
-            query,
-            top_k=top_k,
-            user_id=user_id,
+        result = await self.retrieve_medical_evidence_many([query], top_k, user_id=user_id)
+        return ToolResult(
+            status="ok",
+            capability="medical_retrieval",
+            data={"evidence": result.data["results"][0]["evidence"]},
         )
+
+    async def retrieve_medical_evidence_many(
+        self,
+        queries: list[str],
+        top_k: int = 6,
+        *,
+        user_id: int | None = None,
+    ) -> ToolResult:
+        """Retrieve local evidence for many queries, only searching cache misses.
+
+        Misses go to the retriever in one batched pass. Evidence ids and
+        retrieval times are not cached; every hit gets fresh ones so runs
+        never share citation ids. Hits are visible in the cache stats and
+        the ``tool.medical_retrieval`` span, never in the result data, so a
+        hit and a miss hand the model the same payload.
+        """
+        scope, version = await self.retriever.result_scope(user_id)
+        keys = [
+            self.evidence_cache.key(self.retriever.normalize_query(query), top_k, scope, version)
+            for query in queries
+        ]
+        with safe_span(
+            "tool.medical_retrieval",
+            **{"ophagent.capability": "medical_retrieval"},
+        ) as span:
+            evidence: dict[str, list[dict[str, Any]]] = {}
+            for key in dict.fromkeys(keys):
+                cached = self.evidence_cache.get(key)
+                if cached is not None:
+                    evidence[key] = _fresh_evidence(cached)
+            missing = {
+                key: query
+                for query, key in zip(queries, keys, strict=True)
+                if key not in evidence
+            }
+            span.set_attribute("ophagent.evidence_cache.hits", len(evidence))
+            span.set_attribute("ophagent.evidence_cache.misses", len(missing))
+            if missing:
+                batches, fell_back = await self.retriever.search_many(
+                    list(missing.values()),
+                    top_k=top_k,
+                    user_id=user_id,
+                )
+                for key, items, degraded in zip(missing, batches, fell_back, strict=True):
+                    evidence[key] = [item.model_dump(mode="json") for item in items]
+                    # Degraded rankings are served but never cached, so a provider
+                    # recovery is picked up by the next identical request.
+                    if not degraded:
+                        self.evidence_cache.put(key, _cacheable_evidence(evidence[key]))
         self.health["medical_retrieval"] = "ready"
         return ToolResult(
             status="ok",
             capability="medical_retrieval",
-            data={"evidence": [item.model_dump(mode="json") for item in evidence]},
+            data={
+                "results": [
+                    {"query": query, "evidence": evidence[key]}
+                    for query, key in zip(queries, keys, strict=True)
+                ],
+            },
         )
 
     async def search_web(self, request: SearchRequest) -> ToolResult:
@@ -620,6 +685,22 @@ class CapabilityClients:
         )
 
 
+def _cacheable_evidence(evidence: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Drop the per-retrieval fields before an evidence list is cached."""
+    return [
+        {name: value for name, value in item.items() if name not in _PER_RETRIEVAL_EVIDENCE_FIELDS}
+        for item in evidence
+    ]
+
+
+def _fresh_evidence(cached: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Rebuild cached evidence with a new id and retrieval time per hit."""
+    return [
+        EvidenceItem.model_validate(item).model_dump(mode="json")
+        for item in _cacheable_evidence(cached)
+    ]
+
+
 def _citation_markers(text: str) -> list[str]:
     import re
 
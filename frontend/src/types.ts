@@ -348,7 +348,7 @@ export interface KnowledgeSource {
 }
 
 export interface KnowledgeStatus {
-  status: "ready" | "degraded" | "unavailable" | "building";
+  status: "ready" | "degraded" | "unavailable" | "building" | "warming";
   documents: number;
   chunks: number;
   page_visuals: number;
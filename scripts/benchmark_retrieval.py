@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""Offline latency, memory and recall benchmark for the hybrid retriever.
+
+The benchmark writes a synthetic ophthalmology-style corpus, starts a local
+fake embedding/rerank server on 127.0.0.1 and measures index build, index
+load, ``_bm25``, ``_vector_scores`` and full ``search()``. Recall@k is
+checked against brute-force ground truth. Nothing leaves the machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from pydantic import SecretStr  # noqa: E402
+
+from app.core.config import Settings  # noqa: E402
+from app.knowledge import HybridKnowledgeRetriever  # noqa: E402
+from app.knowledge.chunking import tokenize  # noqa: E402
+from app.knowledge.graph import ENTITY_TYPES  # noqa: E402
+
+CHUNKS_PER_DOCUMENT = 50
+EMBEDDING_DIMENSIONS = 128
+CHINESE_FILLER = "患者检查随访评估建议结合病史视力眼底结构变化治疗方案复查记录临床观察需要进一步明确"
+ENGLISH_SYLLABLES = ("ret", "ina", "cor", "nea", "mac", "ula", "opt", "ic", "ven", "art", "lens", "iop")
+ENGLISH_TERMS = ("OCT", "IOP", "VEGF", "PPP", "AAO", "OCTA", "RNFL", "BCVA")
+
+
+@dataclass(frozen=True, slots=True)
+class BenchmarkQuery:
+    text: str
+    target_source: str
+
+
+def _english_vocabulary(size: int, rng: random.Random) -> list[str]:
+    words: set[str] = set(term.lower() for term in ENGLISH_TERMS)
+    while len(words) < size:
+        words.add("".join(rng.choice(ENGLISH_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _paragraph(rng: random.Random, english: list[str], weights: list[float]) -> str:
+    labels = [label for values in ENTITY_TYPES.values() for label in values]
+    parts: list[str] = []
+    for _ in range(rng.randint(8, 14)):
+        choice = rng.random()
+        if choice < 0.35:
+            parts.append(rng.choice(labels))
+        elif choice < 0.7:
+            parts.append(rng.choices(english, weights=weights)[0])
+        else:
+            start = rng.randrange(len(CHINESE_FILLER) - 6)
+            parts.append(CHINESE_FILLER[start : start + rng.randint(3, 6)])
+    return "，".join(parts) + "。"
+
+
+def generate_corpus(raw_dir: Path, chunks: int, seed: int) -> int:
+    """Write ``chunks`` one-paragraph chunks across guideline-style documents."""
+    rng = random.Random(seed)
+    english = _english_vocabulary(max(500, int(math.sqrt(chunks) * 20)), rng)
+    # Zipf-like term frequencies keep BM25 postings realistically skewed.
+    weights = [1 / (rank + 1) for rank in range(len(english))]
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    documents = math.ceil(chunks / CHUNKS_PER_DOCUMENT)
+    written = 0
+    for document in range(documents):
+        count = min(CHUNKS_PER_DOCUMENT, chunks - written)
+        paragraphs = [_paragraph(rng, english, weights) for _ in range(count)]
+        body = "\n\n".join(paragraphs)
+        path = raw_dir / f"synthetic_{document:06d}_眼科诊疗指南（2024）.md"
+        path.write_text(f"# 合成指南 {document}\n\n{body}\n", "utf-8")
+        written += count
+    return written
+
+
+def _fake_vector(text: str) -> list[float]:
+    vector = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+    for term, count in Counter(tokenize(text)).items():
+        digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS
+        vector[bucket] += (1.0 if digest[4] & 1 else -1.0) * math.log1p(count)
+    return vector.tolist()
+
+
+class _FakeProviderHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible ``/embeddings`` and ``/rerank`` with deterministic scores."""
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", "0"))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/embeddings"):
+            body: dict[str, Any] = {
+                "data": [
+                    {"index": index, "embedding": _fake_vector(text)}
+                    for index, text in enumerate(payload.get("input", []))
+                ],
+            }
+        elif self.path.endswith("/rerank"):
+            query_terms = set(tokenize(str(payload.get("query", ""))))
+            results = []
+            for index, document in enumerate(payload.get("documents", [])):
+                overlap = len(query_terms.intersection(tokenize(str(document))))
+                results.append({"index": index, "relevance_score": overlap / max(len(query_terms), 1)})
+            body = {"results": sorted(results, key=lambda item: -item["relevance_score"])}
+        else:
+            self.send_error(404)
+            return
+        encoded = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format: str, *args: object) -> None:
+        return
+
+
+def start_fake_provider() -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeProviderHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def benchmark_settings(workdir: Path, provider_url: str | None) -> Settings:
+    values: dict[str, Any] = {
+        "_env_file": None,
+        "ENVIRONMENT": "test",
+        "STRICT_STARTUP": False,
+        "KNOWLEDGE_RAW_DIR": str(workdir / "raw"),
+        "KNOWLEDGE_INDEX_DIR": str(workdir / "index"),
+        # Measure the retrieval kernels themselves, not the query caches.
+        "KNOWLEDGE_QUERY_CACHE_SIZE": 0,
+        "EMBEDDING_MODEL": "",
+        "RERANK_MODEL": "",
+    }
+    if provider_url:
+        values.update(
+            {
+                "EMBEDDING_URL": provider_url,
+                "EMBEDDING_API_KEY": SecretStr("benchmark"),
+                "EMBEDDING_MODEL": "fake-hash-embedding",
+                "RERANK_URL": provider_url,
+                "RERANK_API_KEY": SecretStr("benchmark"),
+                "RERANK_MODEL": "fake-overlap-rerank",
+            },
+        )
+    return Settings(**values)
+
+
+def sample_queries(retriever: HybridKnowledgeRetriever, count: int, seed: int) -> list[BenchmarkQuery]:
+    assert retriever._chunks is not None
+    rng = random.Random(seed + 1)
+    queries: list[BenchmarkQuery] = []
+    for chunk in rng.sample(retriever._chunks, min(count, len(retriever._chunks))):
+        terms = [term for term in chunk.text.split("，") if term and len(term) >= 2]
+        picked = rng.sample(terms, min(4, len(terms)))
+        queries.append(BenchmarkQuery(text=" ".join(picked), target_source=chunk.source))
+    return queries
+
+
+def brute_force_bm25(retriever: HybridKnowledgeRetriever, query: str, limit: int) -> list[int]:
+    """Score every chunk with the textbook BM25 loop; the ground truth for ``_bm25``."""
+    assert retriever._chunks is not None
+    query_terms = tokenize(query)
+    frequency: Counter[str] = Counter()
+    for chunk in retriever._chunks:
+        frequency.update(chunk.terms.keys())
+    lengths = [sum(chunk.terms.values()) for chunk in retriever._chunks]
+    average = sum(lengths) / max(len(lengths), 1)
+    n_docs = max(len(retriever._chunks), 1)
+    k1, b = 1.5, 0.75
+    scored: list[tuple[float, int]] = []
+    for index, chunk in enumerate(retriever._chunks):
+        score = 0.0
+        for term in query_terms:
+            tf = chunk.terms.get(term, 0)
+            if not tf:
+                continue
+            df = frequency[term]
+            inverse = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            score += inverse * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[index] / average))
+        if score:
+            scored.append((score, index))
+    return [index for _, index in sorted(scored, reverse=True)[:limit]]
+
+
+def _recall(expected: list[int], actual: list[int]) -> float:
+    return len(set(expected).intersection(actual)) / len(expected) if expected else 1.0
+
+
+def _rss_mb() -> float | None:
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024**2, 1)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes.
+    return round(peak / (1024**2 if sys.platform == "darwin" else 1024), 1)
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, math.ceil(0.99 * len(ordered)) - 1)] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+async def _timed(samples: list[float], call: Callable[[], Awaitable[Any]]) -> Any:
+    started = time.perf_counter()
+    result = await call()
+    samples.append(time.perf_counter() - started)
+    return result
+
+
+async def run_size(
+    chunks: int,
+    *,
+    workdir: Path,
+    provider_url: str | None,
+    query_count: int,
+    truth_queries: int,
+    top_k: int,
+    seed: int,
+) -> dict[str, Any]:
+    shutil.rmtree(workdir, ignore_errors=True)
+    config = benchmark_settings(workdir, provider_url)
+    report: dict[str, Any] = {"target_chunks": chunks, "embeddings": bool(provider_url)}
+
+    started = time.perf_counter()
+    report["generated_chunks"] = generate_corpus(workdir / "raw", chunks, seed)
+    report["generate_s"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    await HybridKnowledgeRetriever(config).rebuild(include_embeddings=bool(provider_url))
+    report["build_s"] = round(time.perf_counter() - started, 3)
+
+    retriever = HybridKnowledgeRetriever(config)
+    started = time.perf_counter()
+    status = await retriever.load()
+    report["load_s"] = round(time.perf_counter() - started, 3)
+    report["indexed_chunks"] = status.chunks
+    report["vectors"] = status.vectors
+    report["rss_after_load_mb"] = _rss_mb()
+    index_dir = workdir / "index"
+    report["index_bytes"] = sum(path.stat().st_size for path in index_dir.rglob("*") if path.is_file())
+
+    queries = sample_queries(retriever, query_count, seed)
+    limit = max(top_k * 8, config.KNOWLEDGE_VECTOR_CANDIDATES)
+    visible = retriever._visible_mask(None)
+    bm25_samples: list[float] = []
+    vector_samples: list[float] = []
+    search_samples: list[float] = []
+    bm25_results: list[list[int]] = []
+    vector_results: list[dict[int, float]] = []
+    search_hits = 0
+
+    async def bm25(query: str) -> list[tuple[float, int]]:
+        return retriever._bm25(query, limit, visible)
+
+    for query in queries:
+        lexical = await _timed(bm25_samples, lambda query=query: bm25(query.text))
+        bm25_results.append([index for _, index in lexical])
+        if provider_url:
+            vector_results.append(
+                await _timed(
+                    vector_samples,
+                    lambda query=query, lexical=lexical: retriever._vector_scores(
+                        query.text,
+                        [index for _, index in lexical],
+                        visible,
+                    ),
+                ),
+            )
+        evidence = await _timed(
+            search_samples,
+            lambda query=query: retriever.search(query.text, top_k=top_k),
+        )
+        search_hits += any(item.source == query.target_source for item in evidence)
+
+    report["latency"] = {"bm25": _summary(bm25_samples), "search": _summary(search_samples)}
+    if vector_samples:
+        report["latency"]["vector_scores"] = _summary(vector_samples)
+
+    truth = queries[:truth_queries]
+    report["recall_at_k"] = {
+        "k": top_k,
+        "bm25": round(
+            statistics.fmean(
+                _recall(brute_force_bm25(retriever, query.text, top_k), bm25_results[position][:top_k])
+                for position, query in enumerate(truth)
+            ),
+            4,
+        )
+        if truth
+        else None,
+        "search_target_source": round(search_hits / len(queries), 4) if queries else None,
+    }
+    if provider_url and retriever._vectors is not None and truth:
+        recalls = []
+        for position, query in enumerate(truth):
+            query_vector = retriever._normalize(np.asarray([_fake_vector(query.text)], dtype=np.float32))[0]
+            expected = np.argsort(-(retriever._vectors @ query_vector), kind="stable")[:top_k].tolist()
+            actual = sorted(vector_results[position], key=vector_results[position].get, reverse=True)
+            recalls.append(_recall(expected, actual[:top_k]))
+        report["recall_at_k"]["vector_scores"] = round(statistics.fmean(recalls), 4)
+    report["peak_rss_mb"] = _peak_rss_mb()
+    await retriever.aclose()
+    return report
+
+
+def _sizes(value: str) -> list[int]:
+    sizes = [int(float(part)) for part in value.split(",") if part.strip()]
+    if not sizes or any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("--chunks 需为逗号分隔的正整数，例如 1000,10000")
+    return sizes
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="OphAgent 混合检索离线基准（合成语料 + 本地假 Embedding/Rerank）")
+    parser.add_argument("--chunks", type=_sizes, default=[1_000, 10_000], help="语料规模，逗号分隔，如 1e3,1e4,1e5")
+    parser.add_argument("--queries", type=int, default=200, help="每个规模的计时查询数")
+    parser.add_argument("--truth-queries", type=int, default=20, help="参与暴力基准召回计算的查询数")
+    parser.add_argument("--top-k", type=int, default=6, help="召回评估的 k")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--lexical-only", action="store_true", help="不启动假 Embedding/Rerank 服务")
+    parser.add_argument("--workdir", type=Path, default=None, help="保留语料与索引的目录；默认使用临时目录")
+    parser.add_argument("--output", type=Path, default=None, help="把 JSON 报告写入该文件")
+    return parser
+
+
+def _workdirs(root: Path | None, sizes: list[int]) -> Iterator[tuple[int, Path]]:
+    if root is not None:
+        for size in sizes:
+            yield size, root / f"chunks_{size}"
+        return
+    with tempfile.TemporaryDirectory(prefix="ophagent-bench-") as temporary:
+        for size in sizes:
+            yield size, Path(temporary) / f"chunks_{size}"
+
+
+async def async_main(args: argparse.Namespace) -> list[dict[str, Any]]:
+    server: ThreadingHTTPServer | None = None
+    provider_url: str | None = None
+    if not args.lexical_only:
+        server, provider_url = start_fake_provider()
+    reports: list[dict[str, Any]] = []
+    try:
+        for size, workdir in _workdirs(args.workdir, args.chunks):
+            report = await run_size(
+                size,
+                workdir=workdir,
+                provider_url=provider_url,
+                query_count=max(1, args.queries),
+                truth_queries=max(0, args.truth_queries),
+                top_k=max(1, args.top_k),
+                seed=args.seed,
+            )
+            reports.append(report)
+            latency = report["latency"]
+            print(
+                f"{report['indexed_chunks']:>9} chunks | build {report['build_s']:.2f}s"
+                f" | load {report['load_s']:.2f}s"
+                f" | bm25 p50/p99 {latency['bm25']['p50_ms']}/{latency['bm25']['p99_ms']} ms"
+                f" | search p50/p99 {latency['search']['p50_ms']}/{latency['search']['p99_ms']} ms"
+                f" | recall@{report['recall_at_k']['k']} {report['recall_at_k']}"
+                f" | peak RSS {report['peak_rss_mb']} MB",
+                flush=True,
+            )
+    finally:
+        if server is not None:
+            server.shutdown()
+    if args.output is not None:
+        args.output.write_text(json.dumps(reports, ensure_ascii=False, indent=2), "utf-8")
+    return reports
+
+
+def main() -> None:
+    asyncio.run(async_main(build_parser().parse_args()))
+
+
+if __name__ == "__main__":
+    main()
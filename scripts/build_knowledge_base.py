@@ -6,20 +6,27 @@ from __future__ import annotations
 import argparse
 import asyncio
 import hashlib
+import json
 import os
 import re
 import shutil
 import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from app.core.config import settings  # noqa: E402
 from app.knowledge import HybridKnowledgeRetriever  # noqa: E402
+from app.services.state import atomic_json  # noqa: E402
 
 SUPPORTED_SUFFIXES = {".md", ".txt", ".pdf"}
+COLLECT_MANIFEST = ".collect_manifest.json"
+COLLECT_WORKERS = 8
 
 
 @dataclass(frozen=True, slots=True)
@@ -52,48 +59,159 @@ def _safe_name(value: str) -> str:
     return normalized or "source"
 
 
+@dataclass(slots=True)
+class _Candidate:
+    source: SourceSpec
+    path: Path
+    size: int
+    mtime_ns: int
+    checksum: str | None = None
+
+
+def _load_manifest(path: Path) -> dict[str, dict[str, Any]]:
+    try:
+        payload = json.loads(path.read_text("utf-8"))
+    except (OSError, ValueError):
+        return {"inputs": {}, "targets": {}}
+    if not isinstance(payload, dict):
+        return {"inputs": {}, "targets": {}}
+    return {
+        "inputs": dict(payload.get("inputs") or {}),
+        "targets": dict(payload.get("targets") or {}),
+    }
+
+
 def collect_documents(
     sources: list[SourceSpec],
     target_dir: Path,
     *,
     dry_run: bool = False,
+    workers: int = COLLECT_WORKERS,
 ) -> tuple[int, int]:
-    """Copy supported files into the configured raw corpus with checksum dedupe."""
+    """Copy supported files into the configured raw corpus with content dedupe.
+
+    Files are grouped by size first and only sizes shared by two or more
+    files (inputs or already collected documents) are hashed. Hashing and
+    copying run on a thread pool. ``COLLECT_MANIFEST`` in the target directory
+    remembers every input's size, mtime and destination, so reruns skip
+    unchanged inputs without reading them.
+    """
     if not sources:
         raise ValueError("--collect 至少需要一个 --source NAME=PATH")
     target_dir.mkdir(parents=True, exist_ok=True)
-    known = {
-        _checksum(path)
-        for path in target_dir.iterdir()
-        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES
-    }
-    imported = 0
+    manifest_path = target_dir / COLLECT_MANIFEST
+    manifest = _load_manifest(manifest_path)
+    inputs: dict[str, dict[str, Any]] = manifest["inputs"]
+    cached_targets: dict[str, dict[str, Any]] = manifest["targets"]
+
+    targets: dict[str, dict[str, Any]] = {}
+    for path in target_dir.iterdir():
+        if not path.is_file() or path.suffix.lower() not in SUPPORTED_SUFFIXES:
+            continue
+        stat = path.stat()
+        cached = cached_targets.get(path.name) or {}
+        unchanged = cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns
+        targets[path.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "checksum": cached.get("checksum") if unchanged else None,
+        }
+
     skipped = 0
+    candidates: list[_Candidate] = []
     for source in sources:
         for path in sorted(source.path.rglob("*")):
             if not path.is_file() or path.suffix.lower() not in SUPPORTED_SUFFIXES:
                 continue
-            checksum = _checksum(path)
-            if checksum in known:
+            stat = path.stat()
+            previous = inputs.get(str(path)) or {}
+            if (
+                previous.get("size") == stat.st_size
+                and previous.get("mtime_ns") == stat.st_mtime_ns
+                and previous.get("destination") in targets
+            ):
+                skipped += 1
+                continue
+            candidates.append(_Candidate(source, path, stat.st_size, stat.st_mtime_ns))
+
+    sizes = Counter(entry["size"] for entry in targets.values())
+    sizes.update(candidate.size for candidate in candidates)
+    colliding = {size for size, count in sizes.items() if count > 1}
+    stale_targets = [
+        name
+        for name, entry in targets.items()
+        if entry["size"] in colliding and entry["checksum"] is None
+    ]
+    to_hash = [candidate for candidate in candidates if candidate.size in colliding]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, checksum in zip(
+            stale_targets,
+            pool.map(_checksum, (target_dir / name for name in stale_targets)),
+            strict=True,
+        ):
+            targets[name]["checksum"] = checksum
+        for candidate, checksum in zip(
+            to_hash,
+            pool.map(_checksum, (candidate.path for candidate in to_hash)),
+            strict=True,
+        ):
+            candidate.checksum = checksum
+
+        known = {
+            entry["checksum"]: name for name, entry in targets.items() if entry["checksum"]
+        }
+        reserved = set(targets)
+        copies: list[tuple[_Candidate, Path]] = []
+        for candidate in candidates:
+            if candidate.checksum is not None and candidate.checksum in known:
                 skipped += 1
+                inputs[str(candidate.path)] = {
+                    "size": candidate.size,
+                    "mtime_ns": candidate.mtime_ns,
+                    "destination": known[candidate.checksum],
+                }
                 continue
-            relative = path.relative_to(source.path)
-            stem = _safe_name(f"{source.name}_{relative.with_suffix('')}")
-            destination = target_dir / f"{stem}{path.suffix.lower()}"
+            suffix = candidate.path.suffix.lower()
+            relative = candidate.path.relative_to(candidate.source.path)
+            stem = _safe_name(f"{candidate.source.name}_{relative.with_suffix('')}")
+            destination = target_dir / f"{stem}{suffix}"
             counter = 2
-            while destination.exists():
-                destination = target_dir / f"{stem}_{counter}{path.suffix.lower()}"
+            while destination.name in reserved or destination.exists():
+                destination = target_dir / f"{stem}_{counter}{suffix}"
                 counter += 1
-            if not dry_run:
-                temporary = destination.with_suffix(destination.suffix + ".tmp")
-                shutil.copyfile(path, temporary)
-                os.replace(temporary, destination)
-            known.add(checksum)
-            imported += 1
-    return imported, skipped
+            reserved.add(destination.name)
+            if candidate.checksum is not None:
+                known[candidate.checksum] = destination.name
+            copies.append((candidate, destination))
+        if dry_run:
+            return len(copies), skipped
+        list(pool.map(lambda item: _copy(item[0].path, item[1]), copies))
+
+    for candidate, destination in copies:
+        stat = destination.stat()
+        targets[destination.name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "checksum": candidate.checksum,
+        }
+        inputs[str(candidate.path)] = {
+            "size": candidate.size,
+            "mtime_ns": candidate.mtime_ns,
+            "destination": destination.name,
+        }
+    atomic_json(manifest_path, {"inputs": inputs, "targets": targets})
+    return len(copies), skipped
+
+
+def _copy(source: Path, destination: Path) -> None:
+    temporary = destination.with_suffix(destination.suffix + ".tmp")
+    shutil.copyfile(source, temporary)
+    os.replace(temporary, destination)
 
 
 async def rebuild_index(include_embeddings: bool) -> None:
+    # Chunks of unchanged sources are reused and only new chunks are embedded,
+    # so running this after an append-only import is an incremental update.
     retriever = HybridKnowledgeRetriever(settings)
     status = await retriever.rebuild(include_embeddings=include_embeddings)
     print(status.model_dump_json(indent=2))
@@ -135,6 +253,17 @@ def build_parser() -> argparse.ArgumentParser:
         help="只构建 BM25 与图谱索引，不调用 Embedding 服务",
     )
     parser.add_argument("--dry-run", action="store_true", help="仅统计待导入文件")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=COLLECT_WORKERS,
+        help="导入时并行计算校验和与复制文件的线程数",
+    )
+    parser.add_argument(
+        "--update-index",
+        action="store_true",
+        help="导入后增量更新索引：只切分与嵌入新增来源",
+    )
     return parser
 
 
@@ -144,8 +273,11 @@ async def async_main(args: argparse.Namespace) -> None:
             args.source,
             settings.resolve_path(settings.KNOWLEDGE_RAW_DIR),
             dry_run=args.dry_run,
+            workers=args.workers,
         )
-        print(f"待导入/已导入 {imported} 个文件，按内容跳过 {skipped} 个重复文件")
+        print(f"待导入/已导入 {imported} 个文件，按内容跳过 {skipped} 个重复或未变化文件")
+        if args.update_index and imported and not args.dry_run:
+            await rebuild_index(include_embeddings=not args.lexical_only)
     elif args.build_index:
         await rebuild_index(include_embeddings=not args.lexical_only)
     elif args.search:
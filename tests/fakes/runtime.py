@@ -113,6 +113,23 @@ class FakeCapabilityClients:
             data={"evidence": [item.model_dump(mode="json")]},
         )
 
+    async def retrieve_medical_evidence_many(
+        self,
+        queries: list[str],
+        top_k: int = 6,
+        *,
+        user_id: int | None = None,
+    ) -> ToolResult:
+        results = []
+        for query in queries:
+            single = await self.retrieve_medical_evidence(query, top_k, user_id=user_id)
+            results.append({"query": query, "evidence": single.data["evidence"]})
+        return ToolResult(
+            status="ok",
+            capability="medical_retrieval",
+            data={"results": results},
+        )
+
     async def search_web(self, request) -> ToolResult:
         return ToolResult(status="ok", capability="web_search", data={"evidence": []})
 
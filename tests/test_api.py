@@ -14,6 +14,7 @@ def test_health_and_frontend_are_served():
         health = client.get("/api/v1/health")
         assert health.status_code == 200
         assert health.json()["version"] == "3.0.0"
+        assert health.json()["knowledge_index"] in {"cold", "warming", "ready", "failed"}
         frontend = client.get("/")
         assert frontend.status_code == 200
         assert "OphAgent-Pro" in frontend.text
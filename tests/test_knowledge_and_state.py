@@ -1,17 +1,33 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import sqlite3
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
 
 import fitz
+import numpy as np
 import pytest
+from pydantic import SecretStr
 
 from app.core.config import Settings
 from app.domain.models import MemoryRecord
+from app.knowledge.chunking import SentenceChunker
+from app.knowledge.graph import (
+    ENTITY_TYPES,
+    OphthaGraph,
+    _count_cooccurrence,
+    _node_id,
+    _PartialGraph,
+    entity_matcher,
+)
 from app.knowledge.retrieval import HybridKnowledgeRetriever
-from app.knowledge.sources import SourceRegistry, _atomic_json
-from app.runtime.agents import IMMUTABLE_SKILL_BOUNDARY, AgentScopeRunner
+from app.knowledge.sources import SourceRegistry
+from app.runtime.agents import IMMUTABLE_SKILL_BOUNDARY, AgentScopeRunner, agent_templates
+from app.services.skill_catalog import skill_catalog
 from app.services.state import (
     MemoryStore,
     PersistentStateError,
@@ -140,11 +156,43 @@ def test_portable_knowledge_collection_deduplicates_content(tmp_path):
     assert len(list(target.glob("*.md"))) == 1
 
 
+@pytest.mark.asyncio
+async def test_collector_hashes_only_size_collisions_and_index_update_is_incremental(tmp_path):
+    config = build_settings(tmp_path)
+    source = tmp_path / "external"
+    source.mkdir()
+    (source / "unique.md").write_text("# 黄斑\n\n黄斑变性患者需要定期复查 OCT 与视力，并记录视物变形的变化。", "utf-8")
+    (source / "a.md").write_text("# 角膜\n\n角膜炎需要尽快就诊并做病原学检查，避免自行使用激素滴眼液。", "utf-8")
+    (source / "b.md").write_text("# 角膜\n\n角膜炎需要尽快就诊并做病原学检查，避免自行使用激素滴眼液。", "utf-8")
+    target = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    spec = SourceSpec(name="dump", path=source)
+
+    assert collect_documents([spec], target, workers=4) == (2, 1)
+    manifest = json.loads((target / ".collect_manifest.json").read_text("utf-8"))
+    assert manifest["targets"]["dump_unique.md"]["checksum"] is None
+    assert manifest["targets"]["dump_a.md"]["checksum"]
+    assert collect_documents([spec], target) == (0, 3)
+
+    retriever = HybridKnowledgeRetriever(config)
+    await retriever.rebuild(include_embeddings=False)
+    first = {chunk.id for chunk in retriever._chunks}
+
+    (source / "new.md").write_text("# 青光眼\n\n青光眼患者需要长期监测眼压和视野进展，并按时复诊调整用药。", "utf-8")
+    assert collect_documents([spec], target) == (1, 3)
+    retriever.invalidate()
+    status = await retriever.rebuild(include_embeddings=False)
+
+    manifest = json.loads(retriever.manifest_path.read_text("utf-8"))
+    assert manifest["chunks_reused"] == len(first)
+    assert first < {chunk.id for chunk in retriever._chunks}
+    assert status.chunks == len(first) + 1
+
+
 def test_atomic_source_registry_writes_are_safe_under_concurrency(tmp_path):
     path = tmp_path / "index" / "sources.json"
 
     with ThreadPoolExecutor(max_workers=8) as executor:
-        list(executor.map(lambda index: _atomic_json(path, {"writer": index}), range(64)))
+        list(executor.map(lambda index: atomic_json(path, {"writer": index}), range(64)))
 
     payload = json.loads(path.read_text("utf-8"))
     assert payload["writer"] in range(64)
@@ -280,6 +328,52 @@ async def test_confirmed_conflicting_memories_are_withheld_from_model_context(tm
     assert result == []
 
 
+@pytest.mark.asyncio
+async def test_memory_store_imports_legacy_json_and_batches_access_times(tmp_path):
+    config = build_settings(tmp_path)
+    legacy = [
+        MemoryRecord(
+            user_id=user_id,
+            category="preference",
+            content=f"回答简洁 {user_id}",
+            source="用户确认",
+            status="confirmed",
+        )
+        for user_id in (1, 2)
+    ]
+    atomic_json(
+        config.resolve_path(config.MEMORY_STATE_PATH),
+        [item.model_dump(mode="json") for item in legacy],
+    )
+    store = MemoryStore(config)
+
+    assert [item.id for item in await store.list(1)] == [legacy[0].id]
+    found = await store.search(2, "回答简洁")
+    assert [item.id for item in found] == [legacy[1].id]
+    assert (await store.list(2))[0].last_accessed_at is not None
+
+    reopened = MemoryStore(config)
+    assert (await reopened.list(2))[0].last_accessed_at is None
+    with pytest.raises(RuntimeError), store._transaction():
+        raise RuntimeError("rolled back")
+    assert (await reopened.list(2))[0].last_accessed_at is None
+    await store.flush_access_times()
+    assert (await reopened.list(2))[0].last_accessed_at is not None
+    assert store._accessed == {}
+    with closing(sqlite3.connect(store.database_path)) as connection:
+        plan = " ".join(
+            row[-1]
+            for row in connection.execute(
+                "EXPLAIN QUERY PLAN SELECT payload_json FROM memory_records "
+                "WHERE user_id = ? AND status = 'confirmed' AND category = ?",
+                (1, "preference"),
+            )
+        )
+    assert "ix_memory_user_status_category" in plan
+    # The legacy file is only read once and kept as a rollback source.
+    assert json.loads(store.path.read_text("utf-8"))[0]["id"] == legacy[0].id
+
+
 @pytest.mark.asyncio
 async def test_skill_candidate_requires_matching_evaluation(tmp_path):
     store = SkillStore(build_settings(tmp_path))
@@ -391,8 +485,848 @@ dependencies: []
     )
 
 
+@pytest.mark.asyncio
+async def test_skill_catalog_parses_once_and_follows_file_changes(tmp_path):
+    config = build_settings(tmp_path)
+    skill_dir = config.resolve_path(config.SKILL_ROOT) / "ophthalmic_interview"
+    skill_dir.mkdir(parents=True)
+    (skill_dir / "SKILL.md").write_text(
+        "---\nname: ophthalmic_interview\ndescription: 问诊\n---\n\n# 问诊\n",
+        "utf-8",
+    )
+    store = SkillStore(config)
+    catalog = skill_catalog(config)
+    assert store.catalog is catalog
+
+    assert [item.description for item in await store.list()] == ["问诊"]
+    runner = AgentScopeRunner(FakeCapabilityClients(), config)
+    for _ in range(3):
+        assert runner._enabled_skill_paths("ClinicalReasoningAgent") == [skill_dir]
+    assert "ophthalmic_interview" in runner._skill_prompt("ClinicalReasoningAgent")
+    assert catalog.parses == 1
+
+    (skill_dir / "SKILL.md").write_text(
+        "---\nname: ophthalmic_interview\ndescription: 结构化问诊\n---\n\n# 问诊\n",
+        "utf-8",
+    )
+    assert [item.description for item in await store.list()] == ["结构化问诊"]
+    assert catalog.parses == 2
+
+    await store.set_status("ophthalmic_interview", "disabled")
+    assert runner._enabled_skill_paths("ClinicalReasoningAgent") == []
+    assert catalog.parses == 2
+
+
+def test_agent_templates_are_shared_but_agents_stay_per_run(tmp_path):
+    config = build_settings(tmp_path).model_copy(
+        update={"AGENT_MODEL": "model", "AGENT_URL": "https://model.test/v1", "AGENT_API_KEY": SecretStr("key")},
+    )
+    skill_dir = config.resolve_path(config.SKILL_ROOT) / "guideline_retrieval"
+    skill_dir.mkdir(parents=True)
+    (skill_dir / "SKILL.md").write_text(
+        "---\nname: guideline_retrieval\ndescription: 指南检索\n---\n\n# 检索\n",
+        "utf-8",
+    )
+    first_clients, second_clients = FakeCapabilityClients(), FakeCapabilityClients()
+    first = AgentScopeRunner(first_clients, config)
+    second = AgentScopeRunner(second_clients, config)
+    misses = agent_templates.misses
+
+    first_agent = first._agent("EvidenceAgent")
+    second_agent = second._agent("EvidenceAgent")
+    assert agent_templates.misses == misses + 1
+    assert first._template("EvidenceAgent") is second._template("EvidenceAgent")
+    assert first_agent is not second_agent
+    assert first_agent.memory is not second_agent.memory
+    assert first_agent.model is not second_agent.model
+    assert first_agent.toolkit is not second_agent.toolkit
+    assert second_agent.toolkit.tools["medical_retrieval"].original_func.__closure__ != (
+        first_agent.toolkit.tools["medical_retrieval"].original_func.__closure__
+    )
+    assert first_agent.toolkit.get_json_schemas() == second_agent.toolkit.get_json_schemas()
+    assert first_agent._sys_prompt.endswith(IMMUTABLE_SKILL_BOUNDARY)
+    assert "guideline_retrieval" in first_agent.sys_prompt
+    assert second.used_skill_ids == {"guideline_retrieval"}
+
+    (skill_dir / "SKILL.md").write_text(
+        "---\nname: guideline_retrieval\ndescription: 更新后的指南检索\n---\n\n# 检索\n",
+        "utf-8",
+    )
+    third = AgentScopeRunner(FakeCapabilityClients(), config)
+    assert "更新后的指南检索" in third._agent("EvidenceAgent").sys_prompt
+    assert agent_templates.misses == misses + 2
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_are_memoized_across_roles_within_one_run(tmp_path):
+    class CountingClients(FakeCapabilityClients):
+        def __init__(self) -> None:
+            self.queries: list[str] = []
+            self.fail = False
+
+        async def retrieve_medical_evidence(self, query, top_k=6, *, user_id=None):
+            self.queries.append(query)
+            await asyncio.sleep(0)
+            if self.fail:
+                raise RuntimeError("retrieval unavailable")
+            return await super().retrieve_medical_evidence(query, top_k, user_id=user_id)
+
+    config = build_settings(tmp_path)
+    clients = CountingClients()
+    runner = AgentScopeRunner(clients, config)
+    runner.set_run_context("core", user_id=7)
+    supervisor = runner._tool_functions("SupervisorAgent")[0]
+    evidence = runner._tool_functions("EvidenceAgent")[0]
+
+    first, second, third = await asyncio.gather(
+        supervisor("青光眼  眼压"),
+        evidence("青光眼 眼压 "),
+        evidence("青光眼 眼压"),
+    )
+    assert clients.queries == ["青光眼 眼压"]
+    assert first.content == second.content == third.content
+    assert json.loads(first.content[0]["text"])["governance_track"] == "untrusted_data"
+    assert runner.tool_calls_deduplicated == 2
+
+    await evidence("青光眼 眼压", top_k=3)
+    assert len(clients.queries) == 2
+
+    clients.fail = True
+    with pytest.raises(RuntimeError):
+        await evidence("黄斑水肿")
+    clients.fail = False
+    await evidence("黄斑水肿")
+    assert clients.queries[-2:] == ["黄斑水肿", "黄斑水肿"]
+
+    other_run = AgentScopeRunner(clients, config)
+    await other_run._tool_functions("EvidenceAgent")[0]("青光眼 眼压")
+    assert other_run.tool_calls_deduplicated == 0
+    assert runner.tool_calls_deduplicated == 2
+
+
 @pytest.mark.asyncio
 async def test_safety_critical_skill_cannot_be_disabled_online(tmp_path):
     store = SkillStore(build_settings(tmp_path))
     with pytest.raises(ValueError, match="安全关键"):
         await store.set_status("red_flag_triage", "disabled")
+
+
+@pytest.mark.asyncio
+async def test_interrupted_embedding_rebuild_resumes_from_checkpoint(tmp_path):
+    import httpx
+    from pydantic import SecretStr
+
+    config = build_settings(tmp_path).model_copy(
+        update={
+            "EMBEDDING_MODEL": "bge-m3",
+            "SILICONFLOW_API_KEY": SecretStr("key"),
+            "KNOWLEDGE_EMBED_BATCH_SIZE": 2,
+            "KNOWLEDGE_EMBED_CONCURRENCY": 1,
+        },
+    )
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    for index in range(6):
+        (raw / f"doc-{index}.md").write_text(
+            f"# 文档 {index}\n\n青光眼随访记录第 {index} 份，包含眼压与视野复查要点。",
+            "utf-8",
+        )
+
+    class FlakyRetriever(HybridKnowledgeRetriever):
+        embedded: list[str] = []
+        fail_after: int | None = None
+        oversized: bool = False
+
+        async def _embed_batch(self, client, texts):
+            if self.oversized and len(texts) > 1:
+                request = httpx.Request("POST", "https://embedding.test")
+                raise httpx.HTTPStatusError(
+                    "too large",
+                    request=request,
+                    response=httpx.Response(413, request=request),
+                )
+            if self.fail_after is not None and len(self.embedded) >= self.fail_after:
+                raise httpx.ConnectError("provider went away")
+            self.embedded.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+
+    retriever = FlakyRetriever(config)
+    retriever.fail_after = 4
+    with pytest.raises(httpx.ConnectError):
+        await retriever.rebuild()
+    assert len(retriever.embedded) == 4
+
+    retriever.embedded = []
+    retriever.fail_after = None
+    retriever.oversized = True
+    status = await retriever.rebuild()
+    assert status.vectors == 6
+    assert len(retriever.embedded) == 2
+    assert retriever._manifest["vectors_reused"] == 4
+
+    retriever.embedded = []
+    assert (await retriever.rebuild()).vectors == 6
+    assert retriever.embedded == []
+    shards = list((retriever.embedding_cache_dir).glob("*/*.npz"))
+    assert len(shards) == 1
+
+
+@pytest.mark.asyncio
+async def test_query_embeddings_are_cached_until_index_fingerprint_changes(tmp_path):
+    from pydantic import SecretStr
+
+    config = build_settings(tmp_path).model_copy(
+        update={"EMBEDDING_MODEL": "bge-m3", "SILICONFLOW_API_KEY": SecretStr("key")},
+    )
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "青光眼指南（2024）.md").write_text(
+        "# 青光眼\n\n青光眼评估应记录眼压、视野与视神经结构。",
+        "utf-8",
+    )
+
+    class CountingRetriever(HybridKnowledgeRetriever):
+        queries: list[str] = []
+
+        async def _embed(self, texts, *, on_batch=None):
+            self.queries.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+
+    retriever = CountingRetriever(config)
+    await retriever.search("青光眼 眼压", top_k=2)
+    await retriever.search("  青光眼   眼压 ", top_k=2)
+    assert retriever.queries.count("青光眼 眼压") == 1
+    stats = retriever.status().cache["query_embedding"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    (raw / "视网膜指南（2025）.md").write_text("# 视网膜\n\n眼压与视网膜复查。", "utf-8")
+    retriever.invalidate()
+    await retriever.search("青光眼 眼压", top_k=2)
+    assert retriever.queries.count("青光眼 眼压") == 2
+
+
+def test_source_registry_rehashes_only_changed_files_and_imports_legacy_json(tmp_path):
+    config = build_settings(tmp_path)
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    guide = raw / "青光眼指南（2024）.md"
+    guide.write_text("# 青光眼\n\n眼压复查。", "utf-8")
+    legacy = config.resolve_path(config.KNOWLEDGE_INDEX_DIR) / "sources.json"
+    legacy.parent.mkdir(parents=True, exist_ok=True)
+    legacy_record = {
+        "id": "src_legacy",
+        "title": "旧版指南",
+        "path": "legacy.md",
+        "source_type": "guideline",
+        "status": "current",
+        "checksum": "0" * 64,
+    }
+    atomic_json(legacy, [legacy_record])
+
+    registry = SourceRegistry(config)
+    assert registry.list(refresh=False)[0].id == "src_legacy"
+    first = registry.list()
+    assert [item.title for item in first] == ["青光眼指南（2024）"]
+    assert registry.hashed_files == 1
+
+    registry.list()
+    registry.get(first[0].id)
+    assert registry.hashed_files == 1
+
+    guide.write_text("# 青光眼\n\n眼压与视野复查。", "utf-8")
+    changed = registry.list()
+    assert registry.hashed_files == 2
+    assert changed[0].id == first[0].id
+    assert changed[0].checksum != first[0].checksum
+    assert changed[0].verified is False
+    assert json.loads(legacy.read_text("utf-8")) == [legacy_record]
+
+
+@pytest.mark.asyncio
+async def test_pdf_ingestion_runs_in_worker_pool_and_renders_page_visuals_lazily(tmp_path):
+    config = build_settings(tmp_path).model_copy(update={"KNOWLEDGE_INGEST_WORKERS": 2})
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    for name in ("OCT流程（2025）", "视野检查（2024）"):
+        document = fitz.open()
+        for page_number in range(1, 3):
+            page = document.new_page()
+            page.insert_text((72, 72), f"{name} page {page_number} visual evidence " * 4)
+        document.save(raw / f"{name}.pdf")
+        document.close()
+    private_path = raw / "private.pdf"
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), "owneronly private scan evidence " * 4)
+    document.save(private_path)
+    document.close()
+    private_source = SourceRegistry(config).register_upload(private_path, user_id=7)
+
+    retriever = HybridKnowledgeRetriever(config)
+    status = await retriever.rebuild(include_embeddings=False)
+    assert status.page_visuals >= 5
+    visual_dir = config.resolve_path(config.KNOWLEDGE_INDEX_DIR) / "page_visuals"
+    assert not list(visual_dir.glob("*/*.png"))
+
+    evidence = (await retriever.search("OCT visual evidence", top_k=1))[0]
+    assert "page 2" in evidence.excerpt or "page 1" in evidence.excerpt
+    image = retriever.render_page_visual(evidence.visual_path)
+    assert image.read_bytes().startswith(b"\x89PNG")
+    modified = image.stat().st_mtime_ns
+    assert retriever.render_page_visual(evidence.visual_path).stat().st_mtime_ns == modified
+
+    private_visual = f"{visual_dir}/{private_source.id}/page_0001.png"
+    with pytest.raises(KeyError):
+        retriever.render_page_visual(private_visual, user_id=8)
+    assert retriever.render_page_visual(private_visual, user_id=7).is_file()
+    with pytest.raises(KeyError):
+        retriever.render_page_visual(str(visual_dir / ".." / "chunks.jsonl"))
+
+
+def test_graph_matcher_and_partial_counts_match_naive_cooccurrence(tmp_path):
+    labels = [(kind, label) for kind, values in ENTITY_TYPES.items() for label in values]
+    texts = [
+        "高度近视合并青光眼，需 oct 与眼压随访",
+        "糖尿病视网膜病变患者视力下降，建议转诊并行玻璃体内注射",
+        "干眼 畏光 红眼",
+        "无相关实体",
+    ]
+    for text in texts:
+        assert entity_matcher().find(text) == {
+            _node_id(kind, label) for kind, label in labels if label.lower() in text.lower()
+        }
+
+    pairs = [(f"source-{index % 3}", texts[index % len(texts)]) for index in range(40)]
+    serial = _count_cooccurrence(pairs)
+    merged = _PartialGraph()
+    for start in range(0, len(pairs), 7):
+        merged.merge(_count_cooccurrence(pairs[start : start + 7]))
+    assert merged.edge_counts == serial.edge_counts
+    assert merged.edge_sources == serial.edge_sources
+
+    graph = OphthaGraph(build_settings(tmp_path))
+    graph.build(pairs)
+    expanded = graph.expand("青光眼怎么复查")
+    assert "眼压" in expanded and "青光眼" not in expanded
+    assert OphthaGraph(build_settings(tmp_path)).expand("青光眼怎么复查") == expanded
+
+
+@pytest.mark.asyncio
+async def test_visibility_masks_keep_invisible_chunks_out_of_scoring_and_rerank(tmp_path):
+    from pydantic import SecretStr
+
+    config = build_settings(tmp_path).model_copy(
+        update={"EMBEDDING_MODEL": "bge-m3", "SILICONFLOW_API_KEY": SecretStr("key")},
+    )
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    for name in ("public", "expired", "private-a", "private-b"):
+        (raw / f"{name}.md").write_text(
+            f"# {name}\n\nmaskterm retinal follow-up evidence held in the {name} source.",
+            "utf-8",
+        )
+    registry = SourceRegistry(config)
+    owner_a = registry.register_upload(raw / "private-a.md", user_id=1)
+    registry.register_upload(raw / "private-b.md", user_id=2)
+    expired = next(item for item in registry.list() if item.title == "expired")
+    registry.update(expired.id, {"status": "expired"})
+
+    class RecordingRetriever(HybridKnowledgeRetriever):
+        reranked: list[set[str]] = []
+
+        async def _embed(self, texts, *, on_batch=None):
+            return [[1.0, 0.0] for _ in texts]
+
+        async def _rerank(self, query, candidates):
+            self.reranked.append({chunk.source for _, chunk in candidates})
+            return candidates, False
+
+    retriever = RecordingRetriever(config)
+    await retriever.load()
+    retriever._vectors = np.ones((len(retriever._chunks), 2), dtype=np.float32)
+
+    await retriever.search("maskterm", top_k=4, user_id=1)
+    assert {Path(path).stem for path in retriever.reranked[-1]} == {"public", "private-a"}
+    visible = retriever._visible_mask(1)
+    vector_hits = await retriever._vector_scores("maskterm", [], visible)
+    assert {retriever._chunks[index].source_id for index in vector_hits} <= {
+        owner_a.id,
+        *(chunk.source_id for chunk in retriever._chunks if "public" in chunk.source),
+    }
+
+    await retriever.search("maskterm", top_k=4)
+    assert {Path(path).stem for path in retriever.reranked[-1]} == {"public"}
+
+
+@pytest.mark.asyncio
+async def test_search_many_matches_single_searches_with_one_embedding_request(tmp_path):
+    from pydantic import SecretStr
+
+    from app.tools.capabilities import CapabilityClients
+
+    config = build_settings(tmp_path).model_copy(
+        update={"EMBEDDING_MODEL": "bge-m3", "SILICONFLOW_API_KEY": SecretStr("key")},
+    )
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "青光眼指南（2024）.md").write_text(
+        "# 青光眼\n\n青光眼评估应记录眼压、视野与视神经结构。",
+        "utf-8",
+    )
+    (raw / "白内障指南（2023）.md").write_text(
+        "# 白内障\n\n白内障术前应评估视力、角膜内皮与眼底情况。",
+        "utf-8",
+    )
+
+    class CountingRetriever(HybridKnowledgeRetriever):
+        calls: list[list[str]] = []
+
+        async def _embed(self, texts, *, on_batch=None):
+            self.calls.append(list(texts))
+            return [[float(len(text) % 7), 1.0] for text in texts]
+
+    queries = ["青光眼 眼压", "白内障 术前评估", "青光眼 眼压", "12345"]
+    batched_retriever = CountingRetriever(config)
+    await batched_retriever.rebuild(include_embeddings=False)
+    batched, fell_back = await batched_retriever.search_many(queries, top_k=2)
+    assert fell_back == [False] * len(queries)
+    assert len([call for call in batched_retriever.calls if "青光眼 眼压" in call]) == 1
+
+    def ranked(results):
+        return [[(item.title, item.locator, item.score) for item in items] for items in results]
+
+    assert ranked(batched)[0] == ranked(batched)[2]
+    assert batched[3] == []
+    single_retriever = CountingRetriever(config)
+    singles = [await single_retriever.search(query, top_k=2) for query in queries]
+    assert ranked(batched) == ranked(singles)
+
+    clients = CapabilityClients(config, retriever=batched_retriever)
+    try:
+        result = await clients.retrieve_medical_evidence_many(queries[:2], top_k=2)
+    finally:
+        await clients.close()
+    assert [item["query"] for item in result.data["results"]] == queries[:2]
+    assert result.data["results"][0]["evidence"]
+
+
+@pytest.mark.asyncio
+async def test_evidence_cache_survives_restart_and_misses_after_corpus_change(tmp_path):
+    from app.tools.capabilities import CapabilityClients
+
+    config = build_settings(tmp_path)
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "青光眼指南（2024）.md").write_text(
+        "# 青光眼\n\n青光眼评估应记录眼压、视野与视神经结构。",
+        "utf-8",
+    )
+
+    class CountingRetriever(HybridKnowledgeRetriever):
+        searches = 0
+
+        async def search_many(self, queries, top_k=6, *, user_id=None):
+            type(self).searches += 1
+            return await super().search_many(queries, top_k, user_id=user_id)
+
+    async def retrieve(query: str, user_id: int | None = None):
+        clients = CapabilityClients(config, retriever=CountingRetriever(config))
+        try:
+            return await clients.retrieve_medical_evidence(query, top_k=2, user_id=user_id)
+        finally:
+            await clients.close()
+
+    first = await retrieve("青光眼 眼压")
+    again = await retrieve("青光眼   眼压", user_id=5)
+    assert CountingRetriever.searches == 1
+    assert set(again.data) == set(first.data) == {"evidence"}
+
+    def stable(evidence):
+        return [{k: v for k, v in item.items() if k not in {"id", "retrieved_at"}} for item in evidence]
+
+    assert stable(again.data["evidence"]) == stable(first.data["evidence"])
+    assert {item["id"] for item in again.data["evidence"]}.isdisjoint(
+        item["id"] for item in first.data["evidence"]
+    )
+    assert again.data["evidence"][0]["retrieved_at"] > first.data["evidence"][0]["retrieved_at"]
+
+    batch_clients = CapabilityClients(config, retriever=CountingRetriever(config))
+    try:
+        batch = await batch_clients.retrieve_medical_evidence_many(
+            ["青光眼 眼压", "视野 检查", "视野  检查"],
+            top_k=2,
+        )
+    finally:
+        await batch_clients.close()
+    assert CountingRetriever.searches == 2
+    assert batch_clients.evidence_cache.hits == 1
+    results = batch.data["results"]
+    assert all(set(item) == {"query", "evidence"} for item in results)
+    assert results[1]["evidence"] == results[2]["evidence"]
+    await retrieve("视野 检查")
+    assert CountingRetriever.searches == 2
+
+    (raw / "视网膜指南（2025）.md").write_text("# 视网膜\n\n眼压与视网膜复查。", "utf-8")
+    await retrieve("青光眼 眼压")
+    assert CountingRetriever.searches == 3
+
+
+@pytest.mark.asyncio
+async def test_only_the_call_that_fell_back_skips_the_evidence_cache(tmp_path):
+    import httpx
+
+    from app.tools.capabilities import CapabilityClients
+
+    config = build_settings(tmp_path).model_copy(
+        update={"RERANK_MODEL": "bge-reranker", "SILICONFLOW_API_KEY": SecretStr("key")},
+    )
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "青光眼指南（2024）.md").write_text(
+        "# 青光眼\n\n青光眼评估应记录眼压、视野与视神经结构。",
+        "utf-8",
+    )
+
+    class FlakyRetriever(HybridKnowledgeRetriever):
+        async def _rerank_request(self, key, query, candidates):
+            if "视野" in query:
+                raise httpx.ConnectError("rerank down")
+            return [(0.9, index) for index in range(len(candidates))]
+
+    retriever = FlakyRetriever(config)
+    _, fell_back = await retriever.search_many(["青光眼 眼压", "青光眼 视野"], top_k=2)
+    assert fell_back == [False, True]
+
+    clients = CapabilityClients(config, retriever=retriever)
+    try:
+        await clients.retrieve_medical_evidence_many(["青光眼 眼压", "青光眼 视野"], top_k=2)
+        await clients.retrieve_medical_evidence("青光眼 眼压", top_k=2)
+        assert clients.evidence_cache.hits == 1
+        await clients.retrieve_medical_evidence("青光眼 视野", top_k=2)
+        assert clients.evidence_cache.hits == 1
+    finally:
+        await clients.close()
+
+def test_sentence_chunker_streams_whole_sentences_within_budget():
+    sentence = "糖尿病视网膜病变患者应定期散瞳检查眼底。"
+    text = "短标题\n\n" + sentence * 12 + "\n\nSecond paragraph keeps its own locator. It is long enough."
+    chunker = SentenceChunker(max_tokens=60, max_chars=200, overlap_chars=40)
+
+    pieces = list(chunker.chunk_stream(iter(text.splitlines(keepends=True))))
+
+    assert pieces == list(chunker.chunk_text(text))
+    first = [piece for piece in pieces if piece.paragraph == 1]
+    assert len(first) > 1
+    assert all(piece.text.endswith("。") and len(piece.text) <= 200 for piece in first)
+    assert all(len(piece.text) // len(sentence) <= 3 for piece in first)
+    assert first[1].text.startswith(sentence)
+    assert pieces[-1].paragraph == 2 and pieces[-1].part == 1
+
+
+def test_sentence_chunker_keeps_original_spacing_in_mixed_text():
+    text = (
+        "Glaucoma is a chronic optic neuropathy. Measure IOP at every visit! "
+        "Is OCT needed? Yes, annually. 青光眼需要随访。每次复诊测眼压！OCT 每年一次。"
+    )
+
+    whole = SentenceChunker(max_tokens=500, max_chars=800, overlap_chars=0)
+    assert [piece.text for piece in whole.chunk_text(text)] == [text]
+
+    split = SentenceChunker(max_tokens=16, max_chars=200, overlap_chars=60)
+    assert [piece.text for piece in split.chunk_text(text)] == [
+        "Glaucoma is a chronic optic neuropathy. Measure IOP at every visit! Is OCT needed? Yes, annually.",
+        "Is OCT needed? Yes, annually. 青光眼需要随访。",
+        "Yes, annually. 青光眼需要随访。每次复诊测眼压！",
+        "每次复诊测眼压！OCT 每年一次。",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_chunks_are_dropped_within_visibility_group(tmp_path):
+    config = build_settings(tmp_path)
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    body = "抗VEGF治疗适用于中心凹受累的糖尿病黄斑水肿，应每月随访评估视力和OCT中心视网膜厚度。"
+    (raw / "guideline-a.md").write_text(f"# A\n\n{body}\n", "utf-8")
+    (raw / "guideline-b.md").write_text(f"# B\n\n{body.replace('应每月', '应 每月')}\n", "utf-8")
+    (raw / "private.md").write_text(f"# P\n\n{body}\n", "utf-8")
+    SourceRegistry(config).register_upload(raw / "private.md", user_id=7)
+
+    retriever = HybridKnowledgeRetriever(config)
+    await retriever.load()
+
+    bodies = [chunk for chunk in retriever._chunks if "黄斑水肿" in chunk.text]
+    assert len(bodies) == 2
+    assert any(Path(chunk.source).stem == "private" for chunk in bodies)
+    manifest = json.loads((retriever.index_dir / "manifest.json").read_text("utf-8"))
+    assert manifest["deduplicated_chunks"] == 1
+    assert await retriever.search("黄斑水肿", top_k=3, user_id=7)
+
+
+@pytest.mark.asyncio
+async def test_index_preload_reports_warming_and_workers_share_one_build(tmp_path):
+    import threading
+
+    config = build_settings(tmp_path)
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "guide.md").write_text("# 指南\n\n视网膜脱离需要急诊评估，并尽快安排手术治疗。", "utf-8")
+    release = threading.Event()
+    builds: list[int] = []
+
+    class SlowRetriever(HybridKnowledgeRetriever):
+        def _build_chunks(self, sources, *, previous=None):
+            builds.append(len(sources))
+            release.wait(timeout=10)
+            return super()._build_chunks(sources, previous=previous)
+
+    first, second = SlowRetriever(config), SlowRetriever(config)
+    assert first.readiness == "cold"
+    task = first.start_preload()
+    await asyncio.sleep(0.05)
+    assert first.readiness == "warming"
+    assert first.status().status == "warming"
+
+    loading = asyncio.create_task(second.load())
+    await asyncio.sleep(0.05)
+    release.set()
+    await task
+    await loading
+
+    assert first.readiness == second.readiness == "ready"
+    assert first.start_preload() is task
+    assert builds == [1]
+    assert [chunk.id for chunk in first._chunks] == [chunk.id for chunk in second._chunks]
+
+
+@pytest.mark.asyncio
+async def test_index_reload_does_not_disturb_searches_in_flight(tmp_path):
+    config = build_settings(tmp_path)
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "青光眼.md").write_text(
+        "# 青光眼\n\n青光眼患者需要定期检查眼压和视野，并按医嘱规律使用降眼压滴眼液。",
+        "utf-8",
+    )
+    paused, release = asyncio.Event(), asyncio.Event()
+
+    class PausingRetriever(HybridKnowledgeRetriever):
+        async def _rerank(self, query, candidates):
+            paused.set()
+            await release.wait()
+            return await super()._rerank(query, candidates)
+
+    retriever = PausingRetriever(config)
+    await retriever.load()
+    searching = asyncio.create_task(retriever.search("青光眼眼压", top_k=2))
+    await paused.wait()
+
+    (raw / "白内障.md").write_text(
+        "# 白内障\n\n白内障患者术前需要检查眼压、角膜内皮和眼底，评估手术风险。",
+        "utf-8",
+    )
+    retriever.invalidate()
+    await retriever.refresh()
+    assert retriever.status().chunks == 2
+    release.set()
+
+    assert [item.title for item in await searching] == ["青光眼"]
+    assert {item.title for item in await retriever.search("眼压", top_k=2)} == {"青光眼", "白内障"}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_query_embeddings_and_reranks_share_provider_calls(tmp_path):
+    from pydantic import SecretStr
+
+    config = build_settings(tmp_path).model_copy(
+        update={
+            "EMBEDDING_MODEL": "bge-m3",
+            "RERANK_MODEL": "bge-reranker",
+            "SILICONFLOW_API_KEY": SecretStr("key"),
+            "KNOWLEDGE_EMBED_COALESCE_MS": 20.0,
+        },
+    )
+    raw = config.resolve_path(config.KNOWLEDGE_RAW_DIR)
+    raw.mkdir(parents=True)
+    (raw / "guide.md").write_text("# 指南\n\n糖尿病视网膜病变需要每年散瞳检查眼底并评估黄斑水肿。", "utf-8")
+
+    class CountingRetriever(HybridKnowledgeRetriever):
+        embedded: list[list[str]] = []
+        reranked = 0
+
+        async def _embed(self, texts, *, on_batch=None):
+            self.embedded.append(list(texts))
+            return [[float(len(text)), 1.0] for text in texts]
+
+        async def _rerank_request(self, key, query, candidates):
+            type(self).reranked += 1
+            await asyncio.sleep(0.02)
+            return [(0.9, index) for index in range(len(candidates))]
+
+    retriever = CountingRetriever(config)
+    await retriever.load()
+    retriever._vectors = np.ones((len(retriever._chunks), 2), dtype=np.float32)
+
+    vectors = await asyncio.gather(
+        retriever._query_vectors(["黄斑水肿"]),
+        retriever._query_vectors(["散瞳检查", "黄斑水肿"]),
+        retriever._query_vectors(["眼底"]),
+    )
+    assert len(retriever.embedded) == 1
+    assert sorted(retriever.embedded[0]) == sorted(["黄斑水肿", "散瞳检查", "眼底"])
+    assert np.allclose(vectors[0][0], vectors[1][1])
+    assert retriever.status().cache["query_coalescing"]["coalesced"] == 2
+
+    candidates = [(0.5, chunk) for chunk in retriever._chunks]
+    (first, _), (second, _) = await asyncio.gather(
+        retriever._rerank("黄斑水肿", candidates),
+        retriever._rerank("黄斑水肿", candidates),
+    )
+    assert CountingRetriever.reranked == 1
+    assert first == second
+    assert retriever._http_client() is retriever._http_client()
+    await retriever.aclose()
+
+
+def test_retriever_closes_the_client_of_a_previous_event_loop(tmp_path):
+    import threading
+
+    import httpx
+
+    retriever = HybridKnowledgeRetriever(build_settings(tmp_path))
+
+    async def client() -> httpx.AsyncClient:
+        return retriever._http_client()
+
+    async def rebind(stale: httpx.AsyncClient) -> None:
+        assert retriever._http_client() is not stale
+        await asyncio.gather(*retriever._closing)
+        await retriever.aclose()
+
+    first = asyncio.run(client())
+    asyncio.run(rebind(first))
+    assert first.is_closed
+
+    owner = asyncio.new_event_loop()
+    thread = threading.Thread(target=owner.run_forever, daemon=True)
+    thread.start()
+    try:
+        second = asyncio.run_coroutine_threadsafe(client(), owner).result(timeout=5)
+        asyncio.run(rebind(second))
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), owner).result(timeout=5)
+        assert second.is_closed
+    finally:
+        owner.call_soon_threadsafe(owner.stop)
+        thread.join(timeout=5)
+        owner.close()
+
+
+@pytest.mark.asyncio
+async def test_retrieval_benchmark_reports_latency_and_recall_offline(tmp_path):
+    from scripts.benchmark_retrieval import run_size, start_fake_provider
+
+    server, provider_url = start_fake_provider()
+    try:
+        report = await run_size(
+            120,
+            workdir=tmp_path / "bench",
+            provider_url=provider_url,
+            query_count=5,
+            truth_queries=3,
+            top_k=3,
+            seed=1,
+        )
+    finally:
+        server.shutdown()
+    assert report["indexed_chunks"] == 120
+    assert report["vectors"] == 120
+    assert set(report["latency"]) == {"bm25", "vector_scores", "search"}
+    assert report["recall_at_k"]["bm25"] == 1.0
+    assert report["recall_at_k"]["vector_scores"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_memory_search_uses_term_index_and_optional_vector_recall(tmp_path):
+    calls: list[list[str]] = []
+
+    async def embedder(texts: list[str]) -> np.ndarray:
+        calls.append(texts)
+        return np.asarray(
+            [[1.0, 0.0] if "暗" in text or "夜间" in text else [0.0, 1.0] for text in texts],
+            dtype=np.float32,
+        )
+
+    config = build_settings(tmp_path)
+    store = MemoryStore(config, embedder=embedder)
+    surgery = await store.create(
+        MemoryRecord(user_id=5, category="history", content="右眼白内障术后", source="用户确认", status="confirmed"),
+    )
+    night = await store.create(
+        MemoryRecord(user_id=5, category="history", content="暗处视物模糊", source="用户确认", status="confirmed"),
+    )
+
+    assert await MemoryStore(config).search(5, "夜间看不清") == []
+    assert [item.id for item in await store.search(5, "夜间看不清")] == [night.id]
+    assert [item.id for item in await store.search(5, "夜间看不清")] == [night.id]
+    assert calls[1] == ["夜间看不清"]
+
+    restricted = await store.create(
+        MemoryRecord(
+            user_id=5,
+            category="history",
+            content="夜间用药记录",
+            source="用户确认",
+            status="confirmed",
+            sensitivity="restricted",
+        ),
+    )
+    assert [item.id for item in await store.search(5, "夜间看不清")] == [night.id]
+    assert calls[-1] == ["夜间看不清"]
+    found = await store.search(5, "夜间看不清", allow_restricted=True)
+    assert calls[-1] == ["夜间看不清", "夜间用药记录"]
+    assert restricted.id in {item.id for item in found}
+
+    await store.update(surgery.id, 5, {"content": "左眼青光眼"})
+    assert await MemoryStore(config).search(5, "白内障") == []
+    assert [item.id for item in await store.search(5, "青光眼")] == [surgery.id]
+    assert calls[-1] == ["青光眼", "左眼青光眼"]
+    await store.delete(night.id, 5)
+    with closing(sqlite3.connect(store.database_path)) as connection:
+        assert connection.execute(
+            "SELECT COUNT(*) FROM memory_terms WHERE memory_id = ?",
+            (night.id,),
+        ).fetchone() == (0,)
+        assert connection.execute("SELECT COUNT(*) FROM memory_vectors").fetchone() == (2,)
+
+
+@pytest.mark.asyncio
+async def test_expired_mutable_memory_is_hidden_then_swept(tmp_path):
+    store = MemoryStore(build_settings(tmp_path))
+    past = datetime.now(UTC) - timedelta(minutes=1)
+    for user_id in (1, 2):
+        await store.create(
+            MemoryRecord(
+                user_id=user_id,
+                category="preference",
+                content=f"临时偏好 {user_id}",
+                source="用户确认",
+                status="confirmed",
+                expires_at=past,
+            ),
+        )
+    kept = await store.create(
+        MemoryRecord(user_id=1, category="history", content="既往史", source="用户确认", expires_at=past),
+    )
+
+    assert [item.id for item in await store.list(1)] == [kept.id]
+    assert await store.search(2, "临时偏好") == []
+    assert [item.user_id for item in await store.purge_expired_mutable(2)] == [2]
+    swept = await MemoryStore(build_settings(tmp_path)).sweep_expired_mutable()
+    assert [item.user_id for item in swept] == [1]
+
+    def fail_transaction():
+        raise AssertionError("nothing is due, so no write transaction is opened")
+
+    store._transaction = fail_transaction
+    assert await store.purge_expired_mutable(1) == []
+    assert await store.purge_expired_mutable(3) == []
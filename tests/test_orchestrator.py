@@ -9,6 +9,7 @@ from app.core.config import Settings
 from app.domain.models import (
     Artifact,
     AttachmentRecord,
+    ContextStats,
     EvidenceItem,
     InterventionMode,
     InterventionStatus,
@@ -20,10 +21,18 @@ from app.domain.models import (
     RunIntervention,
     RunRecord,
     RunStatus,
+    utc_now,
 )
 from app.plugins.registry import plugin_registry
 from app.runtime.agents import AgentReply
-from app.runtime.context import ConversationContextManager, ExecutionContextManager
+from app.runtime.context import (
+    _CONTEXT_KEY_PRIORITY,
+    ConversationContextManager,
+    ConversationContextSnapshot,
+    ExecutionContextManager,
+    _ContextPacker,
+    json_dumps,
+)
 from app.runtime.errors import (
     BudgetExceeded,
     CapabilityUnavailable,
@@ -36,6 +45,7 @@ from app.runtime.orchestrator import (
     _sanitize_public_image_context,
 )
 from app.runtime.store import RuntimeStore
+from app.runtime.tokens import TokenCounter, TokenizerUsage, current_tokenizer_usage
 from tests.fakes import FakeCapabilityClients, FakeRunner
 
 
@@ -494,6 +504,184 @@ async def test_generated_summary_cannot_carry_clinical_detail(tmp_path):
     assert "clinical_detail_must_stay_in_lossless_context" in exc_info.value.issues
 
 
+@pytest.mark.asyncio
+async def test_context_ledger_follows_run_revisions_and_persists_turn_counts(tmp_path):
+    config = build_settings(tmp_path)
+    store = RuntimeStore(config)
+    first = RunRecord(
+        user_id=7,
+        status=RunStatus.COMPLETED,
+        input=RunInput(query="什么是青光眼？", conversation_id=97),
+        plugin=plugin_registry.get("interactive_vqa"),
+        answer="青光眼是一组视神经病变。",
+    )
+    running = RunRecord(
+        user_id=7,
+        status=RunStatus.RUNNING,
+        input=RunInput(query="那需要做哪些检查？", conversation_id=97),
+        plugin=plugin_registry.get("interactive_vqa"),
+    )
+    await store.create_run(first)
+    await store.create_run(running)
+    assert [row["run_id"] for row in await store.list_context_turns(7, 97)] == [first.id]
+
+    manager = ConversationContextManager(store, config)
+    snapshot = await manager.build(
+        run_id="run_context_ledger",
+        user_id=7,
+        run_input=RunInput(query="继续", conversation_id=97),
+    )
+    assert snapshot is not None
+    assert snapshot.source_run_ids == [first.id]
+    rows = await store.list_context_turns(7, 97)
+    assert rows[0]["token_model"] == config.main_model_name
+    assert rows[0]["turn_tokens"] > 0
+
+    running.status = RunStatus.COMPLETED
+    running.answer = "需要眼压、视野和 OCT 检查。"
+    assert await store.save_run(running)
+    rows = await store.list_context_turns(7, 97)
+    assert [row["run_id"] for row in rows] == [first.id, running.id]
+    assert rows[0]["turn_tokens"] is not None
+    assert rows[1]["turn_tokens"] is None
+    assert rows[1]["version"] == running.version
+
+    rebuilt = await manager.build(
+        run_id="run_context_ledger_next",
+        user_id=7,
+        run_input=RunInput(query="继续", conversation_id=97),
+    )
+    assert rebuilt is not None
+    assert rebuilt.source_run_ids == [first.id, running.id]
+    assert rebuilt.previous_query == "那需要做哪些检查？"
+    assert "需要眼压、视野和 OCT 检查。" in rebuilt.prompt_text
+    assert all(row["turn_tokens"] for row in await store.list_context_turns(7, 97))
+
+
+@pytest.mark.asyncio
+async def test_context_snapshot_bodies_are_shared_and_released_with_runs(tmp_path):
+    config = build_settings(tmp_path)
+    store = RuntimeStore(config)
+    runs = [
+        RunRecord(
+            user_id=7,
+            status=RunStatus.COMPLETED,
+            input=RunInput(query=f"第 {index} 轮", conversation_id=100),
+            plugin=plugin_registry.get("interactive_vqa"),
+        )
+        for index in range(3)
+    ]
+    for run in runs:
+        await store.create_run(run)
+    original = ConversationContextSnapshot(
+        id="ctx_original",
+        run_id=runs[0].id,
+        user_id=7,
+        conversation_id=100,
+        source_hash="hash",
+        prompt_text="以下是同一会话的历史。" * 200,
+        stats=ContextStats(source_turns=4, source_hash="hash"),
+    )
+    await store.save_context_snapshot(original, "cache")
+    for run in runs[1:]:
+        await store.save_context_snapshot(
+            original.model_copy(
+                update={
+                    "id": f"ctx_{run.id}",
+                    "run_id": run.id,
+                    "stats": original.stats.model_copy(update={"cache_hit": True}),
+                    "created_at": utc_now(),
+                },
+            ),
+            "cache",
+        )
+
+    def bodies() -> list[int]:
+        with store._connect() as connection:
+            return [row["refcount"] for row in connection.execute("SELECT refcount FROM runtime_context_bodies")]
+
+    assert bodies() == [3]
+    restored = await store.get_context_snapshot(runs[0].id)
+    assert restored is not None
+    assert ConversationContextSnapshot.model_validate(restored) == original
+    reused = await store.find_context_snapshot(7, 100, "cache")
+    assert reused is not None
+    assert reused["run_id"] == runs[2].id
+    assert reused["stats"]["cache_hit"] is True
+
+    assert await store.delete_run(runs[0].id, 7)
+    assert bodies() == [2]
+    await store.delete_conversation_resources(7, 100)
+    assert bodies() == []
+
+
+@pytest.mark.asyncio
+async def test_regeneration_lineage_keeps_latest_answer_per_family(tmp_path):
+    config = build_settings(tmp_path)
+    store = RuntimeStore(config)
+
+    def answered(query: str, regenerated_from: str | None = None) -> RunRecord:
+        return RunRecord(
+            user_id=7,
+            status=RunStatus.COMPLETED,
+            input=RunInput(
+                query=query,
+                conversation_id=99,
+                regenerated_from=regenerated_from,
+            ),
+            plugin=plugin_registry.get("interactive_vqa"),
+            answer=f"{query}的回答",
+        )
+
+    original = answered("青光眼怎么随访？")
+    other = answered("白内障术后注意什么？")
+    first_retry = answered("青光眼怎么随访？", original.id)
+    second_retry = answered("青光眼怎么随访？", first_retry.id)
+    for run in (original, other, first_retry, second_retry):
+        await store.create_run(run)
+
+    async def latest_ids(target: RuntimeStore, exclude: frozenset[str] = frozenset()) -> list[str]:
+        rows = await target.list_context_turns(7, 99, exclude=exclude)
+        return [row["run_id"] for row in rows]
+
+    lineage = await store.regeneration_lineage(second_retry.id)
+    assert lineage == {original.id, first_retry.id, second_retry.id}
+    assert await latest_ids(store) == [other.id, second_retry.id]
+    assert await latest_ids(store, lineage) == [other.id]
+
+    with store._connect() as connection:
+        connection.execute("DROP INDEX ix_runtime_run_regenerated_from")
+        connection.execute("DROP INDEX ix_runtime_run_family")
+        connection.execute("ALTER TABLE runtime_runs DROP COLUMN family_root_id")
+        connection.execute("ALTER TABLE runtime_runs DROP COLUMN regenerated_from")
+    reopened = RuntimeStore(config)
+
+    assert await reopened.regeneration_lineage(second_retry.id) == lineage
+    assert await latest_ids(reopened) == [other.id, second_retry.id]
+
+
+@pytest.mark.asyncio
+async def test_context_ledger_is_backfilled_for_existing_runtime_databases(tmp_path):
+    config = build_settings(tmp_path)
+    store = RuntimeStore(config)
+    run = RunRecord(
+        user_id=7,
+        status=RunStatus.FAILED,
+        input=RunInput(query="更正：是右眼。", conversation_id=98),
+        plugin=plugin_registry.get("interactive_vqa"),
+    )
+    await store.create_run(run)
+    with store._connect() as connection:
+        connection.execute("DROP TABLE runtime_context_turns")
+
+    reopened = RuntimeStore(config)
+
+    rows = await reopened.list_context_turns(7, 98)
+    assert [(row["run_id"], row["query"], row["answer"]) for row in rows] == [
+        (run.id, "更正：是右眼。", ""),
+    ]
+
+
 @pytest.mark.asyncio
 async def test_orchestrator_compacts_with_model_and_persists_validated_snapshot(
     tmp_path,
@@ -558,6 +746,148 @@ async def test_orchestrator_compacts_with_model_and_persists_validated_snapshot(
     assert any(event.type == "context.compacted" for event in events)
 
 
+@pytest.mark.asyncio
+async def test_background_precompaction_lets_next_run_skip_compaction(tmp_path):
+    class TrackingRunner(FakeRunner):
+        roles: list[str] = []
+
+        async def ask(self, role, prompt):
+            self.roles.append(role)
+            return await super().ask(role, prompt)
+
+    config = build_settings(tmp_path).model_copy(
+        update={
+            "CONVERSATION_CONTEXT_MAX_INPUT_TOKENS": 700,
+            "CONTEXT_RECENT_TURNS": 2,
+            "CONTEXT_PRECOMPACTION": True,
+        },
+    )
+    store = RuntimeStore(config)
+    for index in range(5):
+        await store.create_run(
+            RunRecord(
+                user_id=7,
+                status=RunStatus.COMPLETED,
+                input=RunInput(
+                    query=f"第 {index + 1} 轮眼科任务：" + "背景说明" * 70,
+                    conversation_id=94,
+                ),
+                plugin=plugin_registry.get("interactive_vqa"),
+                answer="历史回答需要复核。" * 100,
+            ),
+        )
+    runner = TrackingRunner()
+    orchestrator = RunOrchestrator(
+        store,
+        FakeCapabilityClients(),
+        config,
+        runner_factory=lambda clients: runner,
+    )
+
+    async def finish(query: str) -> RunRecord:
+        created = await orchestrator.create(
+            7,
+            RunInput(query=query, plugin_id="interactive_vqa", conversation_id=94),
+        )
+        current = await wait_for_terminal(store, created.id)
+        while created.id in orchestrator._tasks:
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*orchestrator._precompactions.values())
+        return current
+
+    first = await finish("继续说明青光眼检查")
+    assert runner.roles.count("ContextCompactorAgent") == 2
+    charged = await store.get_run(first.id)
+    assert charged.budget.model_calls == len(runner.roles)
+    assert charged.budget.model_calls <= charged.budget.max_model_calls
+
+    runner.roles.clear()
+    second = await finish("那视野检查多久复查一次")
+    events = await store.get_events(second.id)
+
+    assert runner.roles[0] != "ContextCompactorAgent"
+    assert second.context_stats.cache_hit is True
+    assert second.context_stats.compaction_status == "completed"
+    assert not any(event.type == "context.compacting" for event in events)
+
+
+async def _precompaction_fixture(tmp_path, conversation_id, **overrides):
+    class TrackingRunner(FakeRunner):
+        def __init__(self):
+            self.roles: list[str] = []
+
+        async def ask(self, role, prompt):
+            self.roles.append(role)
+            return await super().ask(role, prompt)
+
+    config = build_settings(tmp_path).model_copy(
+        update={
+            "CONVERSATION_CONTEXT_MAX_INPUT_TOKENS": 700,
+            "CONTEXT_RECENT_TURNS": 2,
+            "CONTEXT_PRECOMPACTION": True,
+            **overrides,
+        },
+    )
+    store = RuntimeStore(config)
+    for index in range(5):
+        source = await store.create_run(
+            RunRecord(
+                user_id=7,
+                status=RunStatus.COMPLETED,
+                input=RunInput(
+                    query=f"第 {index + 1} 轮眼科任务：" + "背景说明" * 70,
+                    conversation_id=conversation_id,
+                ),
+                plugin=plugin_registry.get("interactive_vqa"),
+                answer="历史回答需要复核。" * 100,
+            ),
+        )
+    runner = TrackingRunner()
+    orchestrator = RunOrchestrator(
+        store,
+        FakeCapabilityClients(),
+        config,
+        runner_factory=lambda clients: runner,
+    )
+    return store, orchestrator, runner, source
+
+
+@pytest.mark.asyncio
+async def test_background_precompaction_skips_an_exhausted_source_budget(tmp_path):
+    store, orchestrator, runner, source = await _precompaction_fixture(
+        tmp_path,
+        95,
+        RUN_MAX_MODEL_CALLS=1,
+    )
+    source.budget.max_model_calls = source.budget.model_calls = 1
+    assert await store.save_run(source)
+
+    await orchestrator._precompact(source, after=None)
+
+    assert runner.roles == []
+    assert (await store.get_run(source.id)).budget.model_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_run_cancels_precompaction_still_queued_for_the_slot(tmp_path):
+    store, orchestrator, runner, source = await _precompaction_fixture(tmp_path, 96)
+    await orchestrator._precompaction_slot.acquire()
+    try:
+        orchestrator._schedule_precompaction(source)
+        queued = orchestrator._precompactions[(7, 96)]
+        created = await orchestrator.create(
+            7,
+            RunInput(query="继续说明青光眼检查", plugin_id="interactive_vqa", conversation_id=96),
+        )
+        current = await wait_for_terminal(store, created.id)
+    finally:
+        orchestrator._precompaction_slot.release()
+
+    assert queued.cancelled()
+    assert runner.roles[0] == "ContextCompactorAgent"
+    assert current.context_stats.compaction_status == "completed"
+
+
 @pytest.mark.asyncio
 async def test_invalid_context_summary_retries_with_failure_reason(tmp_path):
     class RepairingRunner(FakeRunner):
@@ -2041,3 +2371,161 @@ async def test_emergency_run_has_critic_and_banner(tmp_path):
     assert current is not None
     assert current.status == RunStatus.COMPLETED
     assert "眼科急诊" in (current.answer or "")
+
+
+class _CharEncoding:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return [ord(char) for char in text]
+
+    def decode(self, tokens):
+        return "".join(chr(token) for token in tokens)
+
+
+class _CharCounter(TokenCounter):
+    def _resolve_encoding(self):
+        return _CharEncoding()
+
+
+def test_token_counter_memoizes_arrays_and_counts_segments_additively():
+    counter = _CharCounter("test", max_cached_tokens=12)
+    usage = TokenizerUsage()
+    reset = current_tokenizer_usage.set(usage)
+    try:
+        assert counter.count("视网膜脱离") == 5
+        assert counter.count("视网膜脱离") == 5
+        assert counter.encoding.calls == 1
+        assert counter.count_segments(["红眼", "畏光"], separator="\n\n") == len("红眼\n\n畏光")
+        assert counter.truncate("abcdefgh ", 4) == "abcd…"
+        assert counter.truncate_within("abcdefgh", 4) == "abc…"
+        assert counter.truncate_within("  ab  ", 10) == "ab"
+        counter.count("0123456789")
+    finally:
+        current_tokenizer_usage.reset(reset)
+
+    assert counter.stats()["cached_tokens"] <= 12
+    assert usage.cached >= 1
+    assert usage.encoded == counter.misses
+    assert usage.seconds >= 0
+
+
+def test_context_packer_sizes_leaves_once_and_fills_priority_fields_first():
+    counter = _CharCounter("test")
+    payload = {
+        "specialist": {
+            "notes": ["长篇专科复核说明" * 40 for _ in range(12)],
+            "red_flags": ["突发视力下降"],
+            "summary": "需要急诊评估视网膜脱离",
+        },
+        "trace": [{"id": f"step_{index}", "excerpt": "中间过程" * 100} for index in range(20)],
+    }
+    packer = _ContextPacker(counter)
+    assert packer.size(payload) == len(json_dumps(payload))
+
+    packed, size = packer.pack(payload, 600)
+
+    assert size == len(json_dumps(packed)) <= 600
+    assert packed["specialist"]["red_flags"] == ["突发视力下降"]
+    assert packed["specialist"]["summary"] == "需要急诊评估视网膜脱离"
+    encoded = counter.encoding.calls
+    assert _ContextPacker(counter).pack(payload, 600) == (packed, size)
+    assert counter.encoding.calls == encoded
+
+
+class _MergingEncoding(_CharEncoding):
+    """BPE-like: JSON delimiter runs merge into one token, so counts are not additive."""
+
+    MERGES = ('"}, {"', '"], "', '", "', '": "', '": [', "}, ", "], ")
+
+    def encode(self, text):
+        self.calls += 1
+        tokens, index = [], 0
+        while index < len(text):
+            for offset, merge in enumerate(self.MERGES):
+                if text.startswith(merge, index):
+                    tokens.append(0x110000 + offset)
+                    index += len(merge)
+                    break
+            else:
+                tokens.append(ord(text[index]))
+                index += 1
+        return tokens
+
+    def decode(self, tokens):
+        return "".join(
+            self.MERGES[token - 0x110000] if token >= 0x110000 else chr(token) for token in tokens
+        )
+
+
+class _MergingCounter(TokenCounter):
+    def _resolve_encoding(self):
+        return _MergingEncoding()
+
+
+def _recursive_compact(value, max_tokens, counter):
+    # The compactor _ContextPacker replaced; it re-serializes every candidate.
+    if max_tokens <= 0:
+        return None
+    if counter.count(json_dumps(value)) <= max_tokens:
+        return value
+    if isinstance(value, str):
+        return counter.truncate_within(value, max_tokens)
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, list):
+        result = []
+        item_budget = max(12, max_tokens // min(len(value), 8))
+        for item in value[:8]:
+            compacted = _recursive_compact(item, item_budget, counter)
+            if counter.count(json_dumps([*result, compacted])) > max_tokens:
+                break
+            result.append(compacted)
+        return result
+    ordered = sorted(
+        value.items(),
+        key=lambda item: (_CONTEXT_KEY_PRIORITY.get(str(item[0]), 100), str(item[0])),
+    )
+    result = {}
+    used = counter.count(json_dumps(result))
+    for index, (key, item) in enumerate(ordered):
+        remaining = max_tokens - used
+        if remaining < 8:
+            break
+        compacted = _recursive_compact(item, max(8, remaining // max(1, len(ordered) - index)), counter)
+        candidate_tokens = counter.count(json_dumps({**result, str(key): compacted}))
+        if candidate_tokens <= max_tokens:
+            result[str(key)] = compacted
+            used = candidate_tokens
+    return result
+
+
+def test_context_packer_matches_recursive_compactor_under_merging_tokenizer():
+    import random
+
+    rng = random.Random(7)
+    words = ["视网膜", "red_flags", "眼压", "evidence", "alpha beta", "右眼", "12.5 mg", "OCT"]
+    keys = [*_CONTEXT_KEY_PRIORITY, "notes", "text", "x"]
+
+    def payload(depth):
+        draw = rng.random()
+        if depth > 3 or draw < 0.35:
+            return rng.choice(
+                [" ".join(rng.choices(words, k=rng.randint(1, 40))), rng.randint(0, 999), None],
+            )
+        if draw < 0.65:
+            return [payload(depth + 1) for _ in range(rng.randint(0, 10))]
+        return {rng.choice(keys): payload(depth + 1) for _ in range(rng.randint(0, 8))}
+
+    counter = _MergingCounter("test")
+    assert counter.count('{"a": "b", "c": 1}') < sum(
+        counter.count(part) for part in ['{', '"a"', ": ", '"b"', ", ", '"c"', ": ", "1", "}"]
+    )
+    for _ in range(80):
+        value = {"evidence": payload(0), "notes": payload(0), "trace": payload(0)}
+        budget = rng.choice([16, 40, 100, 300, 800])
+        packed, size = _ContextPacker(counter).pack(value, budget)
+        assert packed == _recursive_compact(value, budget, counter)
+        assert size == counter.count(json_dumps(packed)) <= max(budget, counter.count(json_dumps(value)))